@@ -157,6 +157,12 @@ AUTH_PASSWORD_VALIDATORS = [
 # 请在生产环境中替换为真实的TuShare API Token
 # 可以从环境变量中读取，确保安全性
 TUSHARE_TOKEN = os.getenv('TUSHARE_TOKEN', 'your_tushare_token_here')
+# TuShare接口每分钟调用额度（按账户积分等级调整），批量更新按此限速
+TUSHARE_CALLS_PER_MINUTE = int(os.getenv('TUSHARE_CALLS_PER_MINUTE', 500))
+# 单个接口的每分钟额度，未配置的接口使用 TUSHARE_CALLS_PER_MINUTE，如 {'stock_basic': 1}
+TUSHARE_API_LIMITS = {}
+# TuShare接口响应缓存目录（Parquet），历史数据首次拉取后直接读取本地文件
+TUSHARE_CACHE_DIR = BASE_DIR / 'data' / 'tushare_cache'
 
 # Redis缓存配置
 CACHES = {
@@ -178,6 +184,50 @@ MARKET_DATA_CACHE = {
     'UPDATE_INTERVAL': 60 * 30,  # 30分钟更新间隔
 }
 
+# 数据生命周期配置：热数据留在数据库，更早的数据按分区归档为Parquet文件
+DATA_LIFECYCLE = {
+    'ARCHIVE_DIR': BASE_DIR / 'data' / 'archive',
+    'STOCK_DAILY_HOT_DAYS': 365,  # 日线热数据保留天数，更早的按年归档
+    'TICK_HOT_DAYS': 30,  # 分时数据热数据保留天数，更早的按月归档
+    'NEWS_RETENTION_DAYS': 30,  # 新闻保留天数
+}
+
+# 指数数据配置：指数日线同步到本地 IndexDaily，K线图从本地读取
+INDEX_DATA = {
+    'UNIVERSE': {
+        '000001.SH': '上证指数',
+        '399001.SZ': '深证成指',
+        '399006.SZ': '创业板指',
+        '000300.SH': '沪深300',
+        '000905.SH': '中证500',
+    },
+    'HISTORY_DAYS': 365 * 3,  # 首次同步的历史天数
+    'PUBLISH_HOUR': 16,  # 当日日线数据的发布时间（小时），之后读取时才尝试补齐当日数据
+    'TOP_UP_INTERVAL': 60 * 10,  # 读取时补齐数据的最小间隔（秒）
+}
+
+# AI聊天回复缓存：按规范化问题文本缓存回复，可选的向量相似度匹配使用本地向量函数
+CHAT_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'TTL': {
+        'education': 60 * 60 * 24 * 7,  # 概念、指标等知识类问题
+        'general': 60 * 60,
+        'market': 60 * 5,  # 行情、个股等时效性问题
+    },
+    # 相似度匹配的向量函数（导入路径，需为语义向量模型）；None时只做精确匹配
+    'EMBEDDING_FUNCTION': None,
+    'SIMILARITY_THRESHOLD': 0.9,
+    'MAX_SEMANTIC_ENTRIES': 1000,  # 每个进程相似度索引的最大条数
+}
+
+# AI聊天行情上下文：问题中提到的股票/指数的本地行情、指标和新闻注入提示词
+CHAT_MARKET_CONTEXT = {
+    'ENABLED': True,
+    'MAX_SYMBOLS': 3,  # 每个问题最多检索的股票/指数数
+    'TOKEN_BUDGET': 800,  # 注入上下文的token上限
+    'NEWS_LIMIT': 3,  # 每只股票附带的新闻条数
+}
+
 # 定时任务配置 - Windows系统暂时禁用django-crontab
 # 可使用 python market_data_cron.py 手动更新缓存
 # CRONJOBS = [
@@ -244,15 +294,40 @@ CHANNEL_LAYERS = {
 
 # 定时任务配置
 CRONJOBS = [
+    # 每个交易日收盘后（15:05）T+1结算，当日买入转为可用
+    ('5 15 * * 1-5', 'stock.tasks.settle_t1_positions', '>> /tmp/settle_positions.log 2>&1'),
+    
     # 每个交易日收盘后（15:10）同步当日股票数据
     ('10 15 * * 1-5', 'stock.tasks.sync_daily_stock_data', '>> /tmp/sync_stock_data.log 2>&1'),
     
+    # 每个交易日收盘后（15:20）当日分时分钟线落库
+    ('20 15 * * 1-5', 'stock.tasks.persist_intraday_bars', '>> /tmp/intraday_bars.log 2>&1'),
+    
+    # 每个交易日行情同步后（15:40）生成账户净值快照
+    ('40 15 * * 1-5', 'stock.tasks.snapshot_accounts', '>> /tmp/snapshot_accounts.log 2>&1'),
+    
+    # 交易时间每5分钟刷新收益排行榜，收盘快照后（15:45）按收盘价再刷新一次
+    ('*/5 9-11,13-14 * * 1-5', 'stock.tasks.refresh_leaderboard', '>> /tmp/leaderboard.log 2>&1'),
+    ('45 15 * * 1-5', 'stock.tasks.refresh_leaderboard', '>> /tmp/leaderboard.log 2>&1'),
+    
+    # 每个交易日指数日线发布后（16:30）同步指数日线
+    ('30 16 * * 1-5', 'stock.tasks.sync_index_daily', '>> /tmp/sync_index_daily.log 2>&1'),
+    
+    # 每个交易日日线发布后（16:35）补齐全市场日线，排行快照只读本地数据
+    ('35 16 * * 1-5', 'stock.tasks.top_up_market_daily', '>> /tmp/top_up_market_daily.log 2>&1'),
+    
     # 每个交易日收盘后（15:15）同步公司信息（每周一次）
     ('15 15 * * 1', 'stock.tasks.sync_company_info', '>> /tmp/sync_company_info.log 2>&1'),
     
     # 每天早上8点同步财经新闻
     ('0 8 * * *', 'stock.tasks.sync_financial_news', '>> /tmp/sync_news.log 2>&1'),
     
+    # 每周六凌晨3点归档分时数据
+    ('0 3 * * 6', 'stock.tasks.archive_tick_data', '>> /tmp/archive_ticks.log 2>&1'),
+    
+    # 每5分钟把AI聊天次数计数回写数据库
+    ('*/5 * * * *', 'stock.tasks.flush_chat_usage', '>> /tmp/chat_usage.log 2>&1'),
+    
     # 每小时清理过期的WebSocket连接（可选）
     ('0 * * * *', 'stock.tasks.cleanup_websocket_connections', '>> /tmp/cleanup_ws.log 2>&1'),
 ]
@@ -285,4 +360,17 @@ JWT_AUTH = {
     'JWT_REFRESH_EXPIRATION_DELTA': datetime.timedelta(days=7),
     'JWT_AUTH_HEADER_PREFIX': 'Bearer',
     'JWT_AUTH_COOKIE': None,
-}
\ No newline at end of file
+}
+
+# JWT认证白名单（无需token），以*结尾为前缀匹配
+JWT_AUTH_WHITELIST = [
+    '/user/login',
+    '/user/register',
+    '/user/debug_login',
+    '/media*',
+]
+
+# 已验证token缓存容量、黑名单快照刷新间隔（秒）、是否在token中写入角色/状态声明
+JWT_TOKEN_CACHE_SIZE = 4096
+JWT_DENYLIST_REFRESH_SECONDS = 5
+JWT_EMBED_CLAIMS = True
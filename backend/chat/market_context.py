@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+AI聊天行情上下文 - 从本地数据检索问题中提到的股票/指数，注入提示词
+
+- 识别：股票复用新闻股票识别自动机（名称、简称、代码，见 stock.news_tagger），指数按 INDEX_DATA 中的名称匹配
+- 内容：最近几个交易日的日线、技术指标（与K线图共用 calculate_technical_indicators）、最近的相关新闻
+- 每只股票/指数的上下文按分钟缓存，同一分钟内的提问只读一次数据库
+- 拼接时按 token 预算截断，优先保留提及次数多的股票
+"""
+
+import logging
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .streaming import count_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_KEY = 'chat:context:{ts_code}:{minute}'
+HISTORY_DAYS = 120  # 读取的日线自然日数，足够计算MA60
+RECENT_BARS = 5
+MARKET_ALIASES = ('大盘', 'a股', '沪指', '沪市')
+DEFAULT_MARKET_INDEX = '000001.SH'
+
+
+def get_context_config(name, default=None):
+    return getattr(settings, 'CHAT_MARKET_CONTEXT', {}).get(name, default)
+
+
+def detect_symbols(text, limit=None):
+    """
+    识别问题中提到的股票和指数
+
+    Returns:
+        list: ts_code列表，指数在前，股票按提及次数降序
+    """
+    from stock.index_data import get_index_universe
+    from stock.news_tagger import normalize_text, stock_news_tagger
+
+    limit = limit or get_context_config('MAX_SYMBOLS', 3)
+    normalized = normalize_text(text).replace(' ', '')
+    indices = [ts_code for ts_code, name in get_index_universe().items() if name.lower() in normalized]
+    if not indices and any(alias in normalized for alias in MARKET_ALIASES):
+        indices = [DEFAULT_MARKET_INDEX]
+    stocks = stock_news_tagger.tag(text, limit)
+    return (indices + [code for code in stocks if code not in indices])[:limit]
+
+
+def _format_change(value):
+    return f'{value:+.2f}%'
+
+
+def _period_change(df, bars):
+    if len(df) <= bars:
+        return None
+    base = df['close'].iloc[-bars - 1]
+    return (df['close'].iloc[-1] / base - 1) * 100 if base else None
+
+
+def _indicator_line(df):
+    from stock.views import calculate_technical_indicators
+
+    kline = df.rename(columns={'vol': 'volume'})[['close', 'high', 'low', 'volume']].to_dict('records')
+    indicators = calculate_technical_indicators(kline)
+    if not indicators:
+        return None
+    parts = [f"MA5 {indicators['ma5'][-1]}", f"MA20 {indicators['ma20'][-1]}"]
+    if indicators.get('ma60'):
+        parts.append(f"MA60 {indicators['ma60'][-1]}")
+    macd = indicators['macd']
+    parts.append(f"MACD(DIF {macd['dif'][-1]}, DEA {macd['dea'][-1]}, 柱 {macd['macd'][-1]})")
+    if 'rsi' in indicators:
+        parts.append(f"RSI14 {indicators['rsi'][-1]}")
+    if 'kdj' in indicators:
+        kdj = indicators['kdj']
+        parts.append(f"KDJ(K {kdj['k'][-1]}, D {kdj['d'][-1]}, J {kdj['j'][-1]})")
+    return '指标: ' + ' '.join(parts)
+
+
+def _news_line(ts_code):
+    from trading.models import MarketNewsStock
+
+    limit = get_context_config('NEWS_LIMIT', 3)
+    rows = (MarketNewsStock.objects.filter(ts_code=ts_code, news__is_published=True)
+            .order_by('-publish_time').values_list('publish_time', 'news__title')[:limit])
+    items = [f"{timezone.localtime(publish_time).strftime('%m-%d')} {title}" for publish_time, title in rows]
+    return '相关新闻: ' + '；'.join(items) if items else None
+
+
+def build_symbol_context(ts_code):
+    """单只股票/指数的上下文文本（无本地数据时为空字符串）"""
+    from stock.index_data import get_index_universe, is_index
+    from stock.lifecycle import load_daily_frame, load_index_frame
+    from stock.models import StockBasic
+
+    start_date = timezone.localdate() - timedelta(days=HISTORY_DAYS)
+    if is_index(ts_code):
+        df = load_index_frame([ts_code], start_date=start_date)
+        header = f'【{get_index_universe()[ts_code]} {ts_code}】'
+    else:
+        df = load_daily_frame([ts_code], start_date=start_date)
+        basic = StockBasic.objects.filter(ts_code=ts_code).values('name', 'industry').first() or {}
+        header = f"【{basic.get('name', ts_code)} {ts_code}】行业: {basic.get('industry') or '未分类'}"
+    if df.empty:
+        return ''
+
+    for column in ('open', 'high', 'low', 'close', 'pct_chg', 'vol', 'amount'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    df = df.dropna(subset=['close']).fillna({'pct_chg': 0.0, 'amount': 0.0})
+    if df.empty:
+        return ''
+    latest = df.iloc[-1]
+    trade_date = pd.Timestamp(latest['trade_date'])
+
+    changes = [f"{label}{_format_change(change)}" for label, change in
+               (('5日', _period_change(df, 5)), ('20日', _period_change(df, 20))) if change is not None]
+    lines = [
+        header,
+        (f"最新({trade_date.strftime('%Y-%m-%d')}): 收{latest['close']:.2f} 涨跌{_format_change(latest['pct_chg'])} "
+         f"最高{latest['high']:.2f} 最低{latest['low']:.2f} 成交额{latest['amount'] / 1e5:.2f}亿"
+         + (f" | {' '.join(changes)}" if changes else '')),
+        '近期: ' + ' | '.join(
+            f"{pd.Timestamp(row.trade_date).strftime('%m-%d')} 收{row.close:.2f} {_format_change(row.pct_chg)}"
+            for row in df.tail(RECENT_BARS).itertuples()
+        ),
+    ]
+    indicator_line = _indicator_line(df)
+    if indicator_line:
+        lines.append(indicator_line)
+    if not is_index(ts_code):
+        news_line = _news_line(ts_code)
+        if news_line:
+            lines.append(news_line)
+    return '\n'.join(lines)
+
+
+def get_symbol_context(ts_code):
+    """按分钟缓存的上下文"""
+    key = CONTEXT_KEY.format(ts_code=ts_code, minute=int(timezone.now().timestamp() // 60))
+    try:
+        context = cache.get(key)
+        if context is not None:
+            return context
+    except Exception as e:
+        logger.warning('chat_market_context result=cache_unavailable error=%s', e)
+        return build_symbol_context(ts_code)
+
+    context = build_symbol_context(ts_code)
+    try:
+        cache.set(key, context, 60)
+    except Exception:
+        pass
+    return context
+
+
+def build_market_context(text, model=None):
+    """
+    问题相关的行情上下文，总长度不超过 TOKEN_BUDGET
+
+    Returns:
+        str: 上下文文本，未提到股票/指数或本地无数据时为空字符串
+    """
+    if not get_context_config('ENABLED', True):
+        return ''
+    budget = get_context_config('TOKEN_BUDGET', 800)
+    model = model or 'gpt-4o'
+    blocks = []
+    used = 0
+    try:
+        for ts_code in detect_symbols(text):
+            context = get_symbol_context(ts_code)
+            if not context:
+                continue
+            tokens = count_tokens(context, model)
+            if used + tokens > budget:
+                continue
+            blocks.append(context)
+            used += tokens
+    except Exception as e:
+        logger.warning('chat_market_context result=failed error=%s', e)
+    return '\n\n'.join(blocks)
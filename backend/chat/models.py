@@ -31,22 +31,3 @@ class ChatUsage(models.Model):
         verbose_name = "聊天使用统计"
         verbose_name_plural = verbose_name
         unique_together = [['user', 'usage_date']]
-        
-    @classmethod
-    def get_today_usage(cls, user_id):
-        """获取用户今日使用次数"""
-        today = timezone.now().date()
-        usage, created = cls.objects.get_or_create(
-            user_id=user_id,
-            usage_date=today,
-            defaults={'usage_count': 0}
-        )
-        return usage
-    
-    @classmethod
-    def increment_usage(cls, user_id):
-        """增加用户使用次数"""
-        usage = cls.get_today_usage(user_id)
-        usage.usage_count += 1
-        usage.save()
-        return usage
\ No newline at end of file
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+AI聊天每日次数配额 - Redis 原子计数，定期回写 ChatUsage
+
+- 计数键按日期区分（chat:quota:{日期}:{用户ID}），检查上限和 INCR 在一个 Lua 脚本中原子完成，并发请求不会超出配额；
+  键在次日零点后 FLUSH_GRACE 秒过期，留出最后一次回写的时间
+- 键不存在时（当天第一次计数、Redis 重启或清空后）脚本先以 ChatUsage 中已有的次数 SET NX 建键，配额不会被重置
+- 有计数变化的用户记入当日的待回写集合，由定时任务 flush_chat_usage 批量写入 ChatUsage 供统计使用
+- Redis 不可用时退化为数据库条件更新
+"""
+
+import logging
+from datetime import datetime, time as dt_time, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ChatUsage
+
+logger = logging.getLogger(__name__)
+
+QUOTA_KEY = 'chat:quota:{date}:{user_id}'
+DIRTY_KEY = 'chat:quota:dirty:{date}'
+FLUSH_GRACE = 60 * 60
+
+# KEYS: 计数键, 待回写集合；ARGV: 数据库中的次数, 上限(-1不限), 过期时间戳, 用户ID
+# 返回 {是否允许, 占用后的今日次数}
+CONSUME_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'NX')
+redis.call('EXPIREAT', KEYS[1], ARGV[3])
+local count = tonumber(redis.call('GET', KEYS[1]))
+local limit = tonumber(ARGV[2])
+if limit >= 0 and count >= limit then
+    return {0, count}
+end
+count = redis.call('INCR', KEYS[1])
+redis.call('SADD', KEYS[2], ARGV[4])
+redis.call('EXPIREAT', KEYS[2], ARGV[3])
+return {1, count}
+"""
+
+
+def _get_redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection('default')
+
+
+def _expire_at(day):
+    """次日零点后 FLUSH_GRACE 秒（时间戳）"""
+    midnight = datetime.combine(day + timedelta(days=1), dt_time.min, tzinfo=timezone.get_current_timezone())
+    return int(midnight.timestamp()) + FLUSH_GRACE
+
+
+def _db_count(user_id, day):
+    return ChatUsage.objects.filter(user_id=user_id, usage_date=day).values_list('usage_count', flat=True).first() or 0
+
+
+def get_today_count(user_id):
+    """用户今日已使用次数"""
+    day = timezone.localdate()
+    try:
+        count = _get_redis().get(QUOTA_KEY.format(date=day.isoformat(), user_id=user_id))
+        if count is not None:
+            return int(count)
+    except Exception as e:
+        logger.warning('chat_quota result=redis_unavailable user_id=%s error=%s', user_id, e)
+    return _db_count(user_id, day)
+
+
+def consume(user_id, limit=None):
+    """
+    占用一次今日配额
+
+    Args:
+        limit: 每日上限，None 表示不限（管理员，仍计数）
+
+    Returns:
+        tuple: (是否允许, 占用后的今日次数)
+    """
+    day = timezone.localdate()
+    try:
+        return _consume_redis(user_id, day, limit)
+    except Exception as e:
+        logger.warning('chat_quota result=redis_unavailable user_id=%s error=%s', user_id, e)
+        return _consume_db(user_id, day, limit)
+
+
+def _consume_redis(user_id, day, limit):
+    redis_conn = _get_redis()
+    key = QUOTA_KEY.format(date=day.isoformat(), user_id=user_id)
+    dirty_key = DIRTY_KEY.format(date=day.isoformat())
+    script = redis_conn.register_script(CONSUME_SCRIPT)
+    allowed, count = script(
+        keys=[key, dirty_key],
+        args=[_db_count(user_id, day), -1 if limit is None else limit, _expire_at(day), user_id],
+    )
+    return bool(allowed), int(count)
+
+
+def _consume_db(user_id, day, limit):
+    ChatUsage.objects.get_or_create(user_id=user_id, usage_date=day, defaults={'usage_count': 0})
+    queryset = ChatUsage.objects.filter(user_id=user_id, usage_date=day)
+    if limit is not None:
+        queryset = queryset.filter(usage_count__lt=limit)
+    allowed = queryset.update(usage_count=F('usage_count') + 1) > 0
+    return allowed, _db_count(user_id, day)
+
+
+def flush_usage(day=None):
+    """
+    把 Redis 中有变化的计数回写到 ChatUsage
+
+    Returns:
+        int: 回写的用户数
+    """
+    day = day or timezone.localdate()
+    redis_conn = _get_redis()
+    dirty_key = DIRTY_KEY.format(date=day.isoformat())
+    # 先取出再删除，回写期间新增的变化留到下一次
+    pipe = redis_conn.pipeline(transaction=True)
+    pipe.smembers(dirty_key)
+    pipe.delete(dirty_key)
+    user_ids = sorted(int(user_id) for user_id in pipe.execute()[0])
+    if not user_ids:
+        return 0
+
+    counts = redis_conn.mget([QUOTA_KEY.format(date=day.isoformat(), user_id=user_id) for user_id in user_ids])
+    objs = [
+        ChatUsage(user_id=user_id, usage_date=day, usage_count=int(count))
+        for user_id, count in zip(user_ids, counts) if count is not None
+    ]
+    ChatUsage.objects.bulk_create(
+        objs, batch_size=500, update_conflicts=True,
+        unique_fields=['user', 'usage_date'], update_fields=['usage_count'],
+    )
+    logger.info('chat_quota result=flushed date=%s users=%s', day, len(objs))
+    return len(objs)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+AI聊天回复缓存 - 重复提问直接回放已有回复，不再请求 OpenAI
+
+- 精确匹配：问题文本规范化（全半角、大小写、空白和标点）后作为缓存键，存放在 Django 缓存中，多进程共享
+- 相似度匹配（可选，默认关闭）：CHAT_RESPONSE_CACHE['EMBEDDING_FUNCTION'] 指定的语义向量函数把问题转成向量，
+  与本进程缓存过的问题按余弦相似度比较，超过阈值即视为同一问题；
+  只用于知识类和一般问题，且问题中的数字（股票代码、日期等）必须一致，行情类问题只做精确匹配。
+  向量函数必须区分语义：字符级向量会把“金叉/死叉”“银行板块/券商板块”这类只差一两个字、意思相反的问题判为相同
+- 按问题类别设置有效期：知识类长期有效，行情类只缓存几分钟
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'chat:response:{digest}'
+EMBEDDING_DIM = 256
+
+DEFAULT_TTL = {'education': 60 * 60 * 24 * 7, 'general': 60 * 60, 'market': 60 * 5}
+SEMANTIC_KINDS = ('education', 'general')
+
+MARKET_KEYWORDS = (
+    '今天', '今日', '现在', '目前', '最新', '实时', '大盘', '行情', '走势', '盘面', '涨停', '跌停',
+    '开盘', '收盘', '本周', '这周', '昨天', '股价', 'today', 'price',
+)
+EDUCATION_KEYWORDS = (
+    '什么是', '是什么', '什么叫', '含义', '定义', '意思', '原理', '怎么算', '如何计算', '解释',
+    'whatis', 'whatare', 'explain', 'define',
+)
+STOCK_CODE_PATTERN = re.compile(r'(?<!\d)\d{6}(?!\d)')
+DIGITS_PATTERN = re.compile(r'\d+')
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+def get_cache_config(name, default=None):
+    return getattr(settings, 'CHAT_RESPONSE_CACHE', {}).get(name, default)
+
+
+def normalize_prompt(text):
+    """规范化问题文本：全角转半角、转小写、去掉空白和标点"""
+    return NON_WORD_PATTERN.sub('', unicodedata.normalize('NFKC', text or '').lower())
+
+
+def classify_prompt(normalized):
+    """问题类别：market 行情类 / education 知识类 / general 其他"""
+    if STOCK_CODE_PATTERN.search(normalized) or any(word in normalized for word in MARKET_KEYWORDS):
+        return 'market'
+    if any(word in normalized for word in EDUCATION_KEYWORDS):
+        return 'education'
+    return 'general'
+
+
+def char_ngram_embedding(text):
+    """
+    字符二元组哈希向量，只用于测试相似度索引（set_embedding_function），不要配置为 EMBEDDING_FUNCTION
+
+    只反映字面重合，不区分语义，只差一两个字的相反问题相似度也很高
+    """
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    grams = [text[i:i + 2] for i in range(len(text) - 1)] or [text]
+    for gram in grams:
+        vector[zlib.crc32(gram.encode('utf-8')) % EMBEDDING_DIM] += 1.0
+    return vector
+
+
+class SemanticIndex(object):
+    """进程内的问题向量索引，超过容量时淘汰最早加入的问题"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # 缓存键 -> (类别, 单位向量, 数字, 过期时间)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key, kind, vector, digits, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (kind, vector, digits, time.time() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def search(self, kind, vector, digits, threshold):
+        """相似度最高且不低于阈值的缓存键"""
+        now = time.time()
+        with self._lock:
+            candidates = [
+                (key, entry[1]) for key, entry in self._entries.items()
+                if entry[0] == kind and entry[2] == digits and entry[3] > now
+            ]
+        if not candidates:
+            return None
+        scores = np.stack([candidate[1] for candidate in candidates]) @ vector
+        best = int(np.argmax(scores))
+        return candidates[best][0] if scores[best] >= threshold else None
+
+
+class ResponseCache(object):
+    """聊天回复缓存"""
+
+    def __init__(self, embedding_function=None):
+        self._embedding_function = embedding_function
+        self._index = SemanticIndex(get_cache_config('MAX_SEMANTIC_ENTRIES', 1000))
+
+    @staticmethod
+    def is_enabled():
+        return get_cache_config('ENABLED', True)
+
+    @staticmethod
+    def get_ttl(kind):
+        return get_cache_config('TTL', {}).get(kind, DEFAULT_TTL[kind])
+
+    def set_embedding_function(self, function):
+        """替换向量函数（传入 None 时恢复使用配置的函数），已有索引作废"""
+        self._embedding_function = function
+        self._index = SemanticIndex(self._index.max_entries)
+
+    def _embed(self, normalized):
+        function = self._embedding_function
+        if function is None:
+            path = get_cache_config('EMBEDDING_FUNCTION')
+            if not path:
+                return None
+            function = self._embedding_function = import_string(path)
+        vector = np.asarray(function(normalized), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    @staticmethod
+    def _key(normalized):
+        return CACHE_KEY.format(digest=hashlib.sha1(normalized.encode('utf-8')).hexdigest())
+
+    def get(self, prompt, kind=None):
+        """
+        查找缓存的回复
+
+        Args:
+            kind: 问题类别，默认按问题文本判断
+
+        Returns:
+            dict | None: {'response', 'kind', 'match': 'exact'/'semantic'}
+        """
+        normalized = normalize_prompt(prompt)
+        if not normalized or not self.is_enabled():
+            return None
+        kind = kind or classify_prompt(normalized)
+
+        try:
+            entry = cache.get(self._key(normalized))
+            if entry:
+                return {'response': entry['response'], 'kind': kind, 'match': 'exact'}
+            if kind not in SEMANTIC_KINDS:
+                return None
+
+            vector = self._embed(normalized)
+            if vector is None:
+                return None
+            digits = tuple(DIGITS_PATTERN.findall(normalized))
+            key = self._index.search(kind, vector, digits, get_cache_config('SIMILARITY_THRESHOLD', 0.9))
+            if key is None:
+                return None
+            entry = cache.get(key)
+            if not entry:
+                self._index.discard(key)
+                return None
+            return {'response': entry['response'], 'kind': kind, 'match': 'semantic'}
+        except Exception as e:
+            logger.warning('chat_response_cache result=get_failed error=%s', e)
+            return None
+
+    def set(self, prompt, response, kind=None):
+        """缓存完整的回复，返回是否写入"""
+        normalized = normalize_prompt(prompt)
+        if not normalized or not response or not self.is_enabled():
+            return False
+        kind = kind or classify_prompt(normalized)
+        ttl = self.get_ttl(kind)
+        key = self._key(normalized)
+
+        try:
+            cache.set(key, {'question': normalized, 'response': response}, ttl)
+            if kind in SEMANTIC_KINDS:
+                vector = self._embed(normalized)
+                if vector is not None:
+                    self._index.add(key, kind, vector, tuple(DIGITS_PATTERN.findall(normalized)), ttl)
+            return True
+        except Exception as e:
+            logger.warning('chat_response_cache result=set_failed error=%s', e)
+            return False
+
+    async def aget(self, prompt, kind=None):
+        return await sync_to_async(self.get)(prompt, kind)
+
+    async def aset(self, prompt, response, kind=None):
+        return await sync_to_async(self.set)(prompt, response, kind)
+
+
+chat_response_cache = ResponseCache()
@@ -0,0 +1,156 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from chat import quota, views
+from chat.models import ChatMessage, ChatUsage
+from chat.response_cache import DEFAULT_TTL, chat_response_cache
+from user.models import SysUser
+
+
+class RecordingCache(object):
+    """记录写入有效期的内存缓存"""
+
+    def __init__(self):
+        self.data = {}
+        self.timeouts = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value, timeout=None):
+        self.data[key] = value
+        self.timeouts[key] = timeout
+
+
+class FakeCompletions(object):
+    """流式返回固定回复的 OpenAI 接口，error 不为空时抛出"""
+
+    def __init__(self, reply='', error=None):
+        self.reply = reply
+        self.error = error
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self._stream()
+
+    async def _stream(self):
+        for content in (self.reply[:4], self.reply[4:]):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=None)
+        usage = mock.Mock(**{'model_dump.return_value': {'total_tokens': 42}})
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+class ChatStreamCacheTests(TestCase):
+    """聊天流式回复与回复缓存"""
+
+    PROMPT = '什么是市盈率？'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = SysUser.objects.create(username='chatter', password='x', status=0)
+
+    def setUp(self):
+        self.cache = RecordingCache()
+        patchers = [
+            mock.patch('chat.response_cache.cache', self.cache),
+            mock.patch('chat.views.build_market_context', return_value=''),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stub_client(self, completions):
+        patcher = mock.patch.object(views, 'client', SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def stream(self, prompt):
+        chat = await ChatMessage.objects.acreate(user=self.user, content=prompt, model='gpt-4o')
+        events = [event async for event in views.chat_stream(SimpleNamespace(user_id=self.user.id), chat.id)]
+        await chat.arefresh_from_db()
+        return chat, events
+
+    @staticmethod
+    def payload(events):
+        return ''.join(event[len('data: '):-2] for event in events if event != 'data: [DONE]\n\n')
+
+    async def test_exact_hit_replays_as_sse_without_tokens(self):
+        completions = FakeCompletions('不应调用')
+        self.stub_client(completions)
+        chat_response_cache.set(self.PROMPT, '市盈率是股价与每股收益之比。')
+
+        chat, events = await self.stream('什么是市盈率')
+
+        self.assertEqual(completions.calls, 0)
+        self.assertEqual(events[-1], 'data: [DONE]\n\n')
+        self.assertEqual(self.payload(events), '市盈率是股价与每股收益之比。')
+        self.assertTrue(chat.is_completed)
+        self.assertEqual(chat.tokens_used, 0)
+
+    async def test_miss_streams_and_caches_reply(self):
+        self.stub_client(FakeCompletions('市盈率是股价与每股收益之比。'))
+
+        chat, events = await self.stream(self.PROMPT)
+
+        self.assertEqual(self.payload(events), '市盈率是股价与每股收益之比。')
+        self.assertEqual(chat.tokens_used, 42)
+        self.assertEqual(chat_response_cache.get(self.PROMPT)['response'], '市盈率是股价与每股收益之比。')
+
+    async def test_error_reply_is_not_cached(self):
+        self.stub_client(FakeCompletions(error=RuntimeError('rate limited')))
+
+        chat, events = await self.stream(self.PROMPT)
+
+        self.assertIn('获取响应时出错', chat.response)
+        self.assertTrue(chat.is_completed)
+        self.assertEqual(self.cache.data, {})
+
+    async def test_market_reply_uses_short_ttl(self):
+        self.stub_client(FakeCompletions('贵州茅台收盘价1500元。'))
+
+        with mock.patch('chat.views.build_market_context', return_value='600519.SH 收盘 1500'):
+            await self.stream('贵州茅台基本面如何')
+
+        self.assertEqual(list(self.cache.timeouts.values()), [DEFAULT_TTL['market']])
+
+
+class ChatQuotaTests(TestCase):
+    """聊天每日配额"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = SysUser.objects.create(username='quota', password='x', status=0)
+        ChatUsage.objects.create(user=cls.user, usage_date=timezone.localdate(), usage_count=3)
+
+    def test_redis_script_seeds_key_with_db_count(self):
+        redis_conn = mock.Mock()
+        script = redis_conn.register_script.return_value
+        script.return_value = [1, 4]
+
+        with mock.patch('chat.quota._get_redis', return_value=redis_conn):
+            self.assertEqual(quota.consume(self.user.id, 5), (True, 4))
+
+        redis_conn.register_script.assert_called_once_with(quota.CONSUME_SCRIPT)
+        args = script.call_args.kwargs['args']
+        self.assertEqual((args[0], args[1], args[3]), (3, 5, self.user.id))
+
+    def test_unlimited_passes_negative_limit(self):
+        redis_conn = mock.Mock()
+        redis_conn.register_script.return_value.return_value = [1, 4]
+
+        with mock.patch('chat.quota._get_redis', return_value=redis_conn):
+            quota.consume(self.user.id)
+
+        self.assertEqual(redis_conn.register_script.return_value.call_args.kwargs['args'][1], -1)
+
+    def test_db_fallback_stops_at_limit(self):
+        with mock.patch('chat.quota._get_redis', side_effect=ConnectionError('redis down')):
+            self.assertEqual(quota.consume(self.user.id, 5), (True, 4))
+            self.assertEqual(quota.consume(self.user.id, 5), (True, 5))
+            self.assertEqual(quota.consume(self.user.id, 5), (False, 5))
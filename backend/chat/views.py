@@ -11,8 +11,12 @@ from django.conf import settings
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
-from .models import ChatMessage, ChatUsage
-from role.models import SysUserRole, SysRole, ROLE_SUPERADMIN, ROLE_ADMIN
+from . import quota as chat_quota
+from .market_context import build_market_context
+from .models import ChatMessage
+from .response_cache import chat_response_cache
+from .streaming import ResponseBuffer, count_tokens, replay_chunks, sse_event
+from utils.permissions import is_admin_or_above
 
 # 尝试加载环境变量，如果失败就使用默认值
 try:
@@ -63,6 +67,13 @@ SYSTEM_PROMPT = f"""你是一个智能助手，在回答用户问题时请遵循
 请注意，关于系统信息的回答必须准确，不要编造或推测。
 """
 
+# 行情上下文提示词
+MARKET_CONTEXT_PROMPT = """以下是本系统本地数据库中与用户问题相关的行情数据（日线、技术指标、相关新闻），价格单位为元，涨跌幅为百分比。
+回答涉及这些股票或指数的行情时以这些数据为准并注明数据日期，数据中没有的信息如实说明，不要编造。
+
+{context}
+"""
+
 # 创建OpenAI客户端
 client = None
 if OPENAI_API_KEY != 'your_openai_api_key_here':
@@ -81,41 +92,45 @@ if OPENAI_API_KEY != 'your_openai_api_key_here':
         print(f"Error: 无法初始化OpenAI客户端: {e}")
         raise
 
-async def get_gpt_response(message):
-    """与OpenAI API进行流式通信"""
+def build_messages(message, market_context=''):
+    """组装对话消息，有行情上下文时作为第二条系统消息放在用户问题之前"""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if market_context:
+        messages.append({"role": "system", "content": MARKET_CONTEXT_PROMPT.format(context=market_context)})
+    messages.append({"role": "user", "content": message})
+    return messages
+
+async def get_gpt_response(message, usage=None, market_context=''):
+    """
+    与OpenAI API进行流式通信，逐块返回回复内容
+
+    Args:
+        usage: 传入dict时，写入接口返回的token用量（prompt_tokens/completion_tokens/total_tokens）
+        market_context: 本地检索的行情上下文（见 chat.market_context）
+    """
     if not client:
         raise ValueError("OpenAI client not initialized - please check your API configuration")
     
     # 调用OpenAI API
     response = await client.chat.completions.create(
         model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": message}
-        ],
+        messages=build_messages(message, market_context),
         temperature=OPENAI_TEMPERATURE,
         max_tokens=OPENAI_MAX_TOKENS,
         stream=True,
+        stream_options={"include_usage": True},
     )
     
     async for chunk in response:
-        try:
-            # 增强错误检查，确保所有属性都存在
-            if (chunk and 
-                hasattr(chunk, 'choices') and 
-                chunk.choices and 
-                len(chunk.choices) > 0 and 
-                hasattr(chunk.choices[0], 'delta') and 
-                chunk.choices[0].delta and 
-                hasattr(chunk.choices[0].delta, 'content') and 
-                chunk.choices[0].delta.content):
-                content = chunk.choices[0].delta.content
-                yield f"data: {content}\n\n"
-        except (IndexError, AttributeError) as e:
-            print(f"处理API响应块时出错: {e}, chunk={chunk}")
+        # 最后一块只有用量，没有choices
+        if usage is not None and getattr(chunk, 'usage', None):
+            usage.update(chunk.usage.model_dump())
+        if not getattr(chunk, 'choices', None):
             continue
-    
-    yield f"data: [DONE]\n\n"
+        delta = getattr(chunk.choices[0], 'delta', None)
+        content = getattr(delta, 'content', None)
+        if content:
+            yield content
 
 class ChatView(APIView):
     def get(self, request):
@@ -132,21 +147,9 @@ class ChatView(APIView):
                 is_hidden=False  # 只获取未隐藏的记录
             ).order_by('-created_time')[:30]
             
-            # 检查用户的使用限制
-            # 获取用户角色
-            user_roles = list(SysRole.objects.raw(
-                "SELECT r.id, r.code, r.name FROM sys_role r "
-                "JOIN sys_user_role ur ON r.id = ur.role_id "
-                "WHERE ur.user_id=%s",
-                [user_id]
-            ))
-            
-            # 检查是否为管理员或超级管理员
-            is_admin = any(role.code == ROLE_ADMIN or role.code == ROLE_SUPERADMIN for role in user_roles)
-            
-            # 获取今日使用次数
-            today_usage = ChatUsage.get_today_usage(user_id)
-            today_count = today_usage.usage_count
+            # 检查用户的使用限制（角色走缓存，次数读Redis计数）
+            is_admin = is_admin_or_above(user_id, request)
+            today_count = chat_quota.get_today_count(user_id)
             
             # 普通用户每日限制
             daily_limit = CHAT_DAILY_LIMIT
@@ -190,39 +193,22 @@ class ChatView(APIView):
             if not message:
                 return JsonResponse({'code': 400, 'message': '消息内容不能为空'}, status=400)
             
-            # 检查用户角色和使用限制
-            # 获取用户角色
-            user_roles = list(SysRole.objects.raw(
-                "SELECT r.id, r.code, r.name FROM sys_role r "
-                "JOIN sys_user_role ur ON r.id = ur.role_id "
-                "WHERE ur.user_id=%s",
-                [user_id]
-            ))
-            
-            # 检查是否为管理员或超级管理员
-            is_admin = any(role.code == ROLE_ADMIN or role.code == ROLE_SUPERADMIN for role in user_roles)
-            
-            # 获取今日使用记录
-            today_usage = ChatUsage.get_today_usage(user_id)
-            
-            # 普通用户每日限制
-            if not is_admin and today_usage.usage_count >= CHAT_DAILY_LIMIT:
+            # 检查用户角色，原子占用今日配额（管理员不限次数，仍计数）
+            is_admin = is_admin_or_above(user_id, request)
+            allowed, today_count = chat_quota.consume(user_id, None if is_admin else CHAT_DAILY_LIMIT)
+            if not allowed:
                 return JsonResponse({
                     'code': 403, 
                     'message': f'您今日的对话次数已达上限({CHAT_DAILY_LIMIT}次)'
                 }, status=403)
             
             # 创建聊天消息记录
-            with transaction.atomic():
-                chat = ChatMessage.objects.create(
-                    user_id=user_id,
-                    content=message,
-                    is_completed=False,
-                    model=OPENAI_MODEL
-                )
-                
-                # 更新使用次数
-                ChatUsage.increment_usage(user_id)
+            chat = ChatMessage.objects.create(
+                user_id=user_id,
+                content=message,
+                is_completed=False,
+                model=OPENAI_MODEL
+            )
             
             return JsonResponse({
                 'code': 200, 
@@ -230,7 +216,7 @@ class ChatView(APIView):
                 'chat_id': chat.id,
                 'usage': {
                     'is_admin': is_admin,
-                    'today_count': today_usage.usage_count + 1,
+                    'today_count': today_count,
                     'daily_limit': CHAT_DAILY_LIMIT if not is_admin else None
                 }
             })
@@ -302,64 +288,56 @@ class ChatView(APIView):
             return JsonResponse({'code': 500, 'message': f'操作失败: {str(e)}'}, status=500)
 
 async def chat_stream(request, chat_id):
-    """流式响应聊天消息"""
+    """流式响应聊天消息，回复分段写库（见 chat.streaming），重复提问回放缓存（见 chat.response_cache）"""
     user_id = getattr(request, 'user_id', None)
     if not user_id:
-        yield "data: 未授权\n\n"
+        yield sse_event("未授权")
+        return
+    
+    chat = await ChatMessage.objects.filter(id=chat_id, user_id=user_id, is_completed=False).afirst()
+    if not chat:
+        yield sse_event("聊天消息不存在或已完成")
+        yield sse_event("[DONE]")
         return
     
+    buffer = ResponseBuffer(chat.id)
+    usage = {}
+    # 问题中提到的股票/指数的本地行情作为上下文；行情类回答只做短期缓存
+    market_context = await sync_to_async(build_market_context)(chat.content, chat.model)
+    cache_kind = 'market' if market_context else None
+    # 重复提问直接回放缓存的回复，不请求OpenAI
+    cached = await chat_response_cache.aget(chat.content, cache_kind)
     try:
-        # 同步查询转为异步
-        @sync_to_async
-        def get_chat_message():
-            try:
-                return ChatMessage.objects.get(id=chat_id, user_id=user_id, is_completed=False)
-            except ChatMessage.DoesNotExist:
-                return None
-        
-        @sync_to_async
-        def update_chat_message(chat, response, tokens=0):
-            chat.response = response
-            chat.is_completed = True
-            chat.tokens_used = tokens
-            chat.save()
-        
-        chat = await get_chat_message()
-        if not chat:
-            yield "data: 聊天消息不存在或已完成\n\n"
-            return
-        
-        # 获取GPT响应
-        full_response = ""
         try:
-            async for chunk in get_gpt_response(chat.content):
-                yield chunk
-                # 确保数据格式正确并提取内容
-                if isinstance(chunk, str) and "data: " in chunk and "[DONE]" not in chunk:
-                    try:
-                        content = chunk.replace("data: ", "").replace("\n\n", "")
-                        full_response += content
-                    except Exception as e:
-                        print(f"处理响应内容时出错: {e}, chunk={chunk}")
-                        continue
+            if cached:
+                chunks = replay_chunks(cached['response'])
+            else:
+                chunks = get_gpt_response(chat.content, usage, market_context)
+            async for content in chunks:
+                buffer.append(content)
+                yield sse_event(content)
+                await buffer.checkpoint()
+            if not cached:
+                await chat_response_cache.aset(chat.content, buffer.text(), cache_kind)
         except Exception as e:
             error_msg = f"获取响应时出错: {str(e)}"
             print(error_msg)
-            yield f"data: {error_msg}\n\n"
-            yield f"data: [DONE]\n\n"
-            full_response = error_msg
-        
-        # 估算token数量 (简单估算)
-        tokens = len(chat.content.split()) + len(full_response.split())
-        
-        # 更新数据库中的消息
-        await update_chat_message(chat, full_response, tokens)
-        
-    except Exception as e:
-        error_msg = f"流式响应错误: {str(e)}"
-        print(error_msg)
-        yield f"data: {error_msg}\n\n"
-        yield f"data: [DONE]\n\n"
+            buffer.append(error_msg)
+            yield sse_event(error_msg)
+        yield sse_event("[DONE]")
+    finally:
+        # 正常结束或客户端中途断开，都保存已生成的内容；回放缓存不消耗token
+        if cached:
+            tokens = 0
+        else:
+            tokens = usage.get('total_tokens') or (
+                sum(count_tokens(item['content'], chat.model) for item in build_messages(chat.content, market_context))
+                + count_tokens(buffer.text(), chat.model)
+            )
+        try:
+            await buffer.finish(tokens)
+        except Exception as e:
+            print(f"保存聊天回复失败: chat_id={chat.id}, error={e}")
 
 # 流式聊天响应视图
 class ChatStreamView(View):
@@ -9,6 +9,7 @@ from django.db import connections
 
 # from menu.models import SysRoleMenu
 from role.models import SysRole, SysRoleSerializer, SysUserRole, ROLE_SUPERADMIN, ROLE_ADMIN
+from utils.permissions import is_superadmin as check_superadmin, bump_role_version
 
 
 # 查询所有角色信息
@@ -65,23 +66,8 @@ class SaveView(APIView):
         
         # 检查用户权限
         if user_id:
-            # 查询用户角色
-            user_roles = SysRole.objects.raw(
-                "SELECT id, code, name FROM sys_role WHERE id IN "
-                "(SELECT role_id FROM sys_user_role WHERE user_id=%s)", 
-                [user_id]
-            )
-            
-            # 检查用户角色
-            is_superadmin = False
-            is_admin = False
-            
-            for role in user_roles:
-                if role.code == ROLE_SUPERADMIN or role.name == '超级管理员':
-                    is_superadmin = True
-                    break
-                if role.code == ROLE_ADMIN or role.name == '管理员':
-                    is_admin = True
+            # 检查用户角色（带缓存）
+            is_superadmin = check_superadmin(user_id, request)
                     
             # 只有超级管理员可以管理角色
             if not is_superadmin:
@@ -107,6 +93,8 @@ class SaveView(APIView):
                                   update_time=data['update_time'])
             obj_sysRole.update_time = datetime.now().date()  # Store as date, not datetime
             obj_sysRole.save()
+        # 角色变更，使所有用户的角色缓存失效
+        bump_role_version()
         return JsonResponse({'code': 200})
 
 
@@ -123,19 +111,8 @@ class ActionView(APIView):
         if not user_id:
             return JsonResponse({'code': 401, 'message': '未授权'}, status=401)
             
-        # 查询用户角色
-        user_roles = SysRole.objects.raw(
-            "SELECT id, code, name FROM sys_role WHERE id IN "
-            "(SELECT role_id FROM sys_user_role WHERE user_id=%s)", 
-            [user_id]
-        )
-        
-        # 检查是否为超级管理员
-        is_superadmin = False
-        for role in user_roles:
-            if role.code == ROLE_SUPERADMIN or role.name == '超级管理员':
-                is_superadmin = True
-                break
+        # 检查是否为超级管理员（带缓存）
+        is_superadmin = check_superadmin(user_id, request)
                 
         # 非超级管理员只能查看角色列表
         if not is_superadmin:
@@ -156,19 +133,8 @@ class ActionView(APIView):
         if not user_id:
             return JsonResponse({'code': 401, 'message': '未授权'}, status=401)
             
-        # 查询用户角色
-        user_roles = SysRole.objects.raw(
-            "SELECT id, code, name FROM sys_role WHERE id IN "
-            "(SELECT role_id FROM sys_user_role WHERE user_id=%s)", 
-            [user_id]
-        )
-        
-        # 检查是否为超级管理员
-        is_superadmin = False
-        for role in user_roles:
-            if role.code == ROLE_SUPERADMIN or role.name == '超级管理员':
-                is_superadmin = True
-                break
+        # 检查是否为超级管理员（带缓存）
+        is_superadmin = check_superadmin(user_id, request)
                 
         # 只有超级管理员可以删除角色
         if not is_superadmin:
@@ -177,4 +143,5 @@ class ActionView(APIView):
         idList = json.loads(request.body.decode("utf-8"))
         SysUserRole.objects.filter(role_id__in=idList).delete()
         SysRole.objects.filter(id__in=idList).delete()
+        bump_role_version()
         return JsonResponse({'code': 200})
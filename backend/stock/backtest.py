@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+策略回测引擎 - 基于本地StockDaily日线数据
+
+信号在收盘价上向量化生成，次日开盘价成交（避免未来函数）；
+手续费按 TRADING_CONFIG 计算（佣金费率、最低佣金5元与 TradeRecord.commission 默认值一致，卖出另收印花税）。
+多只股票回测时在父进程一次性读取行情，再分发到进程池计算，子进程不访问数据库。
+Web请求使用进程级共享进程池（首次需要时创建，之后所有请求复用，不为每个请求创建进程），
+股票数不超过 POOL_MIN_SYMBOLS 时直接在当前进程计算。
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+LOT_SIZE = 100  # A股一手100股
+POOL_MIN_SYMBOLS = 10  # 股票数超过该值时才分发到共享进程池
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+DEFAULT_COSTS = {
+    'commission_rate': 0.0003,
+    'min_commission': 5.0,
+    'stamp_tax_rate': 0.001,
+    'transfer_fee_rate': 0.00001,
+}
+
+
+# ==================== 指标计算 ====================
+
+def calc_ma(close, window):
+    """简单移动平均，窗口不足处为NaN"""
+    return pd.Series(close).rolling(window=window).mean().to_numpy()
+
+
+def calc_ema(close, span):
+    """指数移动平均（与技术分析接口的 ewm(span) 口径一致）"""
+    return pd.Series(close).ewm(span=span).mean().to_numpy()
+
+
+def calc_macd(close, fast=12, slow=26, signal=9):
+    """MACD，返回 (dif, dea, macd柱)"""
+    dif = calc_ema(close, fast) - calc_ema(close, slow)
+    dea = pd.Series(dif).ewm(span=signal).mean().to_numpy()
+    return dif, dea, (dif - dea) * 2
+
+
+def calc_rsi(close, period=14):
+    """RSI相对强弱指标（简单移动平均口径）"""
+    delta = np.diff(close, prepend=np.nan)
+    gain = pd.Series(np.where(delta > 0, delta, 0.0)).rolling(window=period).mean().to_numpy()
+    loss = pd.Series(np.where(delta < 0, -delta, 0.0)).rolling(window=period).mean().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + gain / loss)
+    # 区间内无下跌时 RSI 为100
+    return np.where((loss == 0) & (gain > 0), 100.0, rsi)
+
+
+# ==================== 策略信号（1=持仓，0=空仓） ====================
+
+def signal_ma_cross(close, fast=5, slow=20):
+    """均线交叉：快线在慢线之上持仓"""
+    fast_ma = calc_ma(close, fast)
+    slow_ma = calc_ma(close, slow)
+    return np.where(fast_ma > slow_ma, 1.0, 0.0)
+
+
+def signal_macd(close, fast=12, slow=26, signal=9):
+    """MACD：DIF在DEA之上持仓"""
+    dif, dea, _ = calc_macd(close, fast, slow, signal)
+    valid = np.arange(len(close)) >= slow
+    return np.where(valid & (dif > dea), 1.0, 0.0)
+
+
+def signal_rsi(close, period=14, lower=30, upper=70):
+    """RSI阈值：低于下限买入，高于上限卖出，其间保持原状态"""
+    rsi = calc_rsi(close, period)
+    state = np.where(rsi < lower, 1.0, np.where(rsi > upper, 0.0, np.nan))
+    return pd.Series(state).ffill().fillna(0.0).to_numpy()
+
+
+STRATEGIES = {
+    'ma_cross': {'name': '均线交叉', 'func': signal_ma_cross, 'params': {'fast': 5, 'slow': 20}},
+    'macd': {'name': 'MACD金叉死叉', 'func': signal_macd, 'params': {'fast': 12, 'slow': 26, 'signal': 9}},
+    'rsi': {'name': 'RSI超买超卖', 'func': signal_rsi, 'params': {'period': 14, 'lower': 30, 'upper': 70}},
+}
+
+
+# ==================== 撮合与统计 ====================
+
+def _trade_cost(amount, costs, is_sell):
+    """单笔交易费用：佣金（不足最低佣金按最低收取）+ 过户费 + 卖出印花税"""
+    fee = max(amount * costs['commission_rate'], costs['min_commission'])
+    fee += amount * costs['transfer_fee_rate']
+    if is_sell:
+        fee += amount * costs['stamp_tax_rate']
+    return fee
+
+
+def simulate(ts_code, dates, opens, closes, strategy, params, initial_capital, costs, include_curve=True):
+    """
+    单只股票回测（纯numpy计算，可在子进程中执行）
+
+    Args:
+        dates: 交易日期字符串数组
+        opens/closes: 开盘价/收盘价数组（按日期升序）
+    """
+    n = len(closes)
+    if n < 2:
+        return {'ts_code': ts_code, 'success': False, 'message': '行情数据不足'}
+
+    opens = np.where(opens > 0, opens, closes)
+    target = STRATEGIES[strategy]['func'](closes, **params)
+
+    # T日收盘产生信号，T+1日开盘成交
+    held = np.zeros(n)
+    held[1:] = target[:-1]
+    changes = np.diff(held, prepend=0.0)
+    entries = np.flatnonzero(changes > 0)
+    exits = np.flatnonzero(changes < 0)
+
+    equity = np.empty(n)
+    cash = float(initial_capital)
+    cursor = 0
+    trades = []
+    round_trip_profits = []
+
+    for k, entry in enumerate(entries):
+        exit_index = exits[exits > entry][0] if np.any(exits > entry) else None
+        equity[cursor:entry] = cash
+
+        price = opens[entry]
+        shares = int(cash / (price * (1 + costs['commission_rate'] + costs['transfer_fee_rate'])) // LOT_SIZE) * LOT_SIZE
+        while shares > 0 and shares * price + _trade_cost(shares * price, costs, False) > cash:
+            shares -= LOT_SIZE
+        if shares <= 0:
+            cursor = entry
+            continue
+
+        buy_amount = shares * price
+        buy_fee = _trade_cost(buy_amount, costs, False)
+        cash -= buy_amount + buy_fee
+        trades.append({
+            'date': str(dates[entry]), 'type': 'BUY', 'price': round(float(price), 3),
+            'shares': shares, 'amount': round(float(buy_amount), 2), 'commission': round(float(buy_fee), 2),
+        })
+
+        end = exit_index if exit_index is not None else n
+        equity[entry:end] = cash + shares * closes[entry:end]
+
+        if exit_index is None:
+            cursor = n
+            break
+
+        sell_price = opens[exit_index]
+        sell_amount = shares * sell_price
+        sell_fee = _trade_cost(sell_amount, costs, True)
+        cash += sell_amount - sell_fee
+        profit = sell_amount - sell_fee - buy_amount - buy_fee
+        round_trip_profits.append(profit)
+        trades.append({
+            'date': str(dates[exit_index]), 'type': 'SELL', 'price': round(float(sell_price), 3),
+            'shares': shares, 'amount': round(float(sell_amount), 2), 'commission': round(float(sell_fee), 2),
+            'profit': round(float(profit), 2),
+        })
+        cursor = exit_index
+
+    if cursor < n:
+        equity[cursor:] = cash
+
+    returns = equity[1:] / equity[:-1] - 1
+    nav = equity / initial_capital
+    drawdowns = nav / np.maximum.accumulate(nav) - 1
+    years = (n - 1) / TRADING_DAYS_PER_YEAR
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    profits = np.array(round_trip_profits)
+
+    stats = {
+        'total_return': round(float(nav[-1] - 1) * 100, 4),
+        'annual_return': round(float(nav[-1] ** (1 / years) - 1) * 100, 4) if years > 0 and nav[-1] > 0 else 0,
+        'max_drawdown': round(float(drawdowns.min()) * 100, 4),
+        'sharpe_ratio': round(float(returns.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR)), 4) if std > 0 else 0,
+        'trade_count': len(trades),
+        'win_rate': round(float((profits > 0).mean()) * 100, 2) if len(profits) else 0,
+        'total_commission': round(sum(trade['commission'] for trade in trades), 2),
+        'benchmark_return': round(float(closes[-1] / closes[0] - 1) * 100, 4) if closes[0] > 0 else 0,
+        'final_equity': round(float(equity[-1]), 2),
+        'bars': n,
+    }
+
+    result = {
+        'ts_code': ts_code,
+        'success': True,
+        'start_date': str(dates[0]),
+        'end_date': str(dates[-1]),
+        'stats': stats,
+        'trades': trades,
+    }
+    if include_curve:
+        result['dates'] = [str(value) for value in dates]
+        result['equity'] = np.round(equity, 2).tolist()
+        result['drawdowns'] = np.round(drawdowns * 100, 4).tolist()
+    return result
+
+
+def _simulate_task(task):
+    """进程池入口（需为模块级函数以便pickle）"""
+    return simulate(*task)
+
+
+# ==================== 对外接口 ====================
+
+def get_trading_costs():
+    """读取交易费用配置"""
+    from django.conf import settings
+
+    config = getattr(settings, 'TRADING_CONFIG', {})
+    return {
+        'commission_rate': config.get('COMMISSION_RATE', DEFAULT_COSTS['commission_rate']),
+        'min_commission': config.get('MIN_COMMISSION', DEFAULT_COSTS['min_commission']),
+        'stamp_tax_rate': config.get('STAMP_TAX_RATE', DEFAULT_COSTS['stamp_tax_rate']),
+        'transfer_fee_rate': config.get('TRANSFER_FEE_RATE', DEFAULT_COSTS['transfer_fee_rate']),
+    }
+
+
+def load_bars(ts_codes, start_date=None, end_date=None):
+    """一次读取多只股票日线（含已归档的冷数据分区），返回 {ts_code: (dates, opens, closes)}"""
+    from stock.lifecycle import load_daily_frame
+
+    df = load_daily_frame(ts_codes, start_date, end_date, columns=['open', 'close'])
+    df = df[df['close'].notna()]
+    if df.empty:
+        return {}
+
+    df['open'] = pd.to_numeric(df['open'], errors='coerce').fillna(0.0)
+    df['close'] = pd.to_numeric(df['close'], errors='coerce')
+    df['trade_date'] = pd.to_datetime(df['trade_date']).dt.strftime('%Y-%m-%d')
+
+    bars = {}
+    for ts_code, group in df.groupby('ts_code', sort=False):
+        bars[ts_code] = (
+            group['trade_date'].to_numpy(),
+            group['open'].to_numpy(dtype=float),
+            group['close'].to_numpy(dtype=float),
+        )
+    return bars
+
+
+def get_pool_size():
+    from django.conf import settings
+
+    return getattr(settings, 'BACKTEST_POOL_WORKERS', None) or os.cpu_count() or 1
+
+
+def get_shared_pool():
+    """
+    进程级共享进程池，首次调用时创建
+
+    使用 spawn 启动子进程：Web 服务进程带有数据库连接和线程，fork 出的子进程可能继承锁状态
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ProcessPoolExecutor(max_workers=get_pool_size(),
+                                               mp_context=multiprocessing.get_context('spawn'))
+        return _shared_pool
+
+
+def _reset_shared_pool(pool):
+    """子进程异常退出后进程池不可再用，丢弃后下次重建"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is pool:
+            _shared_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_tasks(tasks, workers):
+    """
+    执行回测任务
+
+    Returns:
+        tuple: (结果列表, 实际并行数)
+    """
+    if workers is None and len(tasks) > POOL_MIN_SYMBOLS:
+        pool = get_shared_pool()
+        size = get_pool_size()
+        try:
+            results = list(pool.map(_simulate_task, tasks, chunksize=max(1, len(tasks) // (size * 4))))
+            return results, min(size, len(tasks))
+        except BrokenProcessPool as e:
+            logger.error('backtest result=pool_broken error=%s', e)
+            _reset_shared_pool(pool)
+    elif workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            return list(executor.map(_simulate_task, tasks, chunksize=chunksize)), min(workers, len(tasks))
+    return [_simulate_task(task) for task in tasks], 1
+
+
+def run_backtest(ts_codes, strategy='ma_cross', params=None, start_date=None, end_date=None,
+                 initial_capital=100000.0, workers=None, include_curve=True):
+    """
+    运行回测
+
+    Args:
+        ts_codes: 股票代码列表
+        strategy: 策略名称（ma_cross / macd / rsi）
+        params: 策略参数，未提供的使用默认值
+        workers: 进程数，None时股票数超过 POOL_MIN_SYMBOLS 使用共享进程池、否则单进程；
+            1为单进程，大于1时为本次回测单独创建进程池（基准测试用）
+
+    Returns:
+        dict: {'success', 'message', 'data': {'results', 'benchmark'}}
+    """
+    if strategy not in STRATEGIES:
+        return {'success': False, 'message': f'不支持的策略: {strategy}', 'data': None}
+
+    strategy_params = dict(STRATEGIES[strategy]['params'])
+    strategy_params.update({key: value for key, value in (params or {}).items() if key in strategy_params})
+
+    start_time = time.perf_counter()
+    bars = load_bars(ts_codes, start_date, end_date)
+    load_duration = time.perf_counter() - start_time
+    if not bars:
+        return {'success': False, 'message': '所选股票没有本地日线数据', 'data': None}
+
+    costs = get_trading_costs()
+    tasks = [
+        (ts_code, dates, opens, closes, strategy, strategy_params, float(initial_capital), costs, include_curve)
+        for ts_code, (dates, opens, closes) in bars.items()
+    ]
+
+    compute_start = time.perf_counter()
+    results, used_workers = _run_tasks(tasks, workers)
+    compute_duration = time.perf_counter() - compute_start
+
+    total_bars = sum(len(task[3]) for task in tasks)
+    symbol_years = total_bars / TRADING_DAYS_PER_YEAR
+    total_duration = time.perf_counter() - start_time
+
+    return {
+        'success': True,
+        'message': f'回测完成，共 {len(results)} 只股票',
+        'data': {
+            'strategy': strategy,
+            'strategy_name': STRATEGIES[strategy]['name'],
+            'params': strategy_params,
+            'results': results,
+            'benchmark': {
+                'symbols': len(tasks),
+                'bars': total_bars,
+                'symbol_years': round(symbol_years, 2),
+                'load_seconds': round(load_duration, 3),
+                'compute_seconds': round(compute_duration, 3),
+                'total_seconds': round(total_duration, 3),
+                'symbol_years_per_sec': round(symbol_years / compute_duration, 2) if compute_duration > 0 else 0,
+                'workers': used_workers,
+            }
+        }
+    }
+
+
+def benchmark(n_symbols=200, years=10, strategy='ma_cross', workers=None):
+    """
+    引擎吞吐基准测试：使用随机游走行情，不依赖数据库
+
+    Returns:
+        dict: 模拟的股票·年数与每秒处理的股票·年数
+    """
+    rng = np.random.default_rng(42)
+    n = years * TRADING_DAYS_PER_YEAR
+    dates = pd.bdate_range(end=datetime.now().date(), periods=n).strftime('%Y-%m-%d').to_numpy()
+
+    tasks = []
+    for i in range(n_symbols):
+        closes = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        opens = closes * (1 + rng.normal(0, 0.005, n))
+        tasks.append((f'{i:06d}.SZ', dates, opens, closes, strategy,
+                      dict(STRATEGIES[strategy]['params']), 100000.0, DEFAULT_COSTS, False))
+
+    workers = workers or os.cpu_count() or 1
+    start_time = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_simulate_task, tasks, chunksize=max(1, n_symbols // (workers * 4))))
+    else:
+        for task in tasks:
+            _simulate_task(task)
+    duration = time.perf_counter() - start_time
+
+    symbol_years = n_symbols * years
+    return {
+        'strategy': strategy,
+        'symbols': n_symbols,
+        'years': years,
+        'workers': workers,
+        'seconds': round(duration, 3),
+        'symbol_years': symbol_years,
+        'symbol_years_per_sec': round(symbol_years / duration, 2) if duration > 0 else 0,
+    }
+
+
+if __name__ == '__main__':
+    """
+    命令行执行方式：
+    python stock/backtest.py benchmark [股票数] [年数] [进程数]
+    """
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        args = [int(arg) for arg in sys.argv[2:5]]
+        n_symbols = args[0] if len(args) > 0 else 200
+        n_years = args[1] if len(args) > 1 else 10
+        n_workers = args[2] if len(args) > 2 else None
+        for name in STRATEGIES:
+            print(benchmark(n_symbols, n_years, name, n_workers))
+    else:
+        print("请指定命令：benchmark")
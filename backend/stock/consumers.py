@@ -5,6 +5,7 @@ WebSocket消费者，用于实时推送股票数据
 import json
 import asyncio
 from datetime import datetime
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
@@ -12,7 +13,8 @@ from django.core.exceptions import ObjectDoesNotExist
 from stock.models import StockBasic, StockDaily
 from stock.services import RealTimeDataService
 from user.models import SysUser
-from utils.jwt_helper import decode_jwt_token
+from utils.jwt_helper import claims_trusted, decode_jwt_token, get_claimed_roles
+from utils.permissions import get_user_role_info
 
 
 class StockRealTimeConsumer(AsyncWebsocketConsumer):
@@ -25,7 +27,7 @@ class StockRealTimeConsumer(AsyncWebsocketConsumer):
         self.room_group_name = f'stock_realtime_{self.room_name}'
         
         # 验证用户身份（可选）
-        self.user = await self.get_user_from_token()
+        self.user = await database_sync_to_async(self.get_user_from_token)()
         
         # 加入房间组
         await self.channel_layer.group_add(
@@ -196,6 +198,19 @@ class StockRealTimeConsumer(AsyncWebsocketConsumer):
                 'timestamp': datetime.now().isoformat()
             }))
 
+        # 推送订阅股票的新增相关新闻
+        last_news_id = getattr(self, 'last_stock_news_id', 0)
+        stock_news = await database_sync_to_async(self._get_stock_news_sync)(
+            list(self.subscribed_stocks), last_news_id
+        )
+        if stock_news:
+            self.last_stock_news_id = max(news['id'] for news in stock_news)
+            await self.send(text_data=json.dumps({
+                'type': 'stock_news',
+                'data': stock_news,
+                'timestamp': datetime.now().isoformat()
+            }))
+
     async def push_hot_stocks(self):
         """推送热门股票数据"""
         try:
@@ -272,41 +287,82 @@ class StockRealTimeConsumer(AsyncWebsocketConsumer):
             return []
 
     def _get_latest_news_sync(self, limit):
-        """获取最新新闻的同步方法"""
+        """获取最新新闻的同步方法（读新闻列表缓存，每个连接每5秒调用一次）"""
         try:
-            from trading.models import MarketNews
-            
-            latest_news = MarketNews.objects.order_by('-publish_time')[:limit]
-            news_list = []
-            
-            for news in latest_news:
-                news_list.append({
-                    'id': news.id,
-                    'title': news.title,
-                    'source': news.source,
-                    'category': news.category,
-                    'publish_time': news.publish_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'summary': news.content[:100] + '...' if len(news.content) > 100 else news.content,
-                })
-            
-            return news_list
+            from trading.news_feed import get_latest_news
+
+            return [{
+                'id': news['id'],
+                'title': news['title'],
+                'source': news['source'],
+                'category': news['category'],
+                'publish_time': news['publish_time'],
+                'summary': news['summary'],
+            } for news in get_latest_news(limit)]
+        except Exception as e:
+            return []
+
+    def _get_stock_news_sync(self, ts_codes, after_id=0, limit=5):
+        """
+        获取指定股票ID大于after_id的相关新闻（走新闻-股票关联表索引）
+
+        游标按新闻ID推进：首次推送（after_id为0）取最新的几条，之后按ID升序取游标之后的新闻，
+        超出limit的留到下一次推送，不会被跳过
+        """
+        try:
+            from trading.models import MarketNewsStock
+
+            links = MarketNewsStock.objects.filter(
+                ts_code__in=ts_codes, news_id__gt=after_id, news__is_published=True
+            ).select_related('news').order_by('news_id' if after_id else '-news_id')[:limit * 2]
+
+            news_map = {}
+            for link in links:
+                news = news_map.get(link.news_id)
+                if news is None:
+                    if len(news_map) >= limit:
+                        continue
+                    news = news_map[link.news_id] = {
+                        'id': link.news.id,
+                        'title': link.news.title,
+                        'source': link.news.source,
+                        'category': link.news.category,
+                        'publish_time': link.news.publish_time.strftime('%Y-%m-%d %H:%M:%S'),
+                        'ts_codes': [],
+                    }
+                news['ts_codes'].append(link.ts_code)
+            return sorted(news_map.values(), key=lambda news: news['id'], reverse=True)
         except Exception as e:
             return []
 
-    @database_sync_to_async
     def get_user_from_token(self):
-        """从JWT token获取用户（可选功能）"""
+        """
+        从JWT token获取用户（可选功能）
+        
+        token经已验证缓存校验（可能访问Redis黑名单，需在线程中调用），声明可信时用户信息直接取自token，
+        否则从数据库/缓存读取账户状态和角色
+        """
         try:
-            # 从查询参数或头部获取token
-            query_params = dict(self.scope.get('query_string', b'').decode().split('&'))
-            token = query_params.get('token')
+            # 从查询参数获取token
+            query_params = parse_qs(self.scope.get('query_string', b'').decode())
+            token = (query_params.get('token') or [None])[0]
             
             if token:
                 payload = decode_jwt_token(token)
-                if payload:
-                    user = SysUser.objects.get(id=payload['user_id'])
-                    return user
-        except:
+                if not payload:
+                    return None
+                if claims_trusted(payload):
+                    status = payload.get('status', 0)
+                else:
+                    status = SysUser.objects.filter(id=payload['user_id']).values_list('status', flat=True).first()
+                if status == 0:
+                    claimed_roles = get_claimed_roles(payload)
+                    return {
+                        'user_id': payload['user_id'],
+                        'username': payload.get('username'),
+                        'roles': (claimed_roles or get_user_role_info(payload['user_id']))[0],
+                    }
+        except Exception:
             pass
         return None
 
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+指数数据 - 指数日线同步到本地 IndexDaily，K线从本地读取
+
+- 同步：按 INDEX_DATA['UNIVERSE'] 配置的指数，从本地最新交易日之后增量拉取，批量写入
+- 读取：与个股共用 stock.lifecycle 的列式读取和 views.calculate_technical_indicators 指标计算；
+  本地数据落后于最近一个应有数据的交易日时按需补齐（同一指数 TOP_UP_INTERVAL 内最多补齐一次），
+  其余请求不访问 Tushare
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+INDEX_FIELDS = 'ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
+UPDATE_FIELDS = ['open', 'high', 'low', 'close', 'pre_close', 'change', 'pct_chg', 'vol', 'amount']
+TOP_UP_KEY = 'index:topup:{ts_code}'
+
+# 各周期读取的自然日数（按K线条数换算，留出节假日余量）
+PERIOD_DAYS = {'daily': 2, 'weekly': 8, 'monthly': 32}
+
+
+def _month_end_rule():
+    """月末频率别名：pandas 2.2 起为 'ME'（'M' 已弃用），更早的版本只支持 'M'"""
+    try:
+        pd.tseries.frequencies.to_offset('ME')
+        return 'ME'
+    except ValueError:
+        return 'M'
+
+
+PERIOD_RULES = {'weekly': 'W-FRI', 'monthly': _month_end_rule()}
+
+
+def get_index_config(name, default=None):
+    return getattr(settings, 'INDEX_DATA', {}).get(name, default)
+
+
+def get_index_universe():
+    """{指数代码: 指数名称}"""
+    return get_index_config('UNIVERSE', {})
+
+
+def is_index(ts_code):
+    return ts_code in get_index_universe()
+
+
+# ==================== 同步 ====================
+
+def _latest_local_dates(ts_codes):
+    from stock.models import IndexDaily
+
+    rows = IndexDaily.objects.filter(ts_code__in=ts_codes).values('ts_code').annotate(latest=Max('trade_date'))
+    return {row['ts_code']: row['latest'] for row in rows}
+
+
+def _save_index_frame(df):
+    """批量写入指数日线，已存在的 (ts_code, trade_date) 覆盖更新"""
+    from stock.models import IndexDaily
+
+    df = df.astype(object).where(pd.notna(df), None)
+    objs = [
+        IndexDaily(
+            ts_code=row['ts_code'],
+            trade_date=datetime.strptime(str(row['trade_date']), '%Y%m%d').date(),
+            **{field: row[field] for field in UPDATE_FIELDS}
+        )
+        for row in df.to_dict('records')
+    ]
+    IndexDaily.objects.bulk_create(
+        objs, batch_size=1000, update_conflicts=True,
+        unique_fields=['ts_code', 'trade_date'], update_fields=UPDATE_FIELDS,
+    )
+    return len(objs)
+
+
+def sync_index_daily(ts_codes=None, full=False):
+    """
+    增量同步指数日线
+
+    Args:
+        ts_codes: 指数代码列表，默认为配置的全部指数
+        full: 忽略本地数据，重新同步 HISTORY_DAYS 天
+
+    Returns:
+        dict: {'success', 'message', 'data': {指数代码: 写入条数}}
+    """
+    from stock.tushare_gateway import tushare_gateway as pro
+
+    if not pro:
+        return {'success': False, 'message': 'TuShare API未配置或token无效', 'data': {}}
+
+    start_time = time.perf_counter()
+    ts_codes = list(ts_codes or get_index_universe())
+    today = timezone.localdate()
+    history_start = today - timedelta(days=get_index_config('HISTORY_DAYS', 365 * 3))
+    latest_dates = {} if full else _latest_local_dates(ts_codes)
+
+    saved = {}
+    errors = []
+    for ts_code in ts_codes:
+        latest = latest_dates.get(ts_code)
+        start_date = latest + timedelta(days=1) if latest else history_start
+        if start_date > today:
+            saved[ts_code] = 0
+            continue
+        try:
+            df = pro.index_daily(
+                ts_code=ts_code,
+                start_date=start_date.strftime('%Y%m%d'),
+                end_date=today.strftime('%Y%m%d'),
+                fields=INDEX_FIELDS,
+            )
+            saved[ts_code] = _save_index_frame(df) if df is not None and not df.empty else 0
+        except Exception as e:
+            logger.error('index_data ts_code=%s result=sync_failed error=%s', ts_code, e)
+            errors.append(ts_code)
+
+    logger.info('index_data result=synced indices=%s rows=%s failed=%s duration=%.3f',
+                len(ts_codes), sum(saved.values()), len(errors), time.perf_counter() - start_time)
+    message = f'指数日线同步完成：{len(saved)}个指数，写入{sum(saved.values())}条'
+    if errors:
+        message += f'，失败: {",".join(errors)}'
+    return {'success': not errors, 'message': message, 'data': saved}
+
+
+def expected_latest_trade_date():
+    """本地应有数据的最近交易日：当日数据发布后为今天，否则为上一交易日"""
+    from stock.models import TradeCal
+
+    now = timezone.localtime()
+    today = now.date()
+    include_today = now.hour >= get_index_config('PUBLISH_HOUR', 16)
+    queryset = TradeCal.objects.filter(exchange='SSE', is_open=True)
+    queryset = queryset.filter(cal_date__lte=today) if include_today else queryset.filter(cal_date__lt=today)
+    latest = queryset.aggregate(latest=Max('cal_date'))['latest']
+    # 没有交易日历时按自然日判断
+    return latest or (today if include_today else today - timedelta(days=1))
+
+
+def top_up_index(ts_code):
+    """本地数据落后时补齐（同一指数 TOP_UP_INTERVAL 内最多一次）"""
+    latest = _latest_local_dates([ts_code]).get(ts_code)
+    if latest is not None and latest >= expected_latest_trade_date():
+        return False
+    try:
+        if not cache.add(TOP_UP_KEY.format(ts_code=ts_code), 1, get_index_config('TOP_UP_INTERVAL', 600)):
+            return False
+    except Exception as e:
+        logger.warning('index_data result=throttle_unavailable error=%s', e)
+    return sync_index_daily([ts_code])['success']
+
+
+# ==================== 读取 ====================
+
+def _resample(df, period):
+    """日线聚合为周线/月线，日期取周期内最后一个交易日"""
+    df = df.set_index(pd.to_datetime(df['trade_date']))
+    aggregated = df.resample(PERIOD_RULES[period]).agg({
+        'trade_date': 'last',
+        'open': 'first',
+        'high': 'max',
+        'low': 'min',
+        'close': 'last',
+        'pre_close': 'first',
+        'vol': 'sum',
+        'amount': 'sum',
+    }).dropna(subset=['close'])
+    aggregated['change'] = aggregated['close'] - aggregated['pre_close']
+    aggregated['pct_chg'] = aggregated['change'] / aggregated['pre_close'] * 100
+    return aggregated.reset_index(drop=True)
+
+
+def get_index_kline(ts_code, period='daily', limit=100):
+    """
+    指数K线（时间正序），数据格式与个股K线一致
+
+    Returns:
+        list: [{'date', 'open', 'high', 'low', 'close', 'volume', 'amount', 'change', 'pct_chg', 'pre_close'}]
+    """
+    from stock.lifecycle import load_index_frame
+
+    top_up_index(ts_code)
+
+    start_date = timezone.localdate() - timedelta(days=limit * PERIOD_DAYS.get(period, 2) + 30)
+    df = load_index_frame([ts_code], start_date=start_date)
+    if df.empty:
+        return []
+    if period in PERIOD_RULES:
+        df = _resample(df, period)
+    df = df.tail(limit)
+
+    float_columns = ['open', 'high', 'low', 'close', 'amount', 'change', 'pct_chg', 'pre_close']
+    kline = pd.DataFrame({'date': pd.to_datetime(df['trade_date']).dt.strftime('%Y-%m-%d')})
+    for column in float_columns:
+        kline[column] = pd.to_numeric(df[column], errors='coerce').fillna(0.0).round(2)
+    kline['volume'] = pd.to_numeric(df['vol'], errors='coerce').fillna(0).astype('int64')
+    return kline.to_dict('records')
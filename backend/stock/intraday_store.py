@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+分时分钟线存储 - 当日分钟线增量追加，收盘后落库
+
+每只股票当日的分钟线保存在紧凑数组中（分钟用距零点的分钟数表示）。交易时间内每 POLL_INTERVAL 秒
+最多向数据源拉取一次，只解析上次之后的新分钟（以及仍在变化的最后一分钟）并追加到数组。
+数组快照同步写入缓存，其他进程和重启后的进程可直接接续，不必重新下载全天数据；
+收盘后由定时任务补齐并写入 StockMinuteBars，收盘后打开图表直接读库。
+
+接口支持增量查询：传入 since=HH:MM 返回该分钟及之后的数据（该分钟可能仍在变化，需重发覆盖），
+交易日变化时返回全量并标记 reset。
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+from array import array
+from datetime import date, datetime
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 30  # 同一股票向数据源拉取的最小间隔（秒）
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+SESSION_CLOSE_MINUTE = 15 * 60
+REQUEST_TIMEOUT = 10
+
+ACTIVE_SET_KEY = f"{settings.CACHES['default'].get('KEY_PREFIX', '')}:intraday:active"
+
+_TENCENT_DATE = re.compile(r'date:(\d{6})')
+_TENCENT_LINE = re.compile(r'^\s*(\d{2}):?(\d{2}) ([\d.]+) (\d+)')
+
+
+def format_minute(minute):
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+def parse_minute(value):
+    """'09:31' / '0931' -> 571，无法解析时返回None"""
+    digits = (value or '').replace(':', '').strip()
+    if len(digits) < 4 or not digits[:4].isdigit():
+        return None
+    return int(digits[:2]) * 60 + int(digits[2:4])
+
+
+class MinuteSeries(object):
+    """单只股票单个交易日的分钟线"""
+
+    __slots__ = ('ts_code', 'trade_date', 'source', 'raw_count', 'minutes', 'prices', 'volumes',
+                 'avg_prices', 'fetched_at')
+
+    def __init__(self, ts_code, trade_date, source=None):
+        self.ts_code = ts_code
+        self.trade_date = trade_date
+        self.source = source
+        self.raw_count = 0  # 数据源原始行数，下次从最后一行开始解析
+        self.minutes = array('H')
+        self.prices = array('d')
+        self.volumes = array('d')
+        self.avg_prices = array('d')
+        self.fetched_at = 0.0
+
+    def __len__(self):
+        return len(self.minutes)
+
+    @property
+    def last_minute(self):
+        return self.minutes[-1] if self.minutes else None
+
+    def is_complete(self):
+        return bool(self.minutes) and self.minutes[-1] >= SESSION_CLOSE_MINUTE
+
+    def merge(self, bars):
+        """合并按时间排序的 (分钟, 价格, 成交量, 均价)：最后一分钟覆盖，新分钟追加"""
+        appended = 0
+        for minute, price, volume, avg_price in bars:
+            last = self.last_minute
+            if last is not None and minute < last:
+                continue
+            if last is not None and minute == last:
+                self.prices[-1], self.volumes[-1], self.avg_prices[-1] = price, volume, avg_price
+                continue
+            self.minutes.append(minute)
+            self.prices.append(price)
+            self.volumes.append(volume)
+            self.avg_prices.append(avg_price)
+            appended += 1
+        return appended
+
+    def to_dict(self, since=None):
+        """since（分钟数）及之后的数据，包含 since 这一分钟（客户端按时间覆盖最后一根）"""
+        start = bisect.bisect_left(self.minutes, since) if since is not None else 0
+        return {
+            'time': [format_minute(minute) for minute in self.minutes[start:]],
+            'price': self.prices[start:].tolist(),
+            'volume': self.volumes[start:].tolist(),
+            'avg_price': self.avg_prices[start:].tolist(),
+        }
+
+    # ---------- 序列化 ----------
+
+    def snapshot(self):
+        return {
+            'trade_date': self.trade_date, 'source': self.source, 'raw_count': self.raw_count,
+            'minutes': self.minutes.tobytes(), 'prices': self.prices.tobytes(),
+            'volumes': self.volumes.tobytes(), 'avg_prices': self.avg_prices.tobytes(),
+            'fetched_at': self.fetched_at,
+        }
+
+    @classmethod
+    def from_snapshot(cls, ts_code, data):
+        series = cls(ts_code, data['trade_date'], data.get('source'))
+        series.raw_count = data.get('raw_count', 0)
+        series.fetched_at = data.get('fetched_at', 0.0)
+        for field in ('minutes', 'prices', 'volumes', 'avg_prices'):
+            getattr(series, field).frombytes(bytes(data[field]))
+        return series
+
+
+# ==================== 数据源 ====================
+# 每个数据源返回 (交易日, 原始行数, [(分钟, 价格, 成交量, 均价)])，只解析 start 行之后的数据
+
+def _fetch_eastmoney(ts_code, start):
+    market = {'SZ': '0', 'SH': '1'}.get(ts_code.split('.')[-1])
+    if market is None:
+        return None
+    response = requests.get(
+        'http://push2his.eastmoney.com/api/qt/stock/trends2/get',
+        params={
+            'secid': f"{market}.{ts_code.split('.')[0]}",
+            'fields1': 'f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f11,f12,f13',
+            'fields2': 'f51,f52,f53,f54,f55,f56,f57,f58',
+            'iscr': '0',
+        },
+        timeout=REQUEST_TIMEOUT,
+    )
+    if response.status_code != 200:
+        return None
+    trends = ((response.json() or {}).get('data') or {}).get('trends') or []
+    if not trends:
+        return None
+
+    # 行格式：2025-09-12 09:31,开,收,高,低,成交量,成交额,均价
+    bars = []
+    for line in trends[start:]:
+        parts = line.split(',', 8)
+        if len(parts) < 8 or len(parts[0]) < 16:
+            continue
+        minute = int(parts[0][11:13]) * 60 + int(parts[0][14:16])
+        bars.append((minute, float(parts[2]), float(parts[5]), float(parts[7])))
+    trade_date = datetime.strptime(trends[-1][:10], '%Y-%m-%d').date()
+    return trade_date, len(trends), bars
+
+
+def _fetch_tencent(ts_code, start):
+    code, _, market = ts_code.partition('.')
+    if market not in ('SZ', 'SH'):
+        return None
+    response = requests.get(
+        f'http://data.gtimg.cn/flashdata/hushen/minute/{market.lower()}{code}.js',
+        timeout=REQUEST_TIMEOUT,
+    )
+    if response.status_code != 200 or not response.text:
+        return None
+    date_match = _TENCENT_DATE.search(response.text)
+    lines = [match for match in map(_TENCENT_LINE.match, response.text.split('\n')) if match]
+    if not date_match or not lines:
+        return None
+
+    # 行格式：0931 12.34 累计成交量（手）
+    bars = []
+    previous_volume = float(lines[start - 1].group(4)) if start > 0 else 0.0
+    for match in lines[start:]:
+        cumulative = float(match.group(4))
+        bars.append((int(match.group(1)) * 60 + int(match.group(2)), float(match.group(3)),
+                     cumulative - previous_volume, 0.0))
+        previous_volume = cumulative
+    trade_date = datetime.strptime(date_match.group(1), '%y%m%d').date()
+    return trade_date, len(lines), bars
+
+
+def _fetch_tushare(ts_code, start):
+    """逐笔成交聚合为分钟线（数据源只能全量获取，不支持增量）"""
+    import tushare as ts
+    from chinese_calendar import is_workday
+
+    today = date.today()
+    if not is_workday(today):
+        return None
+    df = ts.get_today_ticks(ts_code.split('.')[0])
+    if df is None or df.empty:
+        return None
+
+    minute_bars = {}
+    for tick_time, price, volume in zip(df['time'], df['price'], df['vol'] if 'vol' in df else [0] * len(df)):
+        minute = parse_minute(str(tick_time))
+        if minute is None:
+            continue
+        _, total_volume, _ = minute_bars.get(minute, (0.0, 0.0, 0.0))
+        minute_bars[minute] = (float(price), total_volume + float(volume or 0), 0.0)
+    bars = [(minute,) + values for minute, values in sorted(minute_bars.items())]
+    return today, 0, bars
+
+
+# 优先级：东方财富 > 腾讯 > Tushare
+SOURCES = (
+    ('eastmoney', _fetch_eastmoney),
+    ('tencent', _fetch_tencent),
+    ('tushare', _fetch_tushare),
+)
+
+
+# ==================== 存储 ====================
+
+class IntradayStore(object):
+    """分时分钟线存储"""
+
+    def __init__(self):
+        self._series = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, ts_code):
+        with self._locks_guard:
+            return self._locks.setdefault(ts_code, threading.Lock())
+
+    @staticmethod
+    def _snapshot_key(ts_code):
+        return f'intraday:series:{ts_code}'
+
+    def _load(self, ts_code):
+        """本进程 -> 缓存快照 -> 已落库的最近交易日"""
+        series = self._series.get(ts_code)
+        if series is not None:
+            return series
+        try:
+            data = cache.get(self._snapshot_key(ts_code))
+            if data:
+                series = MinuteSeries.from_snapshot(ts_code, data)
+        except Exception as e:
+            logger.warning('intraday_store result=snapshot_unavailable ts_code=%s error=%s', ts_code, e)
+        if series is None:
+            series = self._load_persisted(ts_code)
+        if series is not None:
+            self._series[ts_code] = series
+        return series
+
+    @staticmethod
+    def _load_persisted(ts_code, trade_date=None):
+        from stock.models import StockMinuteBars
+
+        queryset = StockMinuteBars.objects.filter(ts_code=ts_code)
+        if trade_date:
+            queryset = queryset.filter(trade_date=trade_date)
+        row = queryset.order_by('-trade_date').first()
+        if row is None:
+            return None
+        series = MinuteSeries.from_snapshot(ts_code, {
+            'trade_date': row.trade_date, 'source': row.source,
+            'minutes': row.minutes, 'prices': row.prices, 'volumes': row.volumes, 'avg_prices': row.avg_prices,
+            'fetched_at': row.update_time.timestamp(),
+        })
+        # 落库数据不再按原始行号增量解析
+        series.source = None
+        return series
+
+    def _save_snapshot(self, series):
+        try:
+            cache.set(self._snapshot_key(series.ts_code), series.snapshot(), SNAPSHOT_TIMEOUT)
+            from django_redis import get_redis_connection
+
+            redis_conn = get_redis_connection('default')
+            redis_conn.sadd(ACTIVE_SET_KEY, series.ts_code)
+            redis_conn.expire(ACTIVE_SET_KEY, SNAPSHOT_TIMEOUT)
+        except Exception as e:
+            logger.debug('intraday_store result=snapshot_failed ts_code=%s error=%s', series.ts_code, e)
+
+    def _should_poll(self, series):
+        from stock.services import RealTimeDataService
+
+        if series is None:
+            return True
+        if time.time() - series.fetched_at < POLL_INTERVAL:
+            return False
+        # 收盘后数据已完整时不再拉取
+        return RealTimeDataService.is_trading_time() or not series.is_complete()
+
+    @staticmethod
+    def _fetch(source_name, fetch, ts_code, start):
+        try:
+            return fetch(ts_code, start)
+        except Exception as e:
+            logger.warning('intraday_store source=%s ts_code=%s result=error error=%s', source_name, ts_code, e)
+            return None
+
+    def refresh(self, ts_code, force=False):
+        """按需从数据源拉取新分钟并追加，返回最新的分钟线（无数据时为None）"""
+        series = self._load(ts_code)
+        if not force and not self._should_poll(series):
+            return series
+
+        with self._lock_for(ts_code):
+            series = self._series.get(ts_code, series)
+            if not force and not self._should_poll(series):
+                return series
+
+            for source_name, fetch in SOURCES:
+                # 同一数据源同一交易日从上次最后一行开始解析（最后一分钟仍在变化，需重新解析）
+                resume = series is not None and series.source == source_name and series.raw_count > 0
+                result = self._fetch(source_name, fetch, ts_code, series.raw_count - 1 if resume else 0)
+                if result and resume and result[0] != series.trade_date:
+                    # 已进入新交易日，按行号续读的结果不完整，重新全量解析
+                    resume = False
+                    result = self._fetch(source_name, fetch, ts_code, 0)
+                if not result:
+                    continue
+
+                trade_date, raw_count, bars = result
+                if not resume:
+                    # 新交易日或切换数据源：数据源返回的是全量，重建
+                    series = MinuteSeries(ts_code, trade_date, source_name)
+                appended = series.merge(bars)
+                series.raw_count = raw_count
+                series.fetched_at = time.time()
+                self._series[ts_code] = series
+                self._save_snapshot(series)
+                logger.debug('intraday_store source=%s ts_code=%s parsed=%s appended=%s bars=%s',
+                             source_name, ts_code, len(bars), appended, len(series))
+                return series
+
+            if series is not None:
+                # 全部数据源失败时沿用已有数据，间隔后再试
+                series.fetched_at = time.time()
+            return series
+
+    def get_series(self, ts_code, since=None, trade_date=None):
+        """
+        获取分时数据
+
+        Args:
+            since: 'HH:MM'，只返回该分钟及之后的数据
+            trade_date: 客户端已有数据的交易日，与当前交易日不一致时返回全量
+
+        Returns:
+            dict: {'success', 'data': {'time', 'price', 'volume', 'avg_price', 'date', 'last_time', 'reset'},
+                   'source', 'count', 'date'}
+        """
+        series = self.refresh(ts_code)
+        if series is None or not len(series):
+            return {'success': False, 'message': '所有数据源都无法获取分时数据，请稍后重试', 'data': None}
+
+        since_minute = parse_minute(since) if since else None
+        reset = since_minute is None or (trade_date is not None and str(trade_date) != str(series.trade_date))
+        data = series.to_dict(None if reset else since_minute)
+        data.update({
+            'date': str(series.trade_date),
+            'last_time': format_minute(series.last_minute),
+            'reset': reset,
+        })
+        return {
+            'success': True,
+            'data': data,
+            'source': series.source or 'database',
+            'count': len(data['time']),
+            'date': str(series.trade_date),
+        }
+
+    # ---------- 落库 ----------
+
+    @staticmethod
+    def persist(series):
+        from stock.models import StockMinuteBars
+
+        StockMinuteBars.objects.update_or_create(
+            ts_code=series.ts_code, trade_date=series.trade_date,
+            defaults={
+                'source': series.source,
+                'bar_count': len(series),
+                'minutes': series.minutes.tobytes(),
+                'prices': series.prices.tobytes(),
+                'volumes': series.volumes.tobytes(),
+                'avg_prices': series.avg_prices.tobytes(),
+            }
+        )
+
+    def persist_session(self):
+        """收盘后调用：补齐当日被查看过的股票的分钟线并落库"""
+        try:
+            from django_redis import get_redis_connection
+
+            redis_conn = get_redis_connection('default')
+            ts_codes = sorted(code.decode() if isinstance(code, bytes) else code
+                              for code in redis_conn.smembers(ACTIVE_SET_KEY))
+        except Exception as e:
+            logger.warning('intraday_store result=active_set_unavailable error=%s', e)
+            ts_codes = sorted(self._series)
+
+        persisted = 0
+        for ts_code in ts_codes:
+            try:
+                series = self._load(ts_code)
+                if series is None or not series.is_complete():
+                    series = self.refresh(ts_code, force=True)
+                if series is not None and len(series):
+                    self.persist(series)
+                    persisted += 1
+            except Exception as e:
+                logger.error('intraday_store result=persist_failed ts_code=%s error=%s', ts_code, e)
+        logger.info('intraday_store result=persisted symbols=%s persisted=%s', len(ts_codes), persisted)
+        return persisted
+
+
+intraday_store = IntradayStore()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+数据生命周期管理 - 热数据留库、冷数据按时间分区归档为Parquet
+
+- 日线（stock_daily）：数据库只保留最近 STOCK_DAILY_HOT_DAYS 天，更早的数据按年归档
+- 分时（stock_ticks）：只保留最近 TICK_HOT_DAYS 天，更早的数据按月归档
+  （见 QuantitativeDataService.archive_tick_data）
+
+每个分区一个 zstd 压缩的 Parquet 文件，按 (ts_code, 时间) 排序写入，行组统计信息可用于
+按股票代码裁剪；分区清单记录在 DataPartition 表中。范围读取先按分区日期区间裁剪，
+只打开与查询区间相交的分区文件，查询区间全部落在热数据内时不读取任何归档文件。
+归档先写文件、再删库中数据，重复执行时按主键去重合并，中途失败可直接重跑。
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PARQUET_COMPRESSION = 'zstd'
+PARQUET_ROW_GROUP_SIZE = 100000
+
+DATASET_STOCK_DAILY = 'stock_daily'
+DATASET_TICK = 'tick'
+
+DAILY_COLUMNS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close',
+                 'change', 'pct_chg', 'vol', 'amount']
+DAILY_KEY = ['ts_code', 'trade_date']
+DAILY_FLOAT_COLUMNS = ['open', 'high', 'low', 'close', 'pre_close', 'change', 'pct_chg', 'amount']
+
+
+def get_lifecycle_config(name, default=None):
+    return getattr(settings, 'DATA_LIFECYCLE', {}).get(name, default)
+
+
+def get_archive_dir():
+    return Path(get_lifecycle_config('ARCHIVE_DIR', Path(settings.BASE_DIR) / 'data' / 'archive'))
+
+
+def _to_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return pd.to_datetime(value).date()
+
+
+# ==================== 分区读写 ====================
+
+def write_partition(dataset, partition_key, df, key_columns, start_date, end_date):
+    """
+    写入一个归档分区，已存在时与原文件合并（按key_columns去重，新数据优先）
+
+    Returns:
+        int: 分区总行数
+    """
+    from stock.models import DataPartition
+
+    relative_path = Path(dataset) / f'{partition_key}.parquet'
+    path = get_archive_dir() / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    existing = DataPartition.objects.filter(dataset=dataset, partition_key=partition_key).first()
+    if existing:
+        start_date = min(start_date, existing.start_date)
+        end_date = max(end_date, existing.end_date)
+    if path.exists():
+        df = pd.concat([pd.read_parquet(path, engine='pyarrow'), df], ignore_index=True)
+
+    df = df.drop_duplicates(subset=key_columns, keep='last').sort_values(key_columns, ignore_index=True)
+
+    # 先写临时文件再替换，读取方不会看到写了一半的文件；临时文件名带进程和线程号，并发归档互不覆盖
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    df.to_parquet(tmp_path, engine='pyarrow', compression=PARQUET_COMPRESSION,
+                  index=False, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+
+    DataPartition.objects.update_or_create(
+        dataset=dataset, partition_key=partition_key,
+        defaults={
+            'path': relative_path.as_posix(),
+            'start_date': start_date,
+            'end_date': end_date,
+            'row_count': len(df),
+            'file_size': path.stat().st_size,
+        }
+    )
+    return len(df)
+
+
+def read_partitions(dataset, start_date=None, end_date=None, filters=None, columns=None):
+    """
+    读取与日期区间相交的归档分区
+
+    Args:
+        filters: pyarrow过滤条件（如 [('ts_code', 'in', [...])]），用于行组裁剪
+        columns: 读取的列，None为全部
+
+    Returns:
+        DataFrame: 无相交分区时为空表
+    """
+    from stock.models import DataPartition
+
+    partitions = DataPartition.objects.filter(dataset=dataset)
+    if start_date:
+        partitions = partitions.filter(end_date__gte=start_date)
+    if end_date:
+        partitions = partitions.filter(start_date__lte=end_date)
+
+    archive_dir = get_archive_dir()
+    frames = []
+    for partition in partitions.order_by('start_date'):
+        path = archive_dir / partition.path
+        if not path.exists():
+            logger.warning('data_lifecycle result=partition_missing dataset=%s partition=%s', dataset, partition.partition_key)
+            continue
+        frames.append(pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filters or None))
+
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(frames, ignore_index=True)
+
+
+# ==================== 日线 ====================
+
+def _normalize_daily(df):
+    """数值列统一为浮点（成交量为可空整数），与归档文件的列类型一致"""
+    float_columns = [column for column in DAILY_FLOAT_COLUMNS if column in df.columns]
+    if float_columns:
+        df[float_columns] = df[float_columns].apply(pd.to_numeric, errors='coerce')
+    if 'vol' in df.columns:
+        df['vol'] = pd.to_numeric(df['vol'], errors='coerce').astype('Int64')
+    return df
+
+
+def _query_frame(model, ts_codes, start_date, end_date, columns):
+    """按代码和日期区间读取日线表（StockDaily/IndexDaily）为DataFrame"""
+    queryset = model.objects.filter(ts_code__in=ts_codes)
+    if start_date:
+        queryset = queryset.filter(trade_date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(trade_date__lte=end_date)
+    return _normalize_daily(
+        pd.DataFrame.from_records(list(queryset.order_by().values_list(*columns)), columns=columns)
+    )
+
+
+def archive_stock_daily(hot_days=None):
+    """
+    把热数据窗口之前的日线按年归档为Parquet并从数据库删除
+
+    Returns:
+        dict: {'success', 'message', 'data': {'partitions': {年份: 归档行数}, 'deleted'}}
+    """
+    from stock.models import StockDaily
+
+    start_time = time.perf_counter()
+    if hot_days is None:
+        hot_days = get_lifecycle_config('STOCK_DAILY_HOT_DAYS', 365)
+    cutoff = timezone.localdate() - timedelta(days=hot_days)
+
+    partitions = {}
+    deleted = 0
+    try:
+        for year_start in StockDaily.objects.filter(trade_date__lt=cutoff).dates('trade_date', 'year'):
+            year_end = min(date(year_start.year, 12, 31), cutoff - timedelta(days=1))
+            queryset = StockDaily.objects.filter(trade_date__gte=year_start, trade_date__lte=year_end)
+
+            df = pd.DataFrame.from_records(
+                list(queryset.order_by().values_list(*DAILY_COLUMNS)), columns=DAILY_COLUMNS
+            )
+            if df.empty:
+                continue
+            df = _normalize_daily(df)
+
+            # 分区清单更新与删除库中数据在同一事务内，删除失败时清单回滚，库中数据仍完整
+            with transaction.atomic():
+                write_partition(DATASET_STOCK_DAILY, str(year_start.year), df, DAILY_KEY,
+                                df['trade_date'].min(), df['trade_date'].max())
+                year_deleted, _ = queryset.delete()
+            partitions[year_start.year] = len(df)
+            deleted += year_deleted
+            logger.info('data_lifecycle dataset=stock_daily partition=%s archived=%s deleted=%s',
+                        year_start.year, len(df), year_deleted)
+    except Exception as e:
+        logger.error('data_lifecycle dataset=stock_daily result=error error=%s', e)
+        return {'success': False, 'message': f'日线归档失败: {e}', 'data': {'partitions': partitions, 'deleted': deleted}}
+
+    duration = time.perf_counter() - start_time
+    logger.info('data_lifecycle dataset=stock_daily result=done cutoff=%s deleted=%s duration=%.3f',
+                cutoff, deleted, duration)
+    return {
+        'success': True,
+        'message': f'日线归档完成：{len(partitions)}个分区，移出数据库{deleted}条',
+        'data': {'partitions': partitions, 'deleted': deleted},
+    }
+
+
+def load_daily_frame(ts_codes, start_date=None, end_date=None, columns=None):
+    """
+    读取日线（热数据 + 相交的归档分区），按 (ts_code, trade_date) 升序
+
+    Args:
+        columns: 需要的列，总是包含 ts_code 和 trade_date
+
+    Returns:
+        DataFrame
+    """
+    from stock.models import StockDaily
+
+    ts_codes = list(ts_codes)
+    start_date, end_date = _to_date(start_date), _to_date(end_date)
+    columns = list(dict.fromkeys(DAILY_KEY + list(columns or DAILY_COLUMNS)))
+    hot = _query_frame(StockDaily, ts_codes, start_date, end_date, columns)
+
+    # 查询区间全部在热数据窗口内时，分区清单裁剪后不会读取任何文件
+    filters = [('ts_code', 'in', ts_codes)]
+    if start_date:
+        filters.append(('trade_date', '>=', start_date))
+    if end_date:
+        filters.append(('trade_date', '<=', end_date))
+    archived = read_partitions(DATASET_STOCK_DAILY, start_date, end_date, filters=filters, columns=columns)
+
+    if archived.empty:
+        df = hot
+    elif hot.empty:
+        df = archived
+    else:
+        df = pd.concat([archived, hot], ignore_index=True).drop_duplicates(subset=DAILY_KEY, keep='last')
+    return df.sort_values(DAILY_KEY, ignore_index=True)
+
+
+def load_index_frame(ts_codes, start_date=None, end_date=None, columns=None):
+    """
+    读取指数日线，列和排序与 load_daily_frame 一致（指数数据量小，全部保留在库中不归档）
+
+    Returns:
+        DataFrame
+    """
+    from stock.models import IndexDaily
+
+    columns = list(dict.fromkeys(DAILY_KEY + list(columns or DAILY_COLUMNS)))
+    df = _query_frame(IndexDaily, list(ts_codes), _to_date(start_date), _to_date(end_date), columns)
+    return df.sort_values(DAILY_KEY, ignore_index=True)
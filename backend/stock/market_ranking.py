@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+全市场排行 - 基于本地全市场日线快照的涨幅榜、跌幅榜、成交额榜、振幅榜
+
+快照为最近一个全市场交易日全部股票日线的列式数组（numpy），名称和行业来自内存中的 StockBasic 字典；
+排行用 argpartition 部分排序取前 k 名，只对这 k 名排序，不对全市场排序。
+K线查看和单股同步会写入个别股票的当日日线，因此快照日期按覆盖率选择：取股票数不少于上市股票数
+MIN_COVERAGE 的最近交易日，只有少数股票的日期不作为快照。
+每个进程一份快照，所有调用方共享，每 STOCK_DATA_REFRESH_INTERVAL 秒最多检查一次快照日期，
+日期变化或其他进程要求重建（VERSION_KEY 版本号变化）时重建；读取路径只读本地日线，不调用 Tushare。
+全市场日线落后于应有数据的交易日时，由定时任务 stock.tasks.top_up_market_daily 经 Tushare 网关拉取该日全市场日线补齐入库
+（同一交易日 TOP_UP_INTERVAL 内最多补齐一次）。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+DAILY_FIELDS = 'ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
+UPDATE_FIELDS = ['open', 'high', 'low', 'close', 'pre_close', 'change', 'pct_chg', 'vol', 'amount']
+SNAPSHOT_COLUMNS = ['ts_code'] + UPDATE_FIELDS
+TOP_UP_KEY = 'market_ranking:topup:{trade_date}'
+VERSION_KEY = 'market_ranking:version'
+TOP_UP_INTERVAL = 60 * 10
+MIN_COVERAGE = 0.8  # 快照日期的股票数至少为上市股票数的比例
+COVERAGE_LOOKBACK_DAYS = 30  # 从最新日线往前查找全市场交易日的自然日数
+
+# 排行类型: (排序字段, 是否降序, 名称)
+RANKINGS = {
+    'gainers': ('pct_chg', True, '涨幅榜'),
+    'losers': ('pct_chg', False, '跌幅榜'),
+    'turnover': ('amount', True, '成交额榜'),
+    'amplitude': ('amplitude', True, '振幅榜'),
+}
+
+
+def top_k_indices(values, k, descending=True):
+    """
+    部分排序取前k名的下标（NaN不参与排名）
+
+    Returns:
+        ndarray: 按排名顺序的下标
+    """
+    valid = np.flatnonzero(~np.isnan(values))
+    if k <= 0 or not len(valid):
+        return valid[:0]
+    keys = -values[valid] if descending else values[valid]
+    if k < len(valid):
+        part = np.argpartition(keys, k - 1)[:k]
+    else:
+        part = np.arange(len(valid))
+    return valid[part[np.argsort(keys[part], kind='stable')]]
+
+
+class MarketSnapshot(object):
+    """某个交易日的全市场日线快照"""
+
+    def __init__(self, trade_date, df, names):
+        self.trade_date = trade_date
+        self.ts_codes = df['ts_code'].to_numpy(dtype=object)
+        self.columns = {
+            column: pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float) for column in UPDATE_FIELDS
+        }
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.columns['amplitude'] = np.where(
+                self.columns['pre_close'] > 0,
+                (self.columns['high'] - self.columns['low']) / self.columns['pre_close'] * 100,
+                np.nan,
+            )
+        self.names = names
+
+        # 停牌（无成交）或价格无效的股票不参与排行
+        self.tradable = (self.columns['vol'] > 0) & (self.columns['close'] > 0)
+        name_list = [names.get(ts_code, ('', None))[0] for ts_code in self.ts_codes]
+        self.is_st = np.array(['ST' in name.upper() or '退' in name for name in name_list], dtype=bool)
+
+    def __len__(self):
+        return len(self.ts_codes)
+
+    def top(self, kind='gainers', limit=10, exclude_st=True):
+        field, descending, _ = RANKINGS[kind]
+        mask = self.tradable & ~self.is_st if exclude_st else self.tradable
+        values = np.where(mask, self.columns[field], np.nan)
+        return [self.row(i) for i in top_k_indices(values, limit, descending)]
+
+    def row(self, i):
+        ts_code = self.ts_codes[i]
+        name, industry = self.names.get(ts_code, (ts_code, None))
+        values = {column: self.columns[column][i] for column in UPDATE_FIELDS + ['amplitude']}
+        row = {column: 0.0 if np.isnan(value) else round(float(value), 3) for column, value in values.items()}
+        row['vol'] = int(row['vol'])
+        row.update({
+            'ts_code': ts_code,
+            'name': name,
+            'industry': industry or '未分类',
+            'trade_date': self.trade_date.strftime('%Y-%m-%d'),
+        })
+        return row
+
+
+class MarketRanking(object):
+    """全市场排行服务"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._names = None
+        self._checked_at = 0.0
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_refresh_interval():
+        return getattr(settings, 'STOCK_DATA_REFRESH_INTERVAL', 30)
+
+    # ---------- 快照 ----------
+
+    @staticmethod
+    def _load_names():
+        from stock.models import StockBasic
+
+        return {
+            ts_code: (name, industry)
+            for ts_code, name, industry in StockBasic.objects.values_list('ts_code', 'name', 'industry')
+        }
+
+    @staticmethod
+    def _latest_trade_date():
+        """
+        最近一个全市场交易日：股票数不少于上市股票数 MIN_COVERAGE 的最近日期
+
+        无上市股票信息时以回看区间内股票数最多的日期为基准；没有日期达到覆盖率时取股票数最多的日期
+        """
+        from stock.models import StockBasic, StockDaily
+
+        latest = StockDaily.objects.aggregate(latest=Max('trade_date'))['latest']
+        if latest is None:
+            return None
+        counts = list(
+            StockDaily.objects.filter(trade_date__gt=latest - timedelta(days=COVERAGE_LOOKBACK_DAYS))
+            .values_list('trade_date').annotate(stocks=Count('id')).order_by('-trade_date')
+        )
+        listed = StockBasic.objects.filter(list_status='L').count() or max(stocks for _, stocks in counts)
+        for trade_date, stocks in counts:
+            if stocks >= listed * MIN_COVERAGE:
+                return trade_date
+        return max(counts, key=lambda item: item[1])[0]
+
+    def top_up(self):
+        """
+        全市场日线落后于应有数据的交易日时拉取该日全市场日线入库，入库后通知各进程重建快照（定时任务调用）
+
+        Returns:
+            bool: 是否补齐了数据
+        """
+        from stock.index_data import expected_latest_trade_date
+        from stock.models import StockDaily
+        from stock.tushare_gateway import tushare_gateway as pro
+
+        latest = self._latest_trade_date()
+        expected = expected_latest_trade_date()
+        if not pro or (latest is not None and latest >= expected):
+            return False
+        try:
+            if not cache.add(TOP_UP_KEY.format(trade_date=expected), 1, TOP_UP_INTERVAL):
+                return False
+        except Exception as e:
+            logger.warning('market_ranking result=throttle_unavailable error=%s', e)
+
+        try:
+            df = pro.daily(trade_date=expected.strftime('%Y%m%d'), fields=DAILY_FIELDS)
+        except Exception as e:
+            logger.error('market_ranking result=top_up_failed trade_date=%s error=%s', expected, e)
+            return False
+        if df is None or df.empty:
+            return False
+
+        df = df.astype(object).where(pd.notna(df), None)
+        objs = [
+            StockDaily(
+                ts_code=row['ts_code'],
+                trade_date=datetime.strptime(str(row['trade_date']), '%Y%m%d').date(),
+                **{field: row[field] for field in UPDATE_FIELDS}
+            )
+            for row in df.to_dict('records')
+        ]
+        StockDaily.objects.bulk_create(
+            objs, batch_size=1000, update_conflicts=True,
+            unique_fields=['ts_code', 'trade_date'], update_fields=UPDATE_FIELDS,
+        )
+        logger.info('market_ranking result=topped_up trade_date=%s rows=%s', expected, len(objs))
+        self.invalidate()
+        return True
+
+    def _build(self, trade_date):
+        from stock.models import StockDaily
+
+        start_time = time.perf_counter()
+        if self._names is None:
+            self._names = self._load_names()
+        rows = StockDaily.objects.filter(trade_date=trade_date).order_by().values_list(*SNAPSHOT_COLUMNS)
+        snapshot = MarketSnapshot(trade_date, pd.DataFrame.from_records(list(rows), columns=SNAPSHOT_COLUMNS),
+                                  self._names)
+        logger.info('market_ranking result=built trade_date=%s stocks=%s duration=%.3f',
+                    trade_date, len(snapshot), time.perf_counter() - start_time)
+        return snapshot
+
+    def get_snapshot(self):
+        """当前快照（无本地日线时为None）"""
+        if time.time() - self._checked_at < self.get_refresh_interval():
+            return self._snapshot
+
+        with self._lock:
+            if time.time() - self._checked_at < self.get_refresh_interval():
+                return self._snapshot
+            try:
+                version = cache.get(VERSION_KEY)
+            except Exception:
+                version = self._version
+            if version != self._version:
+                self._version = version
+                self._names = None
+                self._snapshot = None
+
+            latest = self._latest_trade_date()
+            if latest is not None and (self._snapshot is None or self._snapshot.trade_date != latest):
+                self._snapshot = self._build(latest)
+            self._checked_at = time.time()
+            return self._snapshot
+
+    def invalidate(self):
+        """股票基本信息或日线批量更新后调用：本进程下次读取时重建，其他进程在下次检查时重建"""
+        version = time.time()
+        try:
+            cache.set(VERSION_KEY, version, None)
+        except Exception as e:
+            logger.warning('market_ranking result=version_update_failed error=%s', e)
+        with self._lock:
+            self._version = version
+            self._names = None
+            self._snapshot = None
+            self._checked_at = 0.0
+
+    # ---------- 排行 ----------
+
+    def top(self, kind='gainers', limit=10, exclude_st=True):
+        """
+        全市场排行
+
+        Args:
+            kind: gainers 涨幅榜 / losers 跌幅榜 / turnover 成交额榜 / amplitude 振幅榜
+            exclude_st: 排除ST和退市整理股票
+
+        Returns:
+            list: [{'ts_code', 'name', 'industry', 'open', 'high', 'low', 'close', 'pre_close', 'change',
+                    'pct_chg', 'vol', 'amount', 'amplitude', 'trade_date'}]
+        """
+        if kind not in RANKINGS:
+            raise ValueError(f'不支持的排行类型: {kind}')
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return []
+        return snapshot.top(kind, limit, exclude_st)
+
+
+market_ranking = MarketRanking()
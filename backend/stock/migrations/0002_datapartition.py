@@ -0,0 +1,55 @@
+# Generated by Django 5.1.1 on 2026-10-19 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DataPartition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dataset", models.CharField(max_length=32, verbose_name="数据集")),
+                (
+                    "partition_key",
+                    models.CharField(max_length=16, verbose_name="分区键"),
+                ),
+                ("path", models.CharField(max_length=255, verbose_name="文件路径")),
+                ("start_date", models.DateField(verbose_name="数据起始日期")),
+                ("end_date", models.DateField(verbose_name="数据截止日期")),
+                ("row_count", models.BigIntegerField(default=0, verbose_name="行数")),
+                (
+                    "file_size",
+                    models.BigIntegerField(default=0, verbose_name="文件大小(字节)"),
+                ),
+                (
+                    "update_time",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "数据归档分区",
+                "verbose_name_plural": "数据归档分区",
+                "db_table": "data_partition",
+                "indexes": [
+                    models.Index(
+                        fields=["dataset", "start_date"],
+                        name="data_partit_dataset_ccf944_idx",
+                    )
+                ],
+                "unique_together": {("dataset", "partition_key")},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.1 on 2026-10-19 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stock", "0002_datapartition"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMinuteBars",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ts_code", models.CharField(max_length=12, verbose_name="TS股票代码")),
+                ("trade_date", models.DateField(verbose_name="交易日期")),
+                (
+                    "source",
+                    models.CharField(
+                        blank=True, max_length=20, null=True, verbose_name="数据来源"
+                    ),
+                ),
+                ("bar_count", models.IntegerField(default=0, verbose_name="分钟数")),
+                ("minutes", models.BinaryField(verbose_name="分钟(距零点分钟数)")),
+                ("prices", models.BinaryField(verbose_name="价格")),
+                ("volumes", models.BinaryField(verbose_name="成交量")),
+                ("avg_prices", models.BinaryField(verbose_name="均价")),
+                (
+                    "update_time",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "个股分钟线",
+                "verbose_name_plural": "个股分钟线",
+                "db_table": "stock_minute_bars",
+                "unique_together": {("ts_code", "trade_date")},
+            },
+        ),
+    ]
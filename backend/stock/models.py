@@ -151,6 +151,52 @@ class IndexDaily(models.Model):
         return f"{self.ts_code} - {self.trade_date}"
 
 
+class StockMinuteBars(models.Model):
+    """个股单日分钟线（收盘后由分时缓存落库，数组以紧凑二进制存储，见 stock.intraday_store）"""
+    ts_code = models.CharField(max_length=12, verbose_name='TS股票代码')
+    trade_date = models.DateField(verbose_name='交易日期')
+    source = models.CharField(max_length=20, null=True, blank=True, verbose_name='数据来源')
+    bar_count = models.IntegerField(default=0, verbose_name='分钟数')
+    minutes = models.BinaryField(verbose_name='分钟(距零点分钟数)')
+    prices = models.BinaryField(verbose_name='价格')
+    volumes = models.BinaryField(verbose_name='成交量')
+    avg_prices = models.BinaryField(verbose_name='均价')
+    update_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'stock_minute_bars'
+        verbose_name = '个股分钟线'
+        verbose_name_plural = verbose_name
+        unique_together = ('ts_code', 'trade_date')
+
+    def __str__(self):
+        return f"{self.ts_code} - {self.trade_date}"
+
+
+class DataPartition(models.Model):
+    """冷数据归档分区清单（每个分区一个Parquet文件）"""
+    dataset = models.CharField(max_length=32, verbose_name='数据集')
+    partition_key = models.CharField(max_length=16, verbose_name='分区键')
+    path = models.CharField(max_length=255, verbose_name='文件路径')
+    start_date = models.DateField(verbose_name='数据起始日期')
+    end_date = models.DateField(verbose_name='数据截止日期')
+    row_count = models.BigIntegerField(default=0, verbose_name='行数')
+    file_size = models.BigIntegerField(default=0, verbose_name='文件大小(字节)')
+    update_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'data_partition'
+        verbose_name = '数据归档分区'
+        verbose_name_plural = verbose_name
+        unique_together = ('dataset', 'partition_key')
+        indexes = [
+            models.Index(fields=['dataset', 'start_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.dataset} - {self.partition_key}"
+
+
 # Serializers
 class StockBasicSerializer(serializers.ModelSerializer):
     create_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", required=False)
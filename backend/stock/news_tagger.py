@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+新闻相关股票识别 - 基于 Aho–Corasick 自动机的股票名称匹配
+
+以全部上市股票的名称、简称（去掉ST等前缀、A股后缀）、公司全称、6位代码和TS代码构建自动机，
+每篇新闻只需线性扫描一遍即可找出其中提到的全部股票，耗时与股票数量无关。
+匹配结果取最左最长且互不重叠的命中，6位代码和TS代码要求两侧不是字母数字，避免匹配到长数字串中间。
+
+自动机在首次使用时构建，同步股票基本信息后通过缓存版本号通知各进程重建。
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, deque
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+MAX_STOCKS_PER_NEWS = 20  # 单篇新闻最多关联股票数（行情汇总类新闻会提到大量股票）
+MIN_NAME_LENGTH = 2
+REBUILD_INTERVAL = 60 * 60 * 6  # 定期重建间隔（秒）
+VERSION_CHECK_INTERVAL = 60
+VERSION_KEY = 'stock:news_tagger:version'
+
+_NAME_PREFIX = re.compile(r'^(s\*st|\*st|st|s)(?=[^a-z0-9])')
+_FULLNAME_SUFFIXES = ('股份有限公司', '有限责任公司', '有限公司')
+
+# 模式类型：代码类模式要求两侧为单词边界
+KIND_NAME = 0
+KIND_CODE = 1
+
+
+def normalize_text(text):
+    """全角转半角并转小写，自动机构建和扫描使用同一规则"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+class AhoCorasick(object):
+    """Aho–Corasick 多模式匹配自动机"""
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: 模式串列表，匹配结果中以下标引用
+        """
+        self.lengths = [len(p) for p in patterns]
+        goto = [{}]
+        outputs = [[]]
+        for pid, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(pid)
+
+        # 广度优先计算失败指针，并把失败链上的输出合并到当前状态
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                outputs[nxt].extend(outputs[fail[nxt]])
+
+        self.goto = goto
+        self.fail = fail
+        self.outputs = [tuple(out) for out in outputs]
+
+    def iter_matches(self, text):
+        """扫描文本，依次产出 (起始位置, 结束位置(不含), 模式下标)"""
+        goto, fail, outputs, lengths = self.goto, self.fail, self.outputs, self.lengths
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                end = pos + 1
+                for pid in outputs[state]:
+                    yield end - lengths[pid], end, pid
+
+
+class StockNewsTagger(object):
+    """新闻相关股票识别器"""
+
+    def __init__(self):
+        self._state = None  # (automaton, pattern_codes, pattern_kinds)，整体替换保证读取无锁
+        self._built_at = 0.0
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # ---------- 构建 ----------
+
+    @staticmethod
+    def _stock_patterns(stock):
+        """股票的主模式（名称、代码）和别名模式（简称、全称）"""
+        name = normalize_text(stock['name']).replace(' ', '')
+        primary = {(name, KIND_NAME), (stock['symbol'], KIND_CODE), (stock['ts_code'].lower(), KIND_CODE)}
+
+        aliases = set()
+        short_name = _NAME_PREFIX.sub('', name)
+        if short_name.endswith('a') and not short_name[-2:-1].isascii():
+            short_name = short_name[:-1]
+        if short_name != name:
+            aliases.add((short_name, KIND_NAME))
+        fullname = normalize_text(stock['fullname']).replace(' ', '')
+        if fullname:
+            aliases.add((fullname, KIND_NAME))
+            for suffix in _FULLNAME_SUFFIXES:
+                if fullname.endswith(suffix):
+                    aliases.add((fullname[:-len(suffix)], KIND_NAME))
+                    break
+
+        valid = lambda item: len(item[0]) >= MIN_NAME_LENGTH
+        return set(filter(valid, primary)), set(filter(valid, aliases)) - primary
+
+    def build(self):
+        """从数据库重建自动机"""
+        from stock.models import StockBasic
+
+        start_time = time.perf_counter()
+        stocks = StockBasic.objects.filter(list_status='L').values('ts_code', 'symbol', 'name', 'fullname')
+
+        primary_owner = {}
+        alias_owners = {}
+        for stock in stocks:
+            primary, aliases = self._stock_patterns(stock)
+            for pattern in primary:
+                primary_owner.setdefault(pattern, set()).add(stock['ts_code'])
+            for pattern in aliases:
+                alias_owners.setdefault(pattern, set()).add(stock['ts_code'])
+
+        # 主模式优先于别名；同一模式对应多只股票时有歧义，丢弃
+        patterns = {}
+        for table in (alias_owners, primary_owner):
+            for pattern, owners in table.items():
+                if len(owners) == 1:
+                    patterns[pattern] = next(iter(owners))
+                elif table is primary_owner:
+                    patterns.pop(pattern, None)
+
+        items = sorted(patterns.items())
+        automaton = AhoCorasick([text for (text, _), _ in items])
+        self._state = (
+            automaton,
+            [ts_code for _, ts_code in items],
+            [kind for (_, kind), _ in items],
+        )
+        self._built_at = time.time()
+        logger.info(
+            'stock_news_tagger result=built patterns=%s states=%s duration=%.3f',
+            len(items), len(automaton.goto), time.perf_counter() - start_time,
+        )
+
+    def invalidate(self):
+        """股票基本信息变更后调用：本进程立即重建，其他进程在下次版本检查时重建"""
+        version = time.time()
+        try:
+            cache.set(VERSION_KEY, version, None)
+        except Exception as e:
+            logger.warning('stock_news_tagger result=version_update_failed error=%s', e)
+        with self._lock:
+            self._version = version
+            self._state = None
+
+    def _ensure_built(self):
+        now = time.time()
+        if self._state is not None and now - self._version_checked_at >= VERSION_CHECK_INTERVAL:
+            self._version_checked_at = now
+            try:
+                version = cache.get(VERSION_KEY)
+            except Exception:
+                version = self._version
+            if version != self._version:
+                self._version = version
+                self._state = None
+
+        state = self._state
+        if state is None or now - self._built_at >= REBUILD_INTERVAL:
+            with self._lock:
+                if self._state is None or time.time() - self._built_at >= REBUILD_INTERVAL:
+                    self.build()
+                state = self._state
+        return state
+
+    # ---------- 识别 ----------
+
+    def tag(self, text, limit=MAX_STOCKS_PER_NEWS):
+        """
+        识别文本中提到的股票
+
+        Returns:
+            list: ts_code列表，按提及次数降序、首次出现位置升序
+        """
+        automaton, pattern_codes, pattern_kinds = self._ensure_built()
+        text = normalize_text(text)
+        if not text:
+            return []
+
+        matches = []
+        for start, end, pid in automaton.iter_matches(text):
+            if pattern_kinds[pid] == KIND_CODE and (
+                (start > 0 and text[start - 1].isascii() and text[start - 1].isalnum())
+                or (end < len(text) and text[end].isascii() and text[end].isalnum())
+            ):
+                continue
+            matches.append((start, -end, pid))
+
+        # 最左最长、互不重叠
+        counts = Counter()
+        first_seen = {}
+        covered_until = 0
+        for start, neg_end, pid in sorted(matches):
+            if start < covered_until:
+                continue
+            covered_until = -neg_end
+            ts_code = pattern_codes[pid]
+            counts[ts_code] += 1
+            first_seen.setdefault(ts_code, start)
+
+        ranked = sorted(counts, key=lambda code: (-counts[code], first_seen[code]))
+        return ranked[:limit]
+
+
+stock_news_tagger = StockNewsTagger()
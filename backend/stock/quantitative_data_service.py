@@ -16,10 +16,71 @@ import logging
 from typing import Dict, List, Optional, Tuple, Any
 import pymysql
 import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from django.conf import settings
+from django.core.cache import cache
+
+from stock.tushare_gateway import tushare_gateway
 
 logger = logging.getLogger(__name__)
 
+DAILY_BAR_TABLE = 'stock_daily_bars'
+TICK_TABLE = 'stock_ticks'
+WRITE_BATCH_SIZE = 1000
+ARCHIVE_FETCH_SIZE = 10000  # 归档时服务端游标每批读取行数
+BATCH_UPDATE_WORKERS = 8
+BATCH_CHECKPOINT_KEY = 'quant:batch_update:done:{date}'
+BATCH_CHECKPOINT_INTERVAL = 50  # 每完成多少只股票保存一次进度
+BATCH_CHECKPOINT_TIMEOUT = 60 * 60 * 48
+
+# 旧的按股票建表：600519_SH（日线）、dailyticks_600519_SH（分时）
+LEGACY_TABLE_PATTERN = re.compile(r'^(dailyticks_)?(\d{6})_(SH|SZ|BJ)$')
+
+
+def _add_months(month_start: date, months: int) -> date:
+    month_index = month_start.year * 12 + month_start.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+class MySQLConnectionPool:
+    """pymysql 连接池：连接复用，取出时 ping 检查并自动重连"""
+    
+    def __init__(self, config: Dict[str, Any], max_size: int = 8, timeout: int = 30):
+        self.config = config
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+    
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError('获取数据库连接超时')
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+                conn.ping(reconnect=True)
+            except queue.Empty:
+                conn = pymysql.connect(**self.config)
+            yield conn
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    conn.close()
+                    conn = None
+            raise
+        finally:
+            if conn is not None and conn.open:
+                self._idle.put(conn)
+            self._slots.release()
+
 class QuantitativeDataService:
     """量化数据服务 - 专业的金融市场数据获取与分析平台"""
     
@@ -28,7 +89,8 @@ class QuantitativeDataService:
         if not self.tushare_token:
             raise ValueError("TUSHARE_TOKEN environment variable is not set")
         ts.set_token(self.tushare_token)
-        self.pro = ts.pro_api()
+        # pro 接口经网关调用：响应缓存、按接口共享限流额度
+        self.pro = tushare_gateway
         
         # 数据库连接配置
         self.db_config = {
@@ -38,6 +100,8 @@ class QuantitativeDataService:
             'database': 'stocktrading',
             'charset': 'utf8mb4'
         }
+        self.pool = MySQLConnectionPool(self.db_config, max_size=BATCH_UPDATE_WORKERS)
+        self._schema_ready = False
     
     def get_stock_holders(self, ts_code: str) -> List[Dict[str, Any]]:
         """
@@ -182,6 +246,8 @@ class QuantitativeDataService:
                     'tick_price': []
                 }
             
+            self._persist_ticks(symbol, df)
+            
             # 转换数据格式
             tick_times = df['time'].tolist()
             tick_prices = df['price'].tolist()
@@ -204,6 +270,17 @@ class QuantitativeDataService:
                 'tick_price': []
             }
     
+    def _persist_ticks(self, symbol: str, df: pd.DataFrame):
+        """把拉取到的今日分时写入分时表（供归档），写库失败不影响行情返回"""
+        from stock.models import StockBasic
+        
+        try:
+            ts_code = StockBasic.objects.filter(symbol=symbol).values_list('ts_code', flat=True).first()
+            if ts_code:
+                self.save_ticks(ts_code, df)
+        except Exception as e:
+            logger.warning(f"保存分时数据失败 {symbol}: {e}")
+    
     def get_history_data(self, ts_code: str, days: int = 250) -> List[List]:
         """
         获取历史K线数据
@@ -395,48 +472,15 @@ class QuantitativeDataService:
             list: 前10热门股票
         """
         try:
-            # 获取今日涨幅榜前10
-            today = datetime.now().strftime('%Y%m%d')
-            
-            # 获取今日行情数据
-            df = self.pro.daily(trade_date=today)
-            
-            if df.empty:
-                # 如果今日无数据，获取最近一个交易日的数据
-                latest_date = self.get_latest_trade_date()
-                if latest_date:
-                    df = self.pro.daily(trade_date=latest_date)
-            
-            if df.empty:
-                return []
-            
-            # 过滤掉涨跌幅为空的数据，按涨跌幅排序
-            df = df.dropna(subset=['pct_chg'])
-            df = df.sort_values('pct_chg', ascending=False)
-            
-            # 取前10
-            top10 = df.head(10)
-            
-            result = []
-            for _, row in top10.iterrows():
-                # 获取股票名称
-                stock_name = self.get_stock_name(row['ts_code'])
-                
-                result.append({
-                    'ts_code': row['ts_code'],
-                    'stock_name': stock_name,
-                    'close': float(row['close']) if row['close'] else 0,
-                    'open': float(row['open']) if row['open'] else 0,
-                    'high': float(row['high']) if row['high'] else 0,
-                    'low': float(row['low']) if row['low'] else 0,
-                    'change': float(row['change']) if row['change'] else 0,
-                    'pct_chg': float(row['pct_chg']) if row['pct_chg'] else 0,
-                    'vol': int(row['vol']) if row['vol'] else 0,
-                    'amount': float(row['amount']) if row['amount'] else 0,
-                    'trade_date': row['trade_date']
-                })
-            
-            return result
+            # 本地全市场快照的涨幅榜（见 stock.market_ranking）
+            from stock.market_ranking import market_ranking
+
+            fields = ['ts_code', 'close', 'open', 'high', 'low', 'change', 'pct_chg', 'vol', 'amount']
+            return [
+                dict({field: row[field] for field in fields}, stock_name=row['name'],
+                     trade_date=row['trade_date'].replace('-', ''))
+                for row in market_ranking.top('gainers', 10, exclude_st=False)
+            ]
             
         except Exception as e:
             logger.error(f"获取涨幅前10股票失败: {e}")
@@ -498,9 +542,107 @@ class QuantitativeDataService:
             logger.error(f"获取最近交易日失败: {e}")
             return datetime.now().strftime('%Y%m%d')
     
+    # ==================== 行情存储（合并表） ====================
+    # 所有股票的日线写入 stock_daily_bars，分时写入 stock_ticks（按月分区），
+    # 主键分别为 (ts_code, trade_date) 和 (ts_code, trade_time)，不再为每只股票建表
+
+    def ensure_schema(self) -> bool:
+        """
+        创建合并后的日线表和分时表（幂等，每个实例只执行一次）
+        
+        Returns:
+            bool: 是否成功
+        """
+        if self._schema_ready:
+            return True
+        
+        # 初始分区：当月之前的数据（含旧表迁移数据）进入 p_history，之后按月分区
+        first_month = date.today().replace(day=1)
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS `{DAILY_BAR_TABLE}` (
+                    `ts_code` varchar(12) NOT NULL,
+                    `trade_date` date NOT NULL,
+                    `open` decimal(10,3) DEFAULT NULL,
+                    `high` decimal(10,3) DEFAULT NULL,
+                    `low` decimal(10,3) DEFAULT NULL,
+                    `close` decimal(10,3) DEFAULT NULL,
+                    `pre_close` decimal(10,3) DEFAULT NULL,
+                    `change` decimal(10,3) DEFAULT NULL,
+                    `pct_chg` decimal(10,3) DEFAULT NULL,
+                    `vol` bigint(20) DEFAULT NULL,
+                    `amount` decimal(15,2) DEFAULT NULL,
+                    `create_time` timestamp DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (`ts_code`, `trade_date`),
+                    KEY `idx_trade_date` (`trade_date`)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """)
+                cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS `{TICK_TABLE}` (
+                    `ts_code` varchar(12) NOT NULL,
+                    `trade_time` datetime NOT NULL,
+                    `price` decimal(10,3) DEFAULT NULL,
+                    `volume` int(11) DEFAULT NULL,
+                    `amount` decimal(15,2) DEFAULT NULL,
+                    `create_time` timestamp DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (`ts_code`, `trade_time`)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                PARTITION BY RANGE COLUMNS(`trade_time`) (
+                    PARTITION p_history VALUES LESS THAN ('{first_month:%Y-%m-%d}'),
+                    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+                )
+                """)
+                conn.commit()
+                cursor.close()
+            self._schema_ready = True
+            self.ensure_tick_partitions()
+            return True
+        except Exception as e:
+            logger.error(f"创建行情表失败: {e}")
+            return False
+    
+    def ensure_tick_partitions(self, months_ahead: int = 2) -> List[str]:
+        """
+        为分时表预建到 months_ahead 个月之后的月分区（从 p_future 中拆分）
+        
+        Returns:
+            list: 新建的分区名
+        """
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME <> 'p_future'",
+                (TICK_TABLE,)
+            )
+            # PARTITION_DESCRIPTION 形如 '2026-11-01'（带引号）
+            bounds = [datetime.strptime(row[0].strip("'")[:10], '%Y-%m-%d').date() for row in cursor.fetchall()]
+            
+            target = _add_months(date.today().replace(day=1), months_ahead + 1)
+            bound = max(bounds) if bounds else date.today().replace(day=1)
+            new_partitions = []
+            while bound < target:
+                next_bound = _add_months(bound, 1)
+                new_partitions.append((f'p{bound:%Y%m}', next_bound))
+                bound = next_bound
+            
+            if new_partitions:
+                definitions = ', '.join(
+                    f"PARTITION {name} VALUES LESS THAN ('{upper:%Y-%m-%d}')" for name, upper in new_partitions
+                )
+                cursor.execute(
+                    f"ALTER TABLE `{TICK_TABLE}` REORGANIZE PARTITION p_future INTO "
+                    f"({definitions}, PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+                )
+                logger.info(f"分时表新建分区: {[name for name, _ in new_partitions]}")
+            cursor.close()
+        return [name for name, _ in new_partitions]
+    
     def create_stock_table(self, ts_code: str) -> bool:
         """
-        创建股票数据表
+        确保股票行情表存在（日线和分时已合并为全市场共用的表，不再按股票建表）
         
         Args:
             ts_code: 股票代码
@@ -508,68 +650,86 @@ class QuantitativeDataService:
         Returns:
             bool: 是否创建成功
         """
-        try:
-            # 连接数据库
-            conn = pymysql.connect(**self.db_config)
+        return self.ensure_schema()
+    
+    def save_daily_bars(self, df: pd.DataFrame) -> int:
+        """
+        批量写入日线（按主键覆盖更新）
+        
+        Args:
+            df: Tushare daily 格式的数据，trade_date 为 YYYYMMDD
+        
+        Returns:
+            int: 写入行数
+        """
+        if df is None or df.empty:
+            return 0
+        self.ensure_schema()
+        
+        df = df.astype(object).where(pd.notna(df), None)
+        rows = [
+            (
+                row['ts_code'], datetime.strptime(str(row['trade_date']), '%Y%m%d').date(),
+                row['open'], row['high'], row['low'], row['close'],
+                row['pre_close'], row['change'], row['pct_chg'], row['vol'], row['amount']
+            )
+            for row in df.to_dict('records')
+        ]
+        return self._executemany(f"""
+            INSERT INTO `{DAILY_BAR_TABLE}`
+            (ts_code, trade_date, open, high, low, close, pre_close, `change`, pct_chg, vol, amount)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            open=VALUES(open), high=VALUES(high), low=VALUES(low),
+            close=VALUES(close), pre_close=VALUES(pre_close),
+            `change`=VALUES(`change`), pct_chg=VALUES(pct_chg),
+            vol=VALUES(vol), amount=VALUES(amount)
+        """, rows)
+    
+    def save_ticks(self, ts_code: str, df: pd.DataFrame, trade_date: date = None) -> int:
+        """
+        批量写入分时成交（同一秒的多笔成交合并：价格取最后一笔，成交量和成交额累加）
+        
+        Args:
+            df: 包含 time(HH:MM:SS)、price，可选 volume/vol、amount 列
+            trade_date: 成交日期，默认今天
+        
+        Returns:
+            int: 写入行数
+        """
+        if df is None or df.empty:
+            return 0
+        self.ensure_schema()
+        
+        trade_date = trade_date or date.today()
+        volume_column = 'volume' if 'volume' in df.columns else 'vol'
+        ticks = pd.DataFrame({
+            'trade_time': pd.to_datetime(trade_date.strftime('%Y-%m-%d ') + df['time'].astype(str), errors='coerce'),
+            'price': pd.to_numeric(df['price'], errors='coerce'),
+            'volume': pd.to_numeric(df[volume_column], errors='coerce') if volume_column in df.columns else 0,
+            'amount': pd.to_numeric(df['amount'], errors='coerce') if 'amount' in df.columns else 0,
+        }).dropna(subset=['trade_time', 'price']).fillna({'volume': 0, 'amount': 0})
+        ticks = ticks.groupby('trade_time', sort=True).agg({'price': 'last', 'volume': 'sum', 'amount': 'sum'})
+        
+        rows = [
+            (ts_code, trade_time.to_pydatetime(), float(price), int(volume), float(amount))
+            for trade_time, price, volume, amount in ticks.itertuples()
+        ]
+        return self._executemany(f"""
+            INSERT INTO `{TICK_TABLE}` (ts_code, trade_time, price, volume, amount)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE price=VALUES(price), volume=VALUES(volume), amount=VALUES(amount)
+        """, rows)
+    
+    def _executemany(self, sql: str, rows: List[tuple], batch_size: int = WRITE_BATCH_SIZE) -> int:
+        """分批 executemany（pymysql 会把 INSERT ... VALUES 合并为多行插入），整体一个事务"""
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
-            
-            # 构建表名
-            if ts_code.endswith('.SH'):
-                table_name = ts_code.replace('.SH', '_SH')
-            elif ts_code.endswith('.SZ'):
-                table_name = ts_code.replace('.SZ', '_SZ')
-            else:
-                table_name = ts_code
-            
-            # 创建股票数据表
-            create_sql = f"""
-            CREATE TABLE IF NOT EXISTS `{table_name}` (
-                `id` int(11) NOT NULL AUTO_INCREMENT,
-                `trade_date` date NOT NULL,
-                `open` decimal(10,3) DEFAULT NULL,
-                `high` decimal(10,3) DEFAULT NULL,
-                `low` decimal(10,3) DEFAULT NULL,
-                `close` decimal(10,3) DEFAULT NULL,
-                `pre_close` decimal(10,3) DEFAULT NULL,
-                `change` decimal(10,3) DEFAULT NULL,
-                `pct_chg` decimal(10,3) DEFAULT NULL,
-                `vol` bigint(20) DEFAULT NULL,
-                `amount` decimal(15,2) DEFAULT NULL,
-                `create_time` timestamp DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (`id`),
-                UNIQUE KEY `uk_trade_date` (`trade_date`)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-            
-            cursor.execute(create_sql)
-            
-            # 创建对应的分时数据表
-            tick_table_name = f"dailyticks_{table_name}"
-            tick_sql = f"""
-            CREATE TABLE IF NOT EXISTS `{tick_table_name}` (
-                `id` int(11) NOT NULL AUTO_INCREMENT,
-                `trade_time` datetime NOT NULL,
-                `price` decimal(10,3) DEFAULT NULL,
-                `volume` int(11) DEFAULT NULL,
-                `amount` decimal(15,2) DEFAULT NULL,
-                `create_time` timestamp DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (`id`),
-                KEY `idx_trade_time` (`trade_time`)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-            
-            cursor.execute(tick_sql)
-            
+            for i in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[i:i + batch_size])
             conn.commit()
             cursor.close()
-            conn.close()
-            
-            logger.info(f"股票表 {table_name} 创建成功")
-            return True
-            
-        except Exception as e:
-            logger.error(f"创建股票表失败 {ts_code}: {e}")
-            return False
+        return len(rows)
     
     def update_stock_daily_data(self, ts_code: str) -> bool:
         """
@@ -591,42 +751,7 @@ class QuantitativeDataService:
             if df.empty:
                 return False
             
-            # 连接数据库
-            conn = pymysql.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            # 构建表名
-            if ts_code.endswith('.SH'):
-                table_name = ts_code.replace('.SH', '_SH')
-            elif ts_code.endswith('.SZ'):
-                table_name = ts_code.replace('.SZ', '_SZ')
-            else:
-                table_name = ts_code
-            
-            # 插入或更新数据
-            for _, row in df.iterrows():
-                insert_sql = f"""
-                INSERT INTO `{table_name}` 
-                (trade_date, open, high, low, close, pre_close, `change`, pct_chg, vol, amount)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                open=VALUES(open), high=VALUES(high), low=VALUES(low), 
-                close=VALUES(close), pre_close=VALUES(pre_close), 
-                `change`=VALUES(`change`), pct_chg=VALUES(pct_chg), 
-                vol=VALUES(vol), amount=VALUES(amount)
-                """
-                
-                cursor.execute(insert_sql, (
-                    datetime.strptime(str(row['trade_date']), '%Y%m%d').date(),
-                    row['open'], row['high'], row['low'], row['close'],
-                    row['pre_close'], row['change'], row['pct_chg'],
-                    row['vol'], row['amount']
-                ))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
+            self.save_daily_bars(df)
             logger.info(f"股票 {ts_code} 日线数据更新成功")
             return True
             
@@ -634,42 +759,265 @@ class QuantitativeDataService:
             logger.error(f"更新股票日线数据失败 {ts_code}: {e}")
             return False
     
-    def batch_update_all_stocks(self) -> Dict[str, Any]:
+    def migrate_legacy_tables(self, drop: bool = False) -> Dict[str, Any]:
+        """
+        把旧的按股票建表的数据（`600519_SH` 日线表、`dailyticks_600519_SH` 分时表）并入合并表
+        
+        在数据库内用 INSERT ... SELECT 复制，按主键覆盖，可重复执行；旧分时表同一秒的多笔成交
+        合并为一行（价格取最后一笔，成交量和成交额累加）。
+        
+        Args:
+            drop: 复制并校验行数后删除旧表
+        
+        Returns:
+            dict: 迁移结果统计
+        """
+        if not self.ensure_schema():
+            return {'success': False, 'message': '创建行情表失败', 'migrated_tables': 0, 'rows': 0, 'failed': []}
+        
+        migrated = 0
+        copied_rows = 0
+        failed = []
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SHOW TABLES")
+            tables = [row[0] for row in cursor.fetchall()]
+            
+            for table_name in tables:
+                match = LEGACY_TABLE_PATTERN.match(table_name)
+                if not match:
+                    continue
+                is_tick, symbol, market = match.groups()
+                ts_code = f'{symbol}.{market}'
+                try:
+                    if is_tick:
+                        copied = cursor.execute(f"""
+                            INSERT INTO `{TICK_TABLE}` (ts_code, trade_time, price, volume, amount)
+                            SELECT %s, trade_time,
+                                   SUBSTRING_INDEX(GROUP_CONCAT(price ORDER BY id DESC), ',', 1),
+                                   SUM(volume), SUM(amount)
+                            FROM `{table_name}` GROUP BY trade_time
+                            ON DUPLICATE KEY UPDATE price=VALUES(price), volume=VALUES(volume), amount=VALUES(amount)
+                        """, (ts_code,))
+                        cursor.execute(f"SELECT COUNT(DISTINCT trade_time) FROM `{table_name}`")
+                        expected = cursor.fetchone()[0]
+                        cursor.execute(f"SELECT COUNT(*) FROM `{TICK_TABLE}` WHERE ts_code = %s", (ts_code,))
+                    else:
+                        copied = cursor.execute(f"""
+                            INSERT INTO `{DAILY_BAR_TABLE}`
+                            (ts_code, trade_date, open, high, low, close, pre_close, `change`, pct_chg, vol, amount)
+                            SELECT %s, trade_date, open, high, low, close, pre_close, `change`, pct_chg, vol, amount
+                            FROM `{table_name}`
+                            ON DUPLICATE KEY UPDATE
+                            open=VALUES(open), high=VALUES(high), low=VALUES(low),
+                            close=VALUES(close), pre_close=VALUES(pre_close),
+                            `change`=VALUES(`change`), pct_chg=VALUES(pct_chg),
+                            vol=VALUES(vol), amount=VALUES(amount)
+                        """, (ts_code,))
+                        cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+                        expected = cursor.fetchone()[0]
+                        cursor.execute(f"SELECT COUNT(*) FROM `{DAILY_BAR_TABLE}` WHERE ts_code = %s", (ts_code,))
+                    actual = cursor.fetchone()[0]
+                    conn.commit()
+                    
+                    if actual < expected:
+                        raise ValueError(f'行数校验失败：旧表{expected}行，合并表{actual}行')
+                    if drop:
+                        cursor.execute(f"DROP TABLE `{table_name}`")
+                    migrated += 1
+                    copied_rows += copied
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"迁移旧行情表失败 {table_name}: {e}")
+                    failed.append(table_name)
+            cursor.close()
+        
+        logger.info(f"旧行情表迁移完成：{migrated}张表，{copied_rows}行，失败{len(failed)}张")
+        return {
+            'success': not failed,
+            'message': f'旧行情表迁移完成，表: {migrated}, 行: {copied_rows}, 失败: {len(failed)}',
+            'migrated_tables': migrated,
+            'rows': copied_rows,
+            'failed': failed
+        }
+    
+    def archive_tick_data(self, hot_days: int = None) -> Dict[str, Any]:
+        """
+        分时数据归档：早于热数据窗口的分时按月归档为Parquet后移出数据库
+        
+        整月都已归档的分区直接 DROP PARTITION，跨截止日期的分区按条件删除。
+        
+        Args:
+            hot_days: 热数据保留天数，默认取 DATA_LIFECYCLE['TICK_HOT_DAYS']
+        
+        Returns:
+            dict: 归档结果统计
+        """
+        from stock.lifecycle import DATASET_TICK, get_lifecycle_config, write_partition
+        
+        if hot_days is None:
+            hot_days = get_lifecycle_config('TICK_HOT_DAYS', 30)
+        cutoff = datetime.combine(date.today() - timedelta(days=hot_days), datetime.min.time())
+        
+        try:
+            if not self.ensure_schema():
+                raise RuntimeError('创建行情表失败')
+            self.ensure_tick_partitions()
+            
+            partitions = {}
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT MIN(trade_time) FROM `{TICK_TABLE}` WHERE trade_time < %s", (cutoff,))
+                oldest = cursor.fetchone()[0]
+                
+                # 逐月读取并写出分区文件，内存中最多只有一个月的数据
+                month_start = oldest.date().replace(day=1) if oldest else None
+                while month_start is not None and month_start < cutoff.date():
+                    month_end = min(datetime.combine(_add_months(month_start, 1), datetime.min.time()), cutoff)
+                    month_df = self._read_ticks(conn, datetime.combine(month_start, datetime.min.time()), month_end)
+                    if not month_df.empty:
+                        month = month_start.strftime('%Y%m')
+                        write_partition(
+                            DATASET_TICK, month, month_df, ['ts_code', 'trade_time'],
+                            month_df['trade_time'].min().date(), month_df['trade_time'].max().date()
+                        )
+                        partitions[month] = len(month_df)
+                    month_start = _add_months(month_start, 1)
+                
+                # 分区文件写入成功后再删除库中数据
+                cursor.execute(
+                    "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME <> 'p_future'",
+                    (TICK_TABLE,)
+                )
+                expired = [
+                    name for name, description in cursor.fetchall()
+                    if datetime.strptime(description.strip("'")[:10], '%Y-%m-%d') <= cutoff
+                ]
+                if expired:
+                    cursor.execute(f"ALTER TABLE `{TICK_TABLE}` DROP PARTITION {', '.join(expired)}")
+                deleted = sum(partitions.values())
+                cursor.execute(f"DELETE FROM `{TICK_TABLE}` WHERE trade_time < %s", (cutoff,))
+                conn.commit()
+                cursor.close()
+            
+            logger.info(f"分时数据归档完成：{len(partitions)}个月分区，移出{deleted}条，删除分区{expired}")
+            return {
+                'success': True,
+                'message': f'分时数据归档完成，分区: {len(partitions)}, 删除: {deleted}',
+                'partitions': partitions,
+                'deleted_count': deleted
+            }
+            
+        except Exception as e:
+            logger.error(f"分时数据归档失败: {e}")
+            return {
+                'success': False,
+                'message': f'分时数据归档失败: {str(e)}',
+                'partitions': {},
+                'deleted_count': 0
+            }
+    
+    @staticmethod
+    def _read_ticks(conn, start: datetime, end: datetime) -> pd.DataFrame:
+        """用服务端游标（SSCursor）分批读取 [start, end) 的分时，避免一次性缓冲整个结果集"""
+        columns = ['ts_code', 'trade_time', 'price', 'volume', 'amount']
+        chunks = []
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(
+                f"SELECT ts_code, trade_time, price, volume, amount FROM `{TICK_TABLE}` "
+                f"WHERE trade_time >= %s AND trade_time < %s",
+                (start, end)
+            )
+            while True:
+                rows = cursor.fetchmany(ARCHIVE_FETCH_SIZE)
+                if not rows:
+                    break
+                chunks.append(pd.DataFrame(list(rows), columns=columns))
+        finally:
+            cursor.close()
+        
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(chunks, ignore_index=True)
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+        df['trade_time'] = pd.to_datetime(df['trade_time'])
+        return df
+    
+    def batch_update_all_stocks(self, max_workers: int = BATCH_UPDATE_WORKERS, resume: bool = True) -> Dict[str, Any]:
         """
-        批量更新所有股票数据
+        批量更新全市场股票日线
+        
+        多线程并发拉取，Tushare 调用由网关按接口共享额度限速（TUSHARE_CALLS_PER_MINUTE），写库复用连接池。
+        已成功的股票定期记入进度，中断后重新执行只处理剩余股票。进度按应有数据的最近交易日
+        （expected_latest_trade_date）区分，当日数据发布前运行记入上一交易日，发布后会重新更新全部股票。
+        
+        Args:
+            max_workers: 并发线程数（不超过连接池大小，多出的线程只会排队等连接直至超时）
+            resume: 是否跳过该交易日已成功更新的股票
         
         Returns:
             dict: 更新结果统计
         """
         try:
-            # 获取所有股票列表
+            from stock.index_data import expected_latest_trade_date
             from stock.models import StockBasic
             
-            stocks = StockBasic.objects.filter(list_status='L')[:100]  # 限制数量避免超时
+            ts_codes = list(StockBasic.objects.filter(list_status='L').order_by('ts_code').values_list('ts_code', flat=True))
+            checkpoint_key = BATCH_CHECKPOINT_KEY.format(date=expected_latest_trade_date().strftime('%Y%m%d'))
+            done = set(self._load_checkpoint(checkpoint_key)) if resume else set()
+            pending = [ts_code for ts_code in ts_codes if ts_code not in done]
+            skipped_count = len(ts_codes) - len(pending)
+            
+            if not self.ensure_schema():
+                raise RuntimeError('创建行情表失败')
+            
+            if max_workers > self.pool.max_size:
+                logger.warning(f"线程数{max_workers}超过数据库连接池大小{self.pool.max_size}，按连接池大小执行")
+                max_workers = self.pool.max_size
             
             success_count = 0
             fail_count = 0
-            
-            for stock in stocks:
-                try:
-                    if self.update_stock_daily_data(stock.ts_code):
+            start_time = time.monotonic()
+            logger.info(f"开始批量更新日线：共{len(ts_codes)}只，已完成{skipped_count}只，待更新{len(pending)}只，线程数{max_workers}")
+            
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stock-update') as executor:
+                futures = {executor.submit(self.update_stock_daily_data, ts_code): ts_code for ts_code in pending}
+                for finished, future in enumerate(as_completed(futures), 1):
+                    ts_code = futures[future]
+                    try:
+                        updated = future.result()
+                    except Exception as e:
+                        logger.error(f"更新股票 {ts_code} 失败: {e}")
+                        updated = False
+                    if updated:
                         success_count += 1
+                        done.add(ts_code)
                     else:
                         fail_count += 1
                     
-                    # 避免频繁调用API
-                    time.sleep(0.1)
-                    
-                except Exception as e:
-                    logger.error(f"更新股票 {stock.ts_code} 失败: {e}")
-                    fail_count += 1
-            
+                    if finished % BATCH_CHECKPOINT_INTERVAL == 0 or finished == len(pending):
+                        self._save_checkpoint(checkpoint_key, done)
+                        elapsed = time.monotonic() - start_time
+                        throughput = finished / elapsed if elapsed > 0 else 0
+                        eta = (len(pending) - finished) / throughput if throughput > 0 else 0
+                        logger.info(
+                            f"批量更新进度 {finished}/{len(pending)}，成功{success_count}，失败{fail_count}，"
+                            f"{throughput:.1f}只/秒，预计剩余{eta:.0f}秒"
+                        )
+            
+            duration = time.monotonic() - start_time
             return {
                 'success': True,
-                'message': f'批量更新完成，成功: {success_count}, 失败: {fail_count}',
+                'message': f'批量更新完成，成功: {success_count}, 失败: {fail_count}, 跳过: {skipped_count}, 耗时: {duration:.1f}秒',
                 'success_count': success_count,
                 'fail_count': fail_count,
-                'total_count': success_count + fail_count
+                'skipped_count': skipped_count,
+                'total_count': success_count + fail_count,
+                'duration': round(duration, 2),
+                'throughput': round(len(pending) / duration, 2) if duration > 0 else 0
             }
             
         except Exception as e:
@@ -679,8 +1027,24 @@ class QuantitativeDataService:
                 'message': f'批量更新失败: {str(e)}',
                 'success_count': 0,
                 'fail_count': 0,
+                'skipped_count': 0,
                 'total_count': 0
             }
+    
+    @staticmethod
+    def _load_checkpoint(key: str) -> List[str]:
+        try:
+            return cache.get(key) or []
+        except Exception as e:
+            logger.warning(f"读取批量更新进度失败: {e}")
+            return []
+    
+    @staticmethod
+    def _save_checkpoint(key: str, done: set):
+        try:
+            cache.set(key, sorted(done), BATCH_CHECKPOINT_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"保存批量更新进度失败: {e}")
 
 
 # 创建全局实例
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+股票搜索内存索引 - 支持代码/名称/拼音缩写前缀搜索
+
+索引项为 (小写关键字, 股票序号) 的有序数组，查询时二分定位前缀区间；
+结果按最新交易日成交额（流动性）排序。匹配股票较多的短前缀（如“6”、“pa”）在构建时
+预先计算好前 MAX_LIMIT 名，其余前缀区间很小，直接在区间内排序，单次查询在微秒级完成。
+
+索引在首次查询时构建，同步股票基本信息后通过缓存版本号通知各进程重建，
+并按 REBUILD_INTERVAL 定期重建以刷新流动性排名。
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+MAX_LIMIT = 50  # 单次查询最多返回条数
+HOT_PREFIX_THRESHOLD = 64  # 匹配股票数超过该值的前缀预先计算排名
+REBUILD_INTERVAL = 60 * 30  # 定期重建间隔（秒）
+VERSION_CHECK_INTERVAL = 30  # 检查其他进程是否要求重建的间隔（秒）
+VERSION_KEY = 'stock:search_index:version'
+LIQUIDITY_LOOKBACK_DAYS = 15  # 停牌股票取回看窗口内最近一根K线的成交额
+
+
+class StockSearchIndex(object):
+    """股票前缀搜索索引"""
+
+    def __init__(self):
+        self._state = None  # (stocks, keys, ids, hot)，整体替换保证读取无锁
+        self._built_at = 0.0
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # ---------- 构建 ----------
+
+    @staticmethod
+    def _index_keys(stock):
+        """股票的全部索引关键字：代码、TS代码、名称（含后缀以支持名称中间匹配）、拼音缩写"""
+        keys = {stock['symbol'].lower(), stock['ts_code'].lower()}
+        name = (stock['name'] or '').lower().replace(' ', '')
+        for start in range(len(name)):
+            keys.add(name[start:])
+        if stock['cnspell']:
+            keys.add(stock['cnspell'].lower())
+        keys.discard('')
+        return keys
+
+    @staticmethod
+    def _load_liquidity():
+        """最新交易日附近每只股票最近一根K线的成交额"""
+        from stock.models import StockDaily
+
+        latest = StockDaily.objects.order_by('-trade_date').values_list('trade_date', flat=True).first()
+        if not latest:
+            return {}
+        rows = StockDaily.objects.filter(
+            trade_date__gte=latest - timedelta(days=LIQUIDITY_LOOKBACK_DAYS)
+        ).order_by('trade_date').values_list('ts_code', 'amount')
+        # 按日期升序覆盖，保留每只股票最近的成交额
+        return {ts_code: float(amount or 0) for ts_code, amount in rows}
+
+    def build(self):
+        """从数据库重建索引"""
+        from stock.models import StockBasic
+
+        start_time = time.perf_counter()
+        liquidity = self._load_liquidity()
+        rows = StockBasic.objects.filter(list_status='L').values(
+            'ts_code', 'symbol', 'name', 'cnspell', 'industry', 'market'
+        )
+        # 按流动性降序排列，股票序号即排名，序号越小越靠前
+        stocks = sorted(rows, key=lambda s: (-liquidity.get(s['ts_code'], 0.0), s['ts_code']))
+
+        entries = []
+        prefix_counts = Counter()
+        stock_prefixes = []
+        for idx, stock in enumerate(stocks):
+            keys = self._index_keys(stock)
+            entries.extend((key, idx) for key in keys)
+            prefixes = {key[:length] for key in keys for length in range(1, len(key) + 1)}
+            prefix_counts.update(prefixes)
+            stock_prefixes.append(prefixes)
+        entries.sort()
+
+        # 热门前缀：按排名顺序依次填充，得到每个前缀的前 MAX_LIMIT 名
+        hot = {prefix: [] for prefix, count in prefix_counts.items() if count > HOT_PREFIX_THRESHOLD}
+        if hot:
+            for idx, prefixes in enumerate(stock_prefixes):
+                for prefix in prefixes:
+                    ranked = hot.get(prefix)
+                    if ranked is not None and len(ranked) < MAX_LIMIT:
+                        ranked.append(idx)
+
+        self._state = (
+            stocks,
+            [key for key, _ in entries],
+            [idx for _, idx in entries],
+            hot,
+        )
+        self._built_at = time.time()
+        logger.info(
+            'stock_search_index result=built stocks=%s keys=%s hot_prefixes=%s duration=%.3f',
+            len(stocks), len(entries), len(hot), time.perf_counter() - start_time,
+        )
+
+    def invalidate(self):
+        """股票基本信息变更后调用：本进程立即重建，其他进程在下次版本检查时重建"""
+        version = time.time()
+        try:
+            cache.set(VERSION_KEY, version, None)
+        except Exception as e:
+            logger.warning('stock_search_index result=version_update_failed error=%s', e)
+        with self._lock:
+            self._version = version
+            self._state = None
+
+    def _ensure_built(self):
+        now = time.time()
+        if self._state is not None and now - self._version_checked_at >= VERSION_CHECK_INTERVAL:
+            self._version_checked_at = now
+            try:
+                version = cache.get(VERSION_KEY)
+            except Exception:
+                version = self._version
+            if version != self._version:
+                self._version = version
+                self._state = None
+
+        state = self._state
+        if state is None or now - self._built_at >= REBUILD_INTERVAL:
+            with self._lock:
+                if self._state is None or time.time() - self._built_at >= REBUILD_INTERVAL:
+                    self.build()
+                state = self._state
+        return state
+
+    # ---------- 查询 ----------
+
+    def _match_ids(self, keyword, limit=None):
+        stocks, keys, ids, hot = self._ensure_built()
+        prefix = keyword.strip().lower().replace(' ', '')
+        if not prefix:
+            return stocks, []
+
+        if limit is not None and limit <= MAX_LIMIT:
+            ranked = hot.get(prefix)
+            if ranked is not None:
+                return stocks, ranked[:limit]
+
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + '\uffff', lo)
+        matched = sorted(set(ids[lo:hi]))
+        return stocks, matched if limit is None else matched[:limit]
+
+    def search(self, keyword, limit=10):
+        """
+        前缀搜索，按流动性排序返回前 limit 只股票
+
+        Returns:
+            list: [{'ts_code', 'symbol', 'name', 'industry', 'market'}]
+        """
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        stocks, matched = self._match_ids(keyword, limit)
+        return [
+            {
+                'ts_code': stocks[idx]['ts_code'],
+                'symbol': stocks[idx]['symbol'],
+                'name': stocks[idx]['name'],
+                'industry': stocks[idx]['industry'],
+                'market': stocks[idx]['market'],
+            }
+            for idx in matched
+        ]
+
+    def match_page(self, keyword, page=1, page_size=20, industry=None, market=None):
+        """
+        列表页筛选：在索引内按行业/市场过滤并分页，只返回当前页的ts_code（按代码排序），
+        短关键字匹配上千只股票时也不会把全部代码作为查询参数
+
+        Returns:
+            tuple: (当前页ts_code列表, 匹配总数, 实际页码)；页码超出范围时取最后一页，与 Paginator.get_page 一致
+        """
+        stocks, matched = self._match_ids(keyword)
+        codes = sorted(
+            stocks[idx]['ts_code'] for idx in matched
+            if (not industry or stocks[idx]['industry'] == industry) and (not market or stocks[idx]['market'] == market)
+        )
+        page_size = max(1, int(page_size))
+        last_page = max(1, (len(codes) + page_size - 1) // page_size)
+        page = min(max(1, int(page)), last_page)
+        start = (page - 1) * page_size
+        return codes[start:start + page_size], len(codes), page
+
+
+stock_search_index = StockSearchIndex()
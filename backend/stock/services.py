@@ -1,7 +1,5 @@
 # -*- coding: utf-8 -*-
 
-import os
-import tushare as ts
 import akshare as ak
 import pandas as pd
 from datetime import datetime, timedelta
@@ -15,6 +13,9 @@ import requests
 import re
 
 from stock.models import StockBasic, StockDaily, StockCompany, TradeCal, IndexDaily
+from stock.news_tagger import stock_news_tagger
+from stock.search_index import stock_search_index
+from stock.market_ranking import market_ranking
 from trading.models import UserStockAccount, UserPosition, TradeRecord, UserWatchList, MarketNews
 from user.models import SysUser
 from role.models import SysUserRole, SysRole
@@ -22,13 +23,8 @@ from role.models import SysUserRole, SysRole
 # 加载环境变量
 load_dotenv()
 
-# 初始化Tushare
-token = os.getenv('TUSHARE_TOKEN')  # 修正环境变量名
-if token:
-    ts.set_token(token)
-    pro = ts.pro_api()
-else:
-    pro = None  # 避免pro未定义的错误
+# Tushare Pro 接口统一经网关调用（响应缓存、按接口限流），未配置token时为假值
+from stock.tushare_gateway import tushare_gateway as pro
 
 
 class StockDataService:
@@ -91,6 +87,11 @@ class StockDataService:
                 )
                 success_count += 1
             
+            # 股票列表变化后重建搜索索引、新闻股票识别自动机和排行快照
+            stock_search_index.invalidate()
+            stock_news_tagger.invalidate()
+            market_ranking.invalidate()
+            
             return {'success': True, 'count': success_count, 'message': f'成功同步{success_count}只股票基本信息'}
         
         except Exception as e:
@@ -178,191 +179,26 @@ class StockDataService:
     
     @staticmethod
     def get_top_stocks(limit=10):
-        """获取热门牛股 - 直接从TuShare API获取今日涨幅榜"""
+        """获取热门牛股 - 本地全市场快照的涨幅榜（见 stock.market_ranking）"""
         try:
-            if not pro:
-                raise Exception('TuShare API未配置，无法获取涨幅榜')
-
-            # 获取今日交易数据
-            today = datetime.now().strftime('%Y%m%d')
-
-            try:
-                # 获取今日全市场股票数据
-                df = pro.daily(
-                    trade_date=today,
-                    fields='ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
-                )
-
-                # 如果今日没有数据，尝试获取最近交易日数据
-                if df.empty:
-                    for i in range(1, 6):
-                        date_str = (datetime.now() - timedelta(days=i)).strftime('%Y%m%d')
-                        df = pro.daily(
-                            trade_date=date_str,
-                            fields='ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
-                        )
-                        if not df.empty:
-                            break
-
-                if df.empty:
-                    raise Exception("无法获取股票交易数据")
-
-                # 筛选出涨幅榜：排除ST股票、停牌股票，筛选涨幅最大的股票
-                filtered_df = df[
-                    (df['pct_chg'].notna()) &
-                    (df['pct_chg'] > 0) &  # 只要上涨的股票
-                    (df['vol'] > 0) &  # 有成交量
-                    (df['close'] > 0) &  # 正常价格
-                    (~df['ts_code'].str.contains('ST', na=False)) &  # 排除ST股票
-                    (~df['ts_code'].str.contains('退', na=False))  # 排除退市股票
-                ].sort_values('pct_chg', ascending=False).head(limit * 2)  # 获取更多数据以便筛选
-
-                # 如果没有上涨股票，获取涨跌幅最大的股票
-                if filtered_df.empty:
-                    filtered_df = df[
-                        (df['pct_chg'].notna()) &
-                        (df['vol'] > 0) &
-                        (df['close'] > 0) &
-                        (~df['ts_code'].str.contains('ST', na=False))
-                    ].sort_values('pct_chg', ascending=False).head(limit * 2)
-
-                if filtered_df.empty:
-                    raise Exception("没有找到有效的股票数据")
-
-                # 获取股票基本信息（名称、行业等）
-                ts_codes = filtered_df['ts_code'].tolist()
-
-                # 分批获取股票基本信息（TuShare单次查询限制）
-                stock_basic_data = {}
-                batch_size = 100
-                for i in range(0, len(ts_codes), batch_size):
-                    batch_codes = ts_codes[i:i+batch_size]
-                    try:
-                        basic_df = pro.stock_basic(
-                            ts_code=','.join(batch_codes),
-                            fields='ts_code,name,industry'
-                        )
-                        for _, row in basic_df.iterrows():
-                            stock_basic_data[row['ts_code']] = {
-                                'name': row['name'],
-                                'industry': row['industry'] if row['industry'] else '未分类'
-                            }
-                    except Exception as e:
-                        print(f"获取基本信息批次失败: {e}")
-
-                # 构建热门股票列表
-                result = []
-                for _, row in filtered_df.iterrows():
-                    ts_code = row['ts_code']
-                    basic_info = stock_basic_data.get(ts_code, {'name': ts_code, 'industry': '未分类'})
-
-                    result.append({
-                        'ts_code': ts_code,
-                        'name': basic_info['name'],
-                        'close': float(row['close']) if row['close'] else 0,
-                        'open': float(row['open']) if row['open'] else 0,
-                        'high': float(row['high']) if row['high'] else 0,
-                        'low': float(row['low']) if row['low'] else 0,
-                        'change': float(row['change']) if row['change'] else 0,
-                        'pct_chg': float(row['pct_chg']) if row['pct_chg'] else 0,
-                        'vol': int(row['vol']) if row['vol'] else 0,
-                        'amount': float(row['amount']) if row['amount'] else 0,
-                        'trade_date': datetime.strptime(str(row['trade_date']), '%Y%m%d').strftime('%Y-%m-%d'),
-                        'industry': basic_info['industry'],
-                        'data_source': 'tushare_api_realtime'
-                    })
-
-                    # 限制返回数量
-                    if len(result) >= limit:
-                        break
-
-                if not result:
-                    raise Exception("处理股票数据后无有效结果")
-
-                print(f"成功从TuShare API获取 {len(result)} 只涨幅榜股票")
-                return result
-
-            except Exception as api_error:
-                print(f"TuShare API调用失败: {api_error}")
-                # 回退到本地数据库
-                return StockDataService.get_top_stocks_from_db(limit)
+            ranked = market_ranking.top('gainers', limit)
+            if not ranked:
+                raise Exception('本地没有全市场日线数据')
+
+            # 只要上涨的股票，没有上涨股票时返回涨跌幅最大的股票
+            rising = [row for row in ranked if row['pct_chg'] > 0]
+            fields = ['ts_code', 'name', 'close', 'open', 'high', 'low', 'change', 'pct_chg', 'vol', 'amount',
+                      'trade_date', 'industry']
+            return [
+                dict({field: row[field] for field in fields}, data_source='local_market_snapshot')
+                for row in rising or ranked
+            ]
 
         except Exception as e:
             print(f"获取热门股票失败: {str(e)}")
             # 最终回退：返回固定的热门股票
             return StockDataService.get_fallback_stocks(limit)
 
-    @staticmethod
-    def get_top_stocks_from_db(limit=10):
-        """从本地数据库获取热门股票（回退方案）"""
-        try:
-            # 获取最新交易日的股票数据，按涨跌幅排序
-            latest_date = StockDaily.objects.values('trade_date').order_by('-trade_date').first()
-            if not latest_date:
-                raise Exception('数据库中没有股票交易数据')
-            
-            # 获取涨跌幅大于0且有效的股票，按涨跌幅排序
-            top_stocks = StockDaily.objects.filter(
-                trade_date=latest_date['trade_date'],
-                pct_chg__isnull=False,
-                pct_chg__gt=0,  # 只获取上涨的股票
-                close__isnull=False,
-                vol__gt=0  # 确保有成交量
-            ).order_by('-pct_chg')[:limit]
-            
-            result = []
-            for stock_daily in top_stocks:
-                try:
-                    stock_basic = StockBasic.objects.get(ts_code=stock_daily.ts_code)
-                    result.append({
-                        'ts_code': stock_daily.ts_code,
-                        'name': stock_basic.name,
-                        'close': float(stock_daily.close) if stock_daily.close else 0,
-                        'change': float(stock_daily.change) if stock_daily.change else 0,
-                        'pct_chg': float(stock_daily.pct_chg) if stock_daily.pct_chg else 0,
-                        'vol': stock_daily.vol if stock_daily.vol else 0,
-                        'amount': float(stock_daily.amount) if stock_daily.amount else 0,
-                        'trade_date': stock_daily.trade_date.strftime('%Y-%m-%d'),
-                        'industry': stock_basic.industry if stock_basic.industry else '未分类'
-                    })
-                except StockBasic.DoesNotExist:
-                    continue
-            
-            # 如果没有上涨的股票，则返回涨跌幅最大的股票（包括下跌）
-            if not result:
-                top_stocks = StockDaily.objects.filter(
-                    trade_date=latest_date['trade_date'],
-                    pct_chg__isnull=False,
-                    close__isnull=False,
-                    vol__gt=0
-                ).order_by('-pct_chg')[:limit]
-                
-                for stock_daily in top_stocks:
-                    try:
-                        stock_basic = StockBasic.objects.get(ts_code=stock_daily.ts_code)
-                        result.append({
-                            'ts_code': stock_daily.ts_code,
-                            'name': stock_basic.name,
-                            'close': float(stock_daily.close) if stock_daily.close else 0,
-                            'change': float(stock_daily.change) if stock_daily.change else 0,
-                            'pct_chg': float(stock_daily.pct_chg) if stock_daily.pct_chg else 0,
-                            'vol': stock_daily.vol if stock_daily.vol else 0,
-                            'amount': float(stock_daily.amount) if stock_daily.amount else 0,
-                            'trade_date': stock_daily.trade_date.strftime('%Y-%m-%d'),
-                            'industry': stock_basic.industry if stock_basic.industry else '未分类'
-                        })
-                    except StockBasic.DoesNotExist:
-                        continue
-            
-            if not result:
-                raise Exception(f'在{latest_date["trade_date"]}没有找到有效的股票交易数据')
-            
-            return result
-
-        except Exception as e:
-            print(f"从本地数据库获取热门股票失败: {str(e)}")
-            return []
-
     @staticmethod
     def get_fallback_stocks(limit=10):
         """固定的热门股票列表（最终回退方案）"""
@@ -403,77 +239,11 @@ class StockDataService:
     
     @staticmethod
     def get_index_daily_from_tushare(ts_code, period='daily', limit=100):
-        """从Tushare API直接获取指数K线数据"""
+        """获取指数K线数据 - 从本地指数日线读取，落后时增量同步（见 stock.index_data）"""
         try:
-            if not pro:
-                print("Tushare pro API未初始化")
-                return []
-            
-            # 放宽限流策略，改为每分钟最多5次调用
-            if not RateLimiter.can_call("index_daily", max_calls=5, time_window=60):
-                print(f"指数数据API限流中，等待1分钟后重试")
-                return []
-            
-            # 记录API调用
-            RateLimiter.record_call("index_daily")
-            
-            # 计算日期范围 - 确保获取足够的数据
-            end_date = datetime.now().strftime('%Y%m%d')
-            if period == 'daily':
-                # 增加日期范围，确保获取到足够的交易日数据
-                start_date = (datetime.now() - timedelta(days=limit * 3)).strftime('%Y%m%d')
-            elif period == 'weekly':
-                start_date = (datetime.now() - timedelta(days=limit * 14)).strftime('%Y%m%d')
-            elif period == 'monthly':
-                start_date = (datetime.now() - timedelta(days=limit * 60)).strftime('%Y%m%d')
-            else:
-                start_date = (datetime.now() - timedelta(days=300)).strftime('%Y%m%d')
-            
-            print(f"获取指数数据: {ts_code}, 日期范围: {start_date} - {end_date}")
-            
-            # 获取指数日线数据
-            import pandas as pd
-            df = pro.index_daily(
-                ts_code=ts_code,
-                start_date=start_date,
-                end_date=end_date,
-                fields='ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
-            )
-            
-            if df.empty:
-                print(f"指数 {ts_code} 在日期范围 {start_date}-{end_date} 内无数据")
-                return []
-            
-            print(f"成功获取指数数据 {len(df)} 条")
-            
-            # 转换为所需格式
-            kline_data = []
-            for _, row in df.iterrows():
-                try:
-                    kline_data.append({
-                        'date': pd.to_datetime(row['trade_date']).strftime('%Y-%m-%d'),
-                        'open': float(row['open']) if pd.notna(row['open']) else 0,
-                        'high': float(row['high']) if pd.notna(row['high']) else 0,
-                        'low': float(row['low']) if pd.notna(row['low']) else 0,
-                        'close': float(row['close']) if pd.notna(row['close']) else 0,
-                        'volume': int(row['vol']) if pd.notna(row['vol']) else 0,
-                        'amount': float(row['amount']) if pd.notna(row['amount']) else 0,
-                        'change': float(row['change']) if pd.notna(row['change']) else 0,
-                        'pct_chg': float(row['pct_chg']) if pd.notna(row['pct_chg']) else 0,
-                        'pre_close': float(row['pre_close']) if pd.notna(row['pre_close']) else 0
-                    })
-                except (ValueError, TypeError) as e:
-                    print(f"数据转换错误: {e}")
-                    continue
-            
-            # 按日期正序排列
-            kline_data.sort(key=lambda x: x['date'])
-            
-            # 限制返回数量
-            result = kline_data[-limit:] if limit and len(kline_data) > limit else kline_data
-            print(f"返回指数数据 {len(result)} 条")
-            return result
-            
+            from stock.index_data import get_index_kline
+
+            return get_index_kline(ts_code, period, limit)
         except Exception as e:
             print(f"获取指数数据失败: {e}")
             return []
@@ -614,7 +384,7 @@ class NewsService:
         return news_list[:limit]
 
     @staticmethod
-    def _fetch_from_yicai(limit=10):
+    def _fetch_from_yicai(limit=10, timeout=15):
         """Fetch from Yicai (第一财经) - verified working source"""
         import requests
         from bs4 import BeautifulSoup
@@ -627,7 +397,7 @@ class NewsService:
                 'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
             }
 
-            response = requests.get(url, headers=headers, timeout=15)
+            response = requests.get(url, headers=headers, timeout=timeout)
             response.encoding = 'utf-8'
 
             if response.status_code != 200:
@@ -668,7 +438,7 @@ class NewsService:
             return []
 
     @staticmethod
-    def _fetch_from_sina_fixed(limit=10):
+    def _fetch_from_sina_fixed(limit=10, timeout=15):
         """Fetch from Sina Finance with proper encoding handling"""
         import requests
         from bs4 import BeautifulSoup
@@ -681,7 +451,7 @@ class NewsService:
                 'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
             }
 
-            response = requests.get(url, headers=headers, timeout=15)
+            response = requests.get(url, headers=headers, timeout=timeout)
             response.encoding = 'utf-8'
 
             if response.status_code != 200:
@@ -720,7 +490,7 @@ class NewsService:
             return []
 
     @staticmethod
-    def _fetch_from_netease(limit=10):
+    def _fetch_from_netease(limit=10, timeout=15):
         """Fetch from NetEase Money as backup source"""
         import requests
         from bs4 import BeautifulSoup
@@ -732,7 +502,7 @@ class NewsService:
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             }
 
-            response = requests.get(url, headers=headers, timeout=15)
+            response = requests.get(url, headers=headers, timeout=timeout)
             response.encoding = 'utf-8'
 
             if response.status_code != 200:
@@ -772,36 +542,17 @@ class NewsService:
 
     @staticmethod
     def update_news_data(limit=20):
-        """更新新闻数据到数据库"""
-        try:
-            # 获取新闻数据
-            news_list = NewsService.fetch_real_news_from_api(limit)
-
-            if not news_list:
-                print("未获取到有效新闻")
-                return 0
-
-            saved_count = 0
-            for news_item in news_list:
-                try:
-                    # 检查是否已存在相同标题的新闻
-                    if not MarketNews.objects.filter(title=news_item['title']).exists():
-                        NewsService.create_news(
-                            title=news_item['title'],
-                            content=news_item['content'],
-                            source=news_item.get('source', '系统'),
-                            category=news_item.get('category', '综合新闻'),
-                            source_url=news_item.get('url', '')  # 添加原文链接
-                        )
-                        saved_count += 1
-                        print(f"保存新闻: {news_item['title'][:30]}...")
-
-                except Exception as e:
-                    print(f"保存新闻失败: {e}")
-                    continue
+        """更新新闻数据到数据库（各新闻源并发抓取，按标题哈希去重后批量入库）"""
+        from stock.news_ingest import ingest_news
 
-            print(f"成功更新 {saved_count} 条新闻到数据库")
-            return saved_count
+        try:
+            result = ingest_news(
+                sources=['yicai', 'sina_home', 'netease'],
+                limit=limit,
+                max_items=limit,
+            )
+            print(result['message'])
+            return result['data']['inserted']
 
         except Exception as e:
             print(f"更新新闻数据失败: {e}")
@@ -912,198 +663,23 @@ class RateLimiter:
 
 
 class IntradayDataService:
-    """分时数据服务 - 参考sample项目方式，支持多数据源策略"""
+    """分时数据服务 - 多数据源，当日分钟线增量追加（见 stock.intraday_store）"""
 
     @staticmethod
-    def get_stock_intraday_from_tushare(ts_code):
-        """从Tushare获取分时数据 - 参考sample项目使用get_today_ticks"""
-        try:
-            import tushare as ts
-
-            # 检查是否为工作日
-            from datetime import date, datetime
-            from chinese_calendar import is_workday, is_holiday
-
-            today = date.today()
-            if not is_workday(today) or is_holiday(today):
-                return {'success': False, 'message': '非交易日', 'data': None}
-
-            # 转换股票代码格式：000007.SZ -> 000007
-            stock_code = ts_code.split('.')[0]
-
-            # 使用sample项目的方式获取今日分时数据
-            df = ts.get_today_ticks(stock_code)
-
-            if df is not None and not df.empty:
-                # 转换为标准格式
-                times = []
-                prices = []
-
-                for _, row in df.iterrows():
-                    time_str = str(row['time'])  # 091505格式
-                    price = float(row['price'])
+    def get_stock_intraday_multi_source(ts_code, since=None, trade_date=None):
+        """
+        多数据源策略获取分时数据，优先级: 东方财富 > 腾讯 > Tushare
 
-                    # 转换时间格式：091505 -> 09:15
-                    if len(time_str) == 6:
-                        formatted_time = f"{time_str[:2]}:{time_str[2:4]}"
-                        times.append(formatted_time)
-                        prices.append(price)
+        Args:
+            since: 'HH:MM'，只返回该分钟及之后的数据（客户端增量刷新，该分钟可能已被修正）
+            trade_date: 客户端已有数据的交易日，与当前交易日不一致时返回全量
+        """
+        from stock.intraday_store import intraday_store
 
-                return {
-                    'success': True,
-                    'data': {'time': times, 'price': prices},
-                    'source': 'tushare',
-                    'count': len(times)
-                }
-            else:
-                return {'success': False, 'message': 'Tushare无分时数据', 'data': None}
-
-        except Exception as e:
-            return {'success': False, 'message': f'Tushare分时数据获取失败: {str(e)}', 'data': None}
-
-    @staticmethod
-    def get_stock_intraday_from_eastmoney(ts_code):
-        """从东方财富API获取分时数据"""
         try:
-            import requests
-
-            # 转换股票代码格式
-            if ts_code.endswith('.SZ'):
-                secid = f"0.{ts_code.split('.')[0]}"
-            elif ts_code.endswith('.SH'):
-                secid = f"1.{ts_code.split('.')[0]}"
-            else:
-                return {'success': False, 'message': '不支持的股票代码格式', 'data': None}
-
-            # 东方财富分时数据接口
-            url = "http://push2his.eastmoney.com/api/qt/stock/trends2/get"
-            params = {
-                'secid': secid,
-                'fields1': 'f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f11,f12,f13',
-                'fields2': 'f51,f52,f53,f54,f55,f56,f57,f58',
-                'iscr': '0'
-            }
-
-            response = requests.get(url, params=params, timeout=10)
-
-            if response.status_code == 200:
-                data = response.json()
-                if 'data' in data and data['data'] and 'trends' in data['data']:
-                    trends = data['data']['trends']
-                    if trends:
-                        times = []
-                        prices = []
-
-                        for trend in trends:
-                            parts = trend.split(',')
-                            if len(parts) >= 2:
-                                time_str = parts[0]  # 2025-09-12 09:30 格式
-                                price = float(parts[1])
-
-                                # 提取时间部分：2025-09-12 09:30 -> 09:30
-                                if ' ' in time_str:
-                                    time_only = time_str.split(' ')[1]
-                                    times.append(time_only)
-                                    prices.append(price)
-
-                        return {
-                            'success': True,
-                            'data': {'time': times, 'price': prices},
-                            'source': 'eastmoney',
-                            'count': len(times)
-                        }
-
-            return {'success': False, 'message': '东方财富无分时数据', 'data': None}
-
+            return intraday_store.get_series(ts_code, since=since, trade_date=trade_date)
         except Exception as e:
-            return {'success': False, 'message': f'东方财富分时数据获取失败: {str(e)}', 'data': None}
-
-    @staticmethod
-    def get_stock_intraday_from_tencent(ts_code):
-        """从腾讯财经API获取分时数据"""
-        try:
-            import requests
-
-            # 转换股票代码格式
-            if ts_code.endswith('.SZ'):
-                stock_code = f"sz{ts_code.split('.')[0]}"
-            elif ts_code.endswith('.SH'):
-                stock_code = f"sh{ts_code.split('.')[0]}"
-            else:
-                return {'success': False, 'message': '不支持的股票代码格式', 'data': None}
-
-            # 腾讯分时数据接口
-            market = stock_code[:2]  # sz or sh
-            code = stock_code[2:]    # 6位数字
-
-            url = f"http://data.gtimg.cn/flashdata/hushen/minute/{market}{code}.js"
-            response = requests.get(url, timeout=10)
-
-            if response.status_code == 200 and response.text:
-                lines = response.text.strip().split('\n')
-                valid_lines = [line for line in lines if ' ' in line and ':' in line]
-
-                if valid_lines:
-                    times = []
-                    prices = []
-
-                    for line in valid_lines:
-                        parts = line.split(' ')
-                        if len(parts) >= 2:
-                            time_str = parts[0]  # 09:30 格式
-                            price = float(parts[1])
-                            times.append(time_str)
-                            prices.append(price)
-
-                    return {
-                        'success': True,
-                        'data': {'time': times, 'price': prices},
-                        'source': 'tencent',
-                        'count': len(times)
-                    }
-
-            return {'success': False, 'message': '腾讯无分时数据', 'data': None}
-
-        except Exception as e:
-            return {'success': False, 'message': f'腾讯分时数据获取失败: {str(e)}', 'data': None}
-    
-    
-    @staticmethod
-    def get_stock_intraday_multi_source(ts_code):
-        """多数据源策略获取分时数据"""
-        # 优先级: 东方财富 > 腾讯 > Tushare
-        data_sources = [
-            ('eastmoney', IntradayDataService.get_stock_intraday_from_eastmoney),
-            ('tencent', IntradayDataService.get_stock_intraday_from_tencent),
-            ('tushare', IntradayDataService.get_stock_intraday_from_tushare)
-        ]
-
-        for source_name, source_func in data_sources:
-            try:
-                # 检查缓存
-                cache_key = f"intraday_{ts_code}_{source_name}"
-                cached_data = DataCache.get(cache_key, expiry_seconds=30)  # 30秒缓存
-                if cached_data:
-                    return cached_data
-
-                # 获取数据
-                result = source_func(ts_code)
-
-                if result['success']:
-                    # 缓存成功结果
-                    DataCache.set(cache_key, result)
-                    return result
-
-            except Exception as e:
-                print(f"数据源 {source_name} 获取失败: {e}")
-                continue
-
-        return {
-            'success': False,
-            'message': '所有数据源都无法获取分时数据，请稍后重试',
-            'data': None
-        }
-
+            return {'success': False, 'message': f'分时数据获取失败: {str(e)}', 'data': None}
 
 
 class RealTimeDataService:
@@ -1435,6 +1011,47 @@ class RealTimeDataService:
                 'data': []
             }
     
+    @staticmethod
+    def get_batch_price_map(ts_codes, chunk_size=60):
+        """
+        批量获取最新价 - 腾讯API单次请求可查询多只股票
+
+        Returns:
+            dict: {ts_code: 最新价}，获取失败的股票不包含在内
+        """
+        price_map = {}
+        ts_codes = list(dict.fromkeys(ts_codes))
+
+        for i in range(0, len(ts_codes), chunk_size):
+            chunk = ts_codes[i:i + chunk_size]
+            code_map = {}
+            for ts_code in chunk:
+                prefix = 'sh' if ts_code.endswith('.SH') else 'sz'
+                code_map[prefix + ts_code.split('.')[0]] = ts_code
+
+            try:
+                url = f"http://qt.gtimg.cn/q={','.join(code_map.keys())}"
+                response = requests.get(url, timeout=5)
+                response.encoding = 'gbk'
+                if response.status_code != 200:
+                    continue
+
+                # 每行格式：v_sh600000="1~浦发银行~600000~当前价~...";
+                for match in re.finditer(r'v_(\w+)="([^"]*)"', response.text):
+                    data_parts = match.group(2).split('~')
+                    ts_code = code_map.get(match.group(1))
+                    if ts_code and len(data_parts) > 3:
+                        try:
+                            price = float(data_parts[3])
+                        except ValueError:
+                            continue
+                        if price > 0:
+                            price_map[ts_code] = price
+            except Exception as e:
+                print(f"批量获取价格失败: {e}")
+
+        return price_map
+
     @staticmethod
     def get_market_overview():
         """获取市场概况 - 使用东方财富API获取精确实时数据"""
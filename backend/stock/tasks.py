@@ -16,13 +16,14 @@ sys.path.append(BASE_DIR)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 django.setup()
 
+from django.utils import timezone
 from stock.models import StockBasic, StockDaily, StockCompany, TradeCal
 from trading.models import MarketNews
 from stock.services import StockDataService, RealTimeDataService
-import tushare as ts
+from stock.news_ingest import ingest_news
+from stock.lifecycle import archive_stock_daily, get_lifecycle_config
+from stock.market_ranking import market_ranking
 from dotenv import load_dotenv
-import requests
-from bs4 import BeautifulSoup
 
 # 加载环境变量
 load_dotenv()
@@ -42,11 +43,8 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-# 初始化Tushare
-token = os.getenv('TUSHARE_KEY')
-if token:
-    ts.set_token(token)
-    pro = ts.pro_api()
+# Tushare Pro 接口统一经网关调用（响应缓存、按接口限流），未配置token时为假值
+from stock.tushare_gateway import tushare_gateway as pro
 
 
 def sync_daily_stock_data():
@@ -119,6 +117,7 @@ def sync_daily_stock_data():
                 logger.error(f"批次同步失败: {e}")
         
         logger.info(f"当日数据同步完成：成功 {success_count} 条，失败 {error_count} 条")
+        market_ranking.invalidate()
         
         # 清理超过1年的历史数据（可选）
         cleanup_old_data()
@@ -203,38 +202,9 @@ def sync_financial_news():
     logger.info("开始同步财经新闻...")
     
     try:
-        success_count = 0
-        
-        # 方法1：从新浪财经爬取新闻
-        news_list = crawl_sina_finance_news()
-        
-        # 方法2：从东方财富爬取新闻（如果新浪失败）
-        if not news_list:
-            news_list = crawl_eastmoney_news()
-        
-        # 方法3：使用Bing搜索作为最后备用方案
-        if not news_list:
-            news_list = crawl_bing_finance_news()
-        
-        # 保存新闻到数据库
-        for news in news_list:
-            try:
-                # 检查新闻是否已存在
-                if not MarketNews.objects.filter(title=news['title']).exists():
-                    MarketNews.objects.create(
-                        title=news['title'],
-                        content=news['content'],
-                        source=news['source'],
-                        publish_time=news['publish_time'],
-                        category='财经新闻',
-                        related_stocks=news.get('related_stocks', [])
-                    )
-                    success_count += 1
-                    
-            except Exception as e:
-                logger.error(f"保存新闻失败: {e}")
-        
-        logger.info(f"财经新闻同步完成：新增 {success_count} 条新闻")
+        # 各新闻源并发抓取，批量去重入库
+        result = ingest_news(category='财经新闻')
+        logger.info(result['message'])
         
         # 清理超过30天的旧新闻
         cleanup_old_news()
@@ -243,236 +213,70 @@ def sync_financial_news():
         logger.error(f"同步财经新闻失败: {e}")
 
 
-def crawl_sina_finance_news():
-    """从新浪财经爬取真实新闻"""
+def cleanup_old_data():
+    """日线热数据窗口之外的历史数据按年归档为Parquet后移出数据库，清理过期的Tushare响应缓存"""
     try:
-        url = "https://feed.mix.sina.com.cn/api/roll/get"
-        params = {
-            'pageid': '153',  # 财经新闻频道
-            'lid': '1686',    # 股市新闻
-            'num': '10',      # 获取10条
-            'versionNumber': '1.2.4',
-            'page': '1'
-        }
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': 'https://finance.sina.com.cn/'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.encoding = 'utf-8'
-        
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                if data.get('result', {}).get('status', {}).get('code') == 0:
-                    news_list = []
-                    articles = data.get('result', {}).get('data', [])
-                    
-                    for article in articles[:10]:  # 取前10条
-                        try:
-                            title = article.get('title', '').strip()
-                            url_link = article.get('url', '')
-                            create_date = article.get('create_date', '')
-                            
-                            # 解析时间
-                            publish_time = datetime.now()
-                            if create_date:
-                                try:
-                                    publish_time = datetime.strptime(create_date, '%Y-%m-%d %H:%M:%S')
-                                except:
-                                    pass
-                            
-                            if title and len(title) > 5:  # 过滤太短的标题
-                                news_list.append({
-                                    'title': title,
-                                    'content': title,  # 简化版本，可以进一步获取正文
-                                    'source': '新浪财经',
-                                    'publish_time': publish_time,
-                                    'url': url_link,
-                                    'related_stocks': []
-                                })
-                        except Exception as e:
-                            logger.error(f"解析新闻项失败: {e}")
-                            continue
-                    
-                    return news_list
-                else:
-                    logger.error(f"新浪财经API返回错误: {data}")
-            except json.JSONDecodeError:
-                logger.error("新浪财经返回数据不是有效JSON")
-        else:
-            logger.error(f"访问新浪财经失败: HTTP {response.status_code}")
-            
+        result = archive_stock_daily()
+        logger.info(result['message'])
     except Exception as e:
-        logger.error(f"爬取新浪财经新闻失败: {e}")
-    
-    return []
+        logger.error(f"归档历史数据失败: {e}")
 
+    try:
+        removed = pro.purge_expired()
+        logger.info(f"清理了 {removed} 个过期的Tushare响应缓存")
+    except Exception as e:
+        logger.error(f"清理Tushare响应缓存失败: {e}")
 
-def crawl_eastmoney_news():
-    """从东方财富easyfinance爬取真实新闻数据"""
+
+def archive_tick_data():
+    """
+    归档分时数据
+    定时任务：每周六凌晨执行
+    """
     try:
-        # 使用东方财富的easyfinance新闻接口
-        url = "https://np-anotice-stock.eastmoney.com/api/security/ann"
-        params = {
-            'sr': -1,
-            'page': 1,
-            'pagesize': 10,
-            'ann_type': 'A',
-            'client': 'web'
-        }
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Referer': 'https://data.eastmoney.com/',
-            'Accept': 'application/json'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=15)
-        
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                news_list = []
-                
-                # 尝试不同的数据结构
-                announcements = data.get('data', []) or data.get('result', []) or []
-                
-                if announcements:
-                    for ann in announcements[:10]:
-                        try:
-                            title = ann.get('title', '').strip()
-                            code = ann.get('code', '') or ann.get('secucode', '')
-                            name = ann.get('name', '') or ann.get('secuname', '')
-                            notice_date = ann.get('notice_date', '') or ann.get('ann_date', '')
-                            
-                            # 构建完整标题
-                            if name and code:
-                                full_title = f"{name}({code}): {title}"
-                            else:
-                                full_title = title
-                            
-                            # 解析时间
-                            publish_time = datetime.now()
-                            if notice_date:
-                                try:
-                                    if ' ' in notice_date:
-                                        publish_time = datetime.strptime(notice_date.split(' ')[0], '%Y-%m-%d')
-                                    else:
-                                        publish_time = datetime.strptime(notice_date, '%Y-%m-%d')
-                                except:
-                                    pass
-                            
-                            if full_title and len(full_title) > 5:
-                                news_list.append({
-                                    'title': full_title,
-                                    'content': full_title,
-                                    'source': '东方财富',
-                                    'publish_time': publish_time,
-                                    'related_stocks': [code] if code else []
-                                })
-                        except Exception as e:
-                            logger.error(f"解析东方财富公告失败: {e}")
-                            continue
-                else:
-                    logger.warning("东方财富API返回数据为空")
-                
-                return news_list
-                
-            except json.JSONDecodeError:
-                logger.error("东方财富返回数据不是有效JSON")
-        else:
-            logger.error(f"访问东方财富失败: HTTP {response.status_code}")
-            logger.error(f"响应内容: {response.text[:200]}")
-        
-        return []
+        from stock.quantitative_data_service import quantitative_data_service
         
+        result = quantitative_data_service.archive_tick_data()
+        logger.info(result['message'])
     except Exception as e:
-        logger.error(f"爬取东方财富新闻失败: {e}")
-        return []
+        logger.error(f"归档分时数据失败: {e}")
 
 
-def crawl_bing_finance_news():
-    """使用Bing搜索获取财经新闻作为备用方案"""
+def migrate_legacy_tick_tables(drop=False):
+    """把旧的按股票建的日线/分时表并入合并表（一次性迁移工具，可重复执行）"""
     try:
-        # 使用Bing搜索最新财经新闻
-        search_query = "A股市场 股票 财经新闻"
-        url = "https://www.bing.com/search"
-        params = {
-            'q': search_query,
-            'count': 10,
-            'offset': 0,
-            'mkt': 'zh-CN'
-        }
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=15)
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            news_list = []
-            
-            # 解析Bing搜索结果
-            search_results = soup.find_all('div', class_='b_algo')
-            
-            for result in search_results[:10]:
-                try:
-                    title_element = result.find('h2')
-                    if title_element:
-                        title_link = title_element.find('a')
-                        if title_link:
-                            title = title_link.get_text().strip()
-                            url_link = title_link.get('href', '')
-                            
-                            # 过滤非财经相关的结果
-                            if any(keyword in title for keyword in ['股票', '股市', 'A股', '财经', '证券', '投资', '市场']):
-                                if title and len(title) > 5:
-                                    news_list.append({
-                                        'title': title,
-                                        'content': title,
-                                        'source': 'Bing搜索',
-                                        'publish_time': datetime.now(),
-                                        'url': url_link,
-                                        'related_stocks': []
-                                    })
-                except Exception as e:
-                    logger.error(f"解析Bing搜索结果失败: {e}")
-                    continue
-            
-            return news_list
-            
-        else:
-            logger.error(f"Bing搜索失败: HTTP {response.status_code}")
-            
+        from stock.quantitative_data_service import quantitative_data_service
+
+        result = quantitative_data_service.migrate_legacy_tables(drop=drop)
+        logger.info(result['message'])
+        if result['failed']:
+            logger.error(f"迁移失败的表: {result['failed']}")
+        return result
     except Exception as e:
-        logger.error(f"Bing搜索新闻失败: {e}")
-    
-    return []
+        logger.error(f"迁移旧行情表失败: {e}")
 
 
-def cleanup_old_data():
-    """清理超过1年的历史股票数据"""
+def persist_intraday_bars():
+    """
+    当日分时分钟线落库
+    定时任务：每个交易日收盘后执行
+    """
     try:
-        one_year_ago = datetime.now().date() - timedelta(days=365)
-        deleted_count = StockDaily.objects.filter(trade_date__lt=one_year_ago).count()
-        StockDaily.objects.filter(trade_date__lt=one_year_ago).delete()
-        logger.info(f"清理了 {deleted_count} 条超过1年的历史数据")
+        from stock.intraday_store import intraday_store
+
+        persisted = intraday_store.persist_session()
+        logger.info(f"分时分钟线落库完成：{persisted}只股票")
     except Exception as e:
-        logger.error(f"清理历史数据失败: {e}")
+        logger.error(f"分时分钟线落库失败: {e}")
 
 
 def cleanup_old_news():
-    """清理超过30天的旧新闻"""
+    """清理超过保留天数的旧新闻"""
     try:
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        deleted_count = MarketNews.objects.filter(publish_time__lt=thirty_days_ago).count()
-        MarketNews.objects.filter(publish_time__lt=thirty_days_ago).delete()
-        logger.info(f"清理了 {deleted_count} 条超过30天的旧新闻")
+        retention_days = get_lifecycle_config('NEWS_RETENTION_DAYS', 30)
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        deleted_count, _ = MarketNews.objects.filter(publish_time__lt=cutoff).delete()
+        logger.info(f"清理了 {deleted_count} 条超过{retention_days}天的旧新闻")
     except Exception as e:
         logger.error(f"清理旧新闻失败: {e}")
 
@@ -484,6 +288,36 @@ def cleanup_websocket_connections():
     pass
 
 
+def sync_index_daily():
+    """
+    同步指数日线（INDEX_DATA 配置的指数，增量）
+    定时任务：每个交易日指数日线发布后执行
+    """
+    try:
+        from stock.index_data import sync_index_daily as sync_indices
+
+        result = sync_indices()
+        logger.info(result['message'])
+    except Exception as e:
+        logger.error(f"同步指数日线失败: {e}")
+
+
+def top_up_market_daily():
+    """
+    全市场日线落后时补齐（排行快照的数据来源）
+    定时任务：每个交易日日线发布后执行
+    """
+    try:
+        from stock.market_ranking import market_ranking
+
+        if market_ranking.top_up():
+            logger.info("全市场日线补齐完成")
+        else:
+            logger.info("全市场日线已是最新，无需补齐")
+    except Exception as e:
+        logger.error(f"补齐全市场日线失败: {e}")
+
+
 def sync_trade_calendar():
     """同步交易日历"""
     logger.info("开始同步交易日历...")
@@ -524,6 +358,70 @@ def sync_trade_calendar():
         logger.error(f"同步交易日历失败: {e}")
 
 
+def settle_t1_positions():
+    """
+    收盘后T+1结算：当日买入股数转为可用
+    定时任务：每个工作日15:05执行，非交易日由交易日历跳过
+    """
+    from trading.services import SettlementService
+    
+    logger.info("开始T+1持仓结算...")
+    result = SettlementService.settle_t1()
+    if result['success']:
+        logger.info(result['message'])
+    else:
+        logger.error(result['message'])
+    return result
+
+
+def snapshot_accounts():
+    """
+    收盘后生成账户净值快照，用于绩效分析
+    定时任务：每个工作日15:40执行（在当日行情同步之后）
+    """
+    from trading.services import AccountAnalyticsService
+    
+    logger.info("开始生成账户净值快照...")
+    result = AccountAnalyticsService.take_daily_snapshots()
+    if result['success']:
+        logger.info(result['message'])
+    else:
+        logger.error(result['message'])
+    return result
+
+
+def refresh_leaderboard():
+    """
+    刷新收益排行榜
+    定时任务：交易时间每5分钟按实时价刷新，收盘快照后按收盘价刷新
+    """
+    from trading.services import LeaderboardService
+    
+    result = LeaderboardService.refresh()
+    if result['success']:
+        logger.info(result['message'])
+    else:
+        logger.error(result['message'])
+    return result
+
+
+def flush_chat_usage():
+    """
+    AI聊天次数计数从Redis回写到ChatUsage
+    定时任务：每5分钟执行，同时回写前一天零点前最后一段时间的计数
+    """
+    from chat.quota import flush_usage
+    
+    today = timezone.localdate()
+    try:
+        count = flush_usage(today - timedelta(days=1)) + flush_usage(today)
+        logger.info(f"聊天次数回写完成：{count} 个用户")
+        return count
+    except Exception as e:
+        logger.error(f"聊天次数回写失败: {e}")
+        return 0
+
+
 def manual_sync_all():
     """手动同步所有数据（用于测试）"""
     logger.info("开始手动同步所有数据...")
@@ -544,6 +442,9 @@ def manual_sync_all():
     # 5. 同步新闻
     sync_financial_news()
     
+    # 6. 同步指数日线
+    sync_index_daily()
+    
     logger.info("手动同步完成")
 
 
@@ -553,7 +454,14 @@ if __name__ == '__main__':
     python stock/tasks.py sync_daily      # 同步当日数据
     python stock/tasks.py sync_company    # 同步公司信息
     python stock/tasks.py sync_news       # 同步新闻
+    python stock/tasks.py sync_index      # 同步指数日线
+    python stock/tasks.py top_up_market   # 补齐全市场日线
     python stock/tasks.py manual_sync     # 手动同步所有
+    python stock/tasks.py settle          # T+1持仓结算
+    python stock/tasks.py snapshot        # 生成账户净值快照
+    python stock/tasks.py leaderboard     # 刷新收益排行榜
+    python stock/tasks.py chat_usage      # 聊天次数回写数据库
+    python stock/tasks.py migrate_ticks [--drop]  # 旧的按股票建表数据并入合并表
     """
     import sys
     
@@ -565,9 +473,23 @@ if __name__ == '__main__':
             sync_company_info()
         elif command == 'sync_news':
             sync_financial_news()
+        elif command == 'sync_index':
+            sync_index_daily()
+        elif command == 'top_up_market':
+            top_up_market_daily()
         elif command == 'manual_sync':
             manual_sync_all()
+        elif command == 'settle':
+            settle_t1_positions()
+        elif command == 'snapshot':
+            snapshot_accounts()
+        elif command == 'leaderboard':
+            refresh_leaderboard()
+        elif command == 'chat_usage':
+            flush_chat_usage()
+        elif command == 'migrate_ticks':
+            migrate_legacy_tick_tables(drop='--drop' in sys.argv[2:])
         else:
-            print("未知命令，可用命令：sync_daily, sync_company, sync_news, manual_sync")
+            print("未知命令，可用命令：sync_daily, sync_company, sync_news, sync_index, top_up_market, manual_sync, settle, snapshot, leaderboard, chat_usage, migrate_ticks")
     else:
-        print("请指定命令：sync_daily, sync_company, sync_news, manual_sync")
\ No newline at end of file
+        print("请指定命令：sync_daily, sync_company, sync_news, sync_index, top_up_market, manual_sync, settle, snapshot, leaderboard, chat_usage, migrate_ticks")
\ No newline at end of file
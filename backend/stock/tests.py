@@ -1,3 +1,153 @@
-from django.test import TestCase
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from stock import news_ingest
+from stock.market_ranking import MarketRanking, top_k_indices
+from stock.models import StockBasic, StockDaily
+from stock.tushare_gateway import TushareGateway, normalize_params
+from stock.search_index import StockSearchIndex
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StockSearchIndexTests(TestCase):
+    """股票搜索索引"""
+
+    @classmethod
+    def setUpTestData(cls):
+        StockBasic.objects.bulk_create([
+            StockBasic(ts_code=f'6000{i:02d}.SH', symbol=f'6000{i:02d}', name=f'测试{i}',
+                       industry='银行' if i % 2 else '证券', market='主板', list_status='L')
+            for i in range(30)
+        ])
+
+    def test_match_page_filters_and_slices_inside_index(self):
+        index = StockSearchIndex()
+        codes, total, page = index.match_page('6', page=2, page_size=10, industry='银行')
+        self.assertEqual(total, 15)
+        self.assertEqual(page, 2)
+        self.assertEqual(len(codes), 5)
+        self.assertEqual(codes, sorted(codes))
+        self.assertTrue(all(StockBasic.objects.get(ts_code=code).industry == '银行' for code in codes))
+
+    def test_match_page_clamps_out_of_range_page(self):
+        codes, total, page = StockSearchIndex().match_page('6', page=99, page_size=20)
+        self.assertEqual((total, page, len(codes)), (30, 2, 10))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NewsIngestTests(TestCase):
+    """新闻采集去重"""
+
+    ITEMS = [
+        {'title': '央行宣布下调存款准备金率0.5个百分点', 'content': '正文', 'related_stocks': ['600036.SH']},
+        {'title': '央行宣布下调存款准备金率 0.5 个百分点！', 'content': '转载', 'related_stocks': []},
+    ]
+
+    def ingest(self):
+        sources = {'stub': (lambda limit, timeout: list(self.ITEMS), 1, '财经新闻')}
+        with mock.patch.dict(news_ingest.NEWS_SOURCES, sources, clear=True):
+            return news_ingest.ingest_news()
+
+    def test_duplicates_collapse_to_one_row_with_links(self):
+        from trading.models import MarketNews, MarketNewsStock
+
+        self.assertEqual(self.ingest()['data']['inserted'], 1)
+        self.assertEqual(self.ingest()['data']['inserted'], 0)
+        news = MarketNews.objects.get()
+        self.assertEqual(list(MarketNewsStock.objects.values_list('news_id', 'ts_code')), [(news.id, '600036.SH')])
+
+    def test_concurrent_insert_is_ignored_by_unique_hash(self):
+        from trading.models import MarketNews, news_content_hash
+
+        title = self.ITEMS[0]['title']
+        MarketNews.objects.create(title=title, content='先入库', publish_time=timezone.now())
+        duplicate = MarketNews(title=title, content='后入库', publish_time=timezone.now(),
+                               content_hash=news_content_hash(title))
+        MarketNews.objects.bulk_create([duplicate], ignore_conflicts=True)
+        self.assertEqual(MarketNews.objects.filter(content_hash=news_content_hash(title)).count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MarketRankingTests(TestCase):
+    """全市场排行"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # pct_chg: 600000 -1%，600001 +2%，...；600003 停牌，600004 为ST
+        stocks = [('600000.SH', '浦发银行', -1, 100), ('600001.SH', '邯郸钢铁', 2, 100),
+                  ('600002.SH', '齐鲁石化', 5, 100), ('600003.SH', '东北高速', 9, 0),
+                  ('600004.SH', 'ST白云', 8, 100)]
+        StockBasic.objects.bulk_create([
+            StockBasic(ts_code=ts_code, symbol=ts_code[:6], name=name, list_status='L')
+            for ts_code, name, _, _ in stocks
+        ])
+        StockDaily.objects.bulk_create([
+            StockDaily(ts_code=ts_code, trade_date=date(2026, 10, 16), open=Decimal('10'), high=Decimal('11'),
+                       low=Decimal('9'), close=Decimal('10'), pre_close=Decimal('10'), change=Decimal('0'),
+                       pct_chg=Decimal(pct_chg), vol=vol, amount=Decimal('1000'))
+            for ts_code, _, pct_chg, vol in stocks
+        ])
+
+    def test_top_k_indices_orders_and_skips_nan(self):
+        values = np.array([3.0, np.nan, 7.0, 1.0, 5.0])
+        self.assertEqual(top_k_indices(values, 2).tolist(), [2, 4])
+        self.assertEqual(top_k_indices(values, 10, descending=False).tolist(), [3, 0, 4, 2])
+        self.assertEqual(top_k_indices(values, 0).tolist(), [])
+
+    def test_top_excludes_suspended_and_st(self):
+        ranking = MarketRanking()
+        self.assertEqual([row['ts_code'] for row in ranking.top('gainers', 2)], ['600002.SH', '600001.SH'])
+        self.assertEqual([row['ts_code'] for row in ranking.top('losers', 1)], ['600000.SH'])
+        self.assertIn('600004.SH', [row['ts_code'] for row in ranking.top('gainers', 5, exclude_st=False)])
+
+    def test_snapshot_read_does_not_top_up(self):
+        with mock.patch('stock.tushare_gateway.tushare_gateway.daily') as daily:
+            self.assertEqual(MarketRanking().get_snapshot().trade_date, date(2026, 10, 16))
+        daily.assert_not_called()
+
+
+class TushareGatewayTests(TestCase):
+    """Tushare 网关缓存"""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = override_settings(TUSHARE_CACHE_DIR=cache_dir.name)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+        self.gateway = TushareGateway()
+        self.gateway._pro = mock.Mock()
+        self.gateway._acquire = mock.Mock()
+
+    def test_equivalent_requests_share_cached_response(self):
+        self.gateway._pro.query.return_value = pd.DataFrame({'ts_code': ['600000.SH'], 'close': [10.0]})
+
+        first = self.gateway.daily(trade_date='20250912', fields='ts_code, close')
+        second = self.gateway.daily(trade_date='20250912', fields='close,ts_code', ts_code=None)
+
+        self.assertEqual(self.gateway._pro.query.call_count, 1)
+        self.assertEqual(second.to_dict('records'), first.to_dict('records'))
+
+    def test_empty_response_is_not_cached(self):
+        self.gateway._pro.query.return_value = pd.DataFrame()
+
+        self.gateway.daily(trade_date='20250912')
+        self.gateway.daily(trade_date='20250912')
+
+        self.assertEqual(self.gateway._pro.query.call_count, 2)
+
+    def test_normalize_params_drops_empty_and_sorts_fields(self):
+        self.assertEqual(
+            normalize_params({'fields': ' close,ts_code ', 'ts_code': '', 'limit': 5, 'start_date': None}),
+            {'fields': 'close,ts_code', 'limit': '5'}
+        )
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Tushare Pro 接口网关 - 所有 pro 接口调用的统一入口
+
+- 响应按 接口名 + 规范化参数 缓存为 Parquet 文件，多进程共享：
+  已收盘的历史数据（结束日期早于今天的日线、指数日线、交易日历等）不会再变化，长期缓存，
+  首次拉取后的重复读取不再消耗接口额度；当日行情、股票列表等可变数据按接口设置较短的有效期。
+  是否为历史数据按缓存文件的写入时间判断：只有在请求区间结束之后拉取的文件才长期有效，
+  区间结束当天拉取的文件（可能是盘中或未发布完整的数据）到了次日仍按短有效期重新拉取
+- 每个接口单独限流：优先用 Redis 按分钟计数（跨进程共享额度），Redis 不可用时退化为进程内令牌桶
+- 同一进程内相同请求并发时只向 Tushare 请求一次
+
+用法与 ts.pro_api() 返回的对象一致：
+
+    from stock.tushare_gateway import tushare_gateway as pro
+    df = pro.daily(trade_date='20250912')
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, time as dt_time, timedelta
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+HISTORY_TTL = 60 * 60 * 24 * 30  # 历史数据缓存有效期
+DEFAULT_TTL = 60 * 5
+QUOTA_KEY = 'tushare:quota:{api}:{window}'
+KEY_LOCK_STRIPES = 64
+
+# 可变数据的缓存有效期（秒）
+API_TTL = {
+    'daily': 60 * 5,
+    'index_daily': 60 * 5,
+    'daily_basic': 60 * 5,
+    'trade_cal': 60 * 60 * 12,
+    'stock_basic': 60 * 60 * 6,
+    'stock_company': 60 * 60 * 24,
+    'top10_holders': 60 * 60 * 24,
+}
+
+# 按日期区间查询、区间结束之后即不再变化的接口
+HISTORICAL_APIS = {'daily', 'index_daily', 'daily_basic', 'trade_cal'}
+END_DATE_PARAMS = ('end_date', 'trade_date', 'cal_date')
+
+
+def normalize_params(params):
+    """去掉空参数，值统一为字符串，fields 去空格后排序"""
+    normalized = {}
+    for name, value in params.items():
+        if value is None or value == '':
+            continue
+        if name == 'fields':
+            value = ','.join(sorted(field.strip() for field in str(value).split(',') if field.strip()))
+        normalized[name] = str(value)
+    return normalized
+
+
+def historical_since(api_name, params):
+    """
+    结果不再变化的起始时间：请求区间结束日的次日零点（时间戳）
+
+    Returns:
+        float | None: 在此之后写入的缓存文件可长期使用；可变接口或区间延伸到今天（只有开始日期）时为None
+    """
+    if api_name not in HISTORICAL_APIS:
+        return None
+    end = next((params[name] for name in END_DATE_PARAMS if params.get(name)), None)
+    if not end:
+        return None
+    try:
+        end_date = datetime.strptime(end.replace('-', '')[:8], '%Y%m%d').date()
+    except ValueError:
+        return None
+    next_day = datetime.combine(end_date + timedelta(days=1), dt_time.min, tzinfo=timezone.get_current_timezone())
+    return next_day.timestamp()
+
+
+class TokenBucket:
+    """令牌桶限速：按固定速率补充令牌，允许不超过容量的突发，多线程共享"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, int(rate_per_minute // 60))
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """取得令牌，不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class TushareGateway(object):
+    """Tushare Pro 网关"""
+
+    def __init__(self):
+        self.token = os.getenv('TUSHARE_TOKEN') or os.getenv('TUSHARE_KEY')
+        self._pro = None
+        self._buckets = {}
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        """是否配置了token（兼容原先 `if not pro` 的判断）"""
+        return bool(self.token)
+
+    def __getattr__(self, api_name):
+        if api_name.startswith('_'):
+            raise AttributeError(api_name)
+        return lambda fields='', **params: self.query(api_name, fields=fields, **params)
+
+    @property
+    def pro(self):
+        if self._pro is None:
+            if not self.token:
+                raise RuntimeError('TuShare API未配置或token无效')
+            import tushare as ts
+
+            self._pro = ts.pro_api(self.token)
+        return self._pro
+
+    # ---------- 磁盘缓存 ----------
+
+    @staticmethod
+    def get_cache_dir():
+        return Path(getattr(settings, 'TUSHARE_CACHE_DIR', Path(settings.BASE_DIR) / 'data' / 'tushare_cache'))
+
+    def _cache_path(self, api_name, params):
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+        return self.get_cache_dir() / api_name / f'{digest}.parquet'
+
+    @staticmethod
+    def _read_cache(path, ttl, final_after=None):
+        try:
+            mtime = path.stat().st_mtime
+            # 区间结束后拉取的文件是完整的历史数据，按历史数据有效期
+            if final_after is not None and mtime >= final_after:
+                ttl = HISTORY_TTL
+            if time.time() - mtime >= ttl:
+                return None
+            return pd.read_parquet(path, engine='pyarrow')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning('tushare_gateway result=cache_unreadable path=%s error=%s', path, e)
+            return None
+
+    @staticmethod
+    def _write_cache(path, df):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再替换，其他进程不会读到写了一半的文件
+            tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            df.to_parquet(tmp_path, engine='pyarrow', index=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning('tushare_gateway result=cache_write_failed path=%s error=%s', path, e)
+
+    def purge_expired(self):
+        """删除已超过历史数据有效期的缓存文件"""
+        removed = 0
+        cutoff = time.time() - HISTORY_TTL
+        for path in self.get_cache_dir().glob('*/*.parquet'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        logger.info('tushare_gateway result=purged removed=%s', removed)
+        return removed
+
+    # ---------- 限流 ----------
+
+    @staticmethod
+    def get_rate_limit(api_name):
+        limits = getattr(settings, 'TUSHARE_API_LIMITS', {})
+        return limits.get(api_name, getattr(settings, 'TUSHARE_CALLS_PER_MINUTE', 500))
+
+    def _acquire(self, api_name):
+        """取得一次调用额度，超额时等待"""
+        limit = self.get_rate_limit(api_name)
+        try:
+            from django_redis import get_redis_connection
+
+            redis_conn = get_redis_connection('default')
+            while True:
+                now = time.time()
+                window = int(now // 60)
+                key = QUOTA_KEY.format(api=api_name, window=window)
+                count = redis_conn.incr(key)
+                if count == 1:
+                    redis_conn.expire(key, 120)
+                if count <= limit:
+                    return
+                time.sleep((window + 1) * 60 - now)
+        except Exception as e:
+            logger.debug('tushare_gateway result=shared_quota_unavailable api=%s error=%s', api_name, e)
+
+        with self._lock:
+            bucket = self._buckets.get(api_name)
+            if bucket is None:
+                bucket = self._buckets[api_name] = TokenBucket(limit)
+        bucket.acquire()
+
+    def _key_lock(self, path):
+        return self._key_locks[hash(path) % KEY_LOCK_STRIPES]
+
+    # ---------- 查询 ----------
+
+    def query(self, api_name, fields='', **params):
+        """
+        调用 Tushare Pro 接口（参数与 pro.query 一致）
+
+        Returns:
+            DataFrame: 接口返回结果，空结果不缓存
+        """
+        key_params = normalize_params(dict(params, fields=fields))
+        path = self._cache_path(api_name, key_params)
+        ttl = API_TTL.get(api_name, DEFAULT_TTL)
+        final_after = historical_since(api_name, key_params)
+
+        df = self._read_cache(path, ttl, final_after)
+        if df is not None:
+            return df
+
+        with self._key_lock(path):
+            # 等锁期间其他线程可能已经拉取
+            df = self._read_cache(path, ttl, final_after)
+            if df is not None:
+                return df
+
+            self._acquire(api_name)
+            start_time = time.perf_counter()
+            df = self.pro.query(api_name, fields=fields, **params)
+            logger.debug('tushare_gateway api=%s rows=%s duration=%.3f', api_name,
+                         0 if df is None else len(df), time.perf_counter() - start_time)
+            if df is not None and not df.empty:
+                self._write_cache(path, df)
+            return df
+
+
+tushare_gateway = TushareGateway()
@@ -13,6 +13,8 @@ from datetime import date, datetime, timedelta
 from django.conf import settings
 import logging
 
+from stock.tushare_gateway import tushare_gateway
+
 logger = logging.getLogger(__name__)
 
 class EnterpriseFinanceDataService:
@@ -26,7 +28,8 @@ class EnterpriseFinanceDataService:
         if self.token:
             try:
                 ts.set_token(self.token)
-                self.pro = ts.pro_api(self.token)
+                # pro 接口经网关调用：响应缓存、按接口共享限流额度
+                self.pro = tushare_gateway
                 # 测试连接
                 test_df = self.pro.query('stock_basic', exchange='', list_status='L', fields='ts_code', limit=1)
                 logger.info("TuShare Pro API连接成功，企业级金融数据服务已启动")
@@ -193,31 +196,11 @@ class EnterpriseFinanceDataService:
     
     def get_top_gainers(self, limit=10):
         """
-        获取涨幅榜前N只股票
+        获取涨幅榜前N只股票（本地全市场快照，见 stock.market_ranking）
         """
-        if not self.pro:
-            raise ValueError("TuShare token not configured")
-            
-        # 尝试获取当日数据
-        today = datetime.now().strftime('%Y%m%d')
-        df = self.pro.daily(trade_date=today)
-        
-        if df is not None and not df.empty:
-            # 按涨跌幅排序
-            df = df.sort_values('pct_chg', ascending=False).head(limit)
-            return df.to_dict('records')
-        else:
-            # 当日数据为空，尝试获取最近交易日数据
-            for i in range(1, 8):  # 尝试最近7天
-                test_date = (datetime.now() - timedelta(days=i)).strftime('%Y%m%d')
-                df = self.pro.daily(trade_date=test_date)
-                
-                if df is not None and not df.empty:
-                    df = df.sort_values('pct_chg', ascending=False).head(limit)
-                    return df.to_dict('records')
-            
-            # 如果都没有数据，返回空列表
-            return []
+        from stock.market_ranking import market_ranking
+
+        return market_ranking.top('gainers', limit)
     
     def _is_trade_day(self):
         """
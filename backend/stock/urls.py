@@ -25,6 +25,7 @@ urlpatterns = [
     path('kline/<str:ts_code>/', views.stock_kline_data, name='stock_kline_data'),                   # GET K线数据
     path('technical/<str:ts_code>/', views.stock_technical_analysis, name='stock_technical_analysis'), # GET 技术分析
     path('holders/<str:ts_code>/', views.get_stock_holders, name='get_stock_holders'),          # GET 股票持股信息
+    path('backtest/', views.stock_backtest, name='stock_backtest'),                                  # POST 策略回测
     
     # 新闻相关
     path('news/', views.market_news_list, name='market_news_list'),                                # GET 新闻列表
@@ -1,35 +1,30 @@
 # -*- coding: utf-8 -*-
 
 import json
+import math
 from decimal import Decimal
 from datetime import datetime, timedelta
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import IntegrityError
 
 from stock.models import StockBasic, StockDaily, StockCompany, StockBasicSerializer, StockDailySerializer, StockCompanySerializer
 from stock.services import StockDataService, UserPermissionService, RealTimeDataService, IntradayDataService
+from stock.search_index import stock_search_index
+from trading.news_feed import get_news_page, get_news_items, get_latest_news, get_news_categories
+from trading.news_search import news_search_index
 from trading.services import TradingService
 from stock.tushare_service import EnterpriseFinanceDataService
 enterprise_finance_service = EnterpriseFinanceDataService()
 from utils.permissions import require_role, require_login, admin_required, superadmin_required
 from user.models import SysUser
 
-# 导入Tushare
-import os
-import tushare as ts
-from dotenv import load_dotenv
-
-# 加载环境变量并初始化Tushare
-load_dotenv()
-token = os.getenv('TUSHARE_TOKEN')
-if token:
-    ts.set_token(token)
-    pro = ts.pro_api()
-else:
-    pro = None
+# Tushare Pro 接口统一经网关调用（响应缓存、按接口限流），未配置token时为假值
+from stock.tushare_gateway import tushare_gateway as pro
+from stock.index_data import get_index_kline, get_index_universe, is_index
+from stock.market_ranking import RANKINGS, market_ranking
 
 
 @require_login
@@ -55,21 +50,23 @@ def stock_list(request):
         queryset = StockBasic.objects.filter(list_status='L')  # 只显示上市股票
 
         if keyword:
-            queryset = queryset.filter(
-                Q(name__icontains=keyword) |
-                Q(ts_code__icontains=keyword) |
-                Q(symbol__icontains=keyword)
+            # 关键字匹配、筛选和分页在搜索索引内完成，只查询当前页的股票
+            page_codes, total, page = stock_search_index.match_page(
+                keyword, page, page_size, industry=industry, market=market
             )
+            stocks = queryset.filter(ts_code__in=page_codes).order_by('ts_code')
+            total_pages = max(1, (total + page_size - 1) // page_size)
+        else:
+            if industry:
+                queryset = queryset.filter(industry=industry)
 
-        if industry:
-            queryset = queryset.filter(industry=industry)
-
-        if market:
-            queryset = queryset.filter(market=market)
+            if market:
+                queryset = queryset.filter(market=market)
 
-        # 分页
-        paginator = Paginator(queryset.order_by('ts_code'), page_size)
-        stocks = paginator.get_page(page)
+            # 分页
+            paginator = Paginator(queryset.order_by('ts_code'), page_size)
+            stocks = paginator.get_page(page)
+            total, total_pages = paginator.count, paginator.num_pages
 
         # 序列化数据 - 展示真实的最新数据
         stock_list = []
@@ -102,10 +99,10 @@ def stock_list(request):
             'msg': '获取成功',
             'data': {
                 'list': stock_list,
-                'total': paginator.count,
+                'total': total,
                 'page': page,
                 'pageSize': page_size,
-                'totalPages': paginator.num_pages,
+                'totalPages': total_pages,
                 'summary': {
                     'total_stocks': stock_count,
                     'with_data': len([s for s in stock_list if s['current_price'] is not None]),
@@ -251,6 +248,19 @@ def stock_detail(request, ts_code):
             except:
                 pass  # 公司信息获取失败不影响主要功能
 
+        # 相关新闻（新闻-股票关联表按 (ts_code, publish_time) 索引查询）
+        from trading.models import MarketNewsStock
+        news_links = MarketNewsStock.objects.filter(
+            ts_code=ts_code, news__is_published=True
+        ).select_related('news').order_by('-publish_time')[:10]
+        related_news = [{
+            'id': link.news.id,
+            'title': link.news.title,
+            'source': link.news.source,
+            'category': link.news.category,
+            'publish_time': link.news.publish_time.strftime('%Y-%m-%d %H:%M:%S'),
+        } for link in news_links]
+
         # 构建返回数据
         stock_detail = {
             'ts_code': stock.ts_code,
@@ -274,6 +284,7 @@ def stock_detail(request, ts_code):
             'trade_date': latest_daily.trade_date.strftime('%Y-%m-%d') if latest_daily else None,
             'history_data': history_list,
             'company_info': company_info,
+            'related_news': related_news,
             'data_count': len(history_list),  # 返回数据条数
             'last_update': datetime.now().isoformat()  # 最后更新时间
         }
@@ -293,123 +304,27 @@ def stock_detail(request, ts_code):
 
 @require_login
 def stock_hot_list(request):
-    """热门牛股/涨幅榜 - 动态显示涨幅最大的前N只股票"""
+    """热门牛股/排行榜 - 本地全市场快照的前N只股票（rank: gainers/losers/turnover/amplitude）"""
     try:
         limit = int(request.GET.get('limit', 10))  # 默认10只，支持用户自定义
         limit = min(limit, 50)  # 最大50只，防止性能问题
+        rank = request.GET.get('rank', 'gainers')
+        if rank not in RANKINGS:
+            return JsonResponse({
+                'code': 400,
+                'msg': f'不支持的排行类型: {rank}，可选: {",".join(RANKINGS)}'
+            })
 
-        print(f"获取涨幅榜前{limit}只股票")
-
-        # 优先从TuShare API实时获取涨幅榜
-        use_realtime_api = True
-        hot_stocks = []
-
-        if use_realtime_api and pro:
-            try:
-                print("尝试从TuShare API获取实时涨幅榜...")
-
-                from stock.tushare_service import enterprise_finance_service
-
-                gainers = enterprise_finance_service.get_top_gainers(limit * 2)  # 获取2倍数量，筛选后返回
-
-                if gainers and len(gainers) > 0:
-                    print(f"从TuShare API获取到 {len(gainers)} 只涨幅股票")
-
-                    # 转换为标准格式
-                    for gainer in gainers:
-                        try:
-                            # 获取股票基本信息
-                            try:
-                                stock_basic = StockBasic.objects.get(ts_code=gainer['ts_code'])
-                                stock_name = stock_basic.name
-                                industry = stock_basic.industry if stock_basic.industry else '未分类'
-                            except StockBasic.DoesNotExist:
-                                stock_name = gainer.get('ts_code', '未知')
-                                industry = '未分类'
-
-                            hot_stocks.append({
-                                'ts_code': gainer['ts_code'],
-                                'name': stock_name,
-                                'close': float(gainer['close']) if gainer.get('close') else 0,
-                                'open': float(gainer['open']) if gainer.get('open') else 0,
-                                'high': float(gainer['high']) if gainer.get('high') else 0,
-                                'low': float(gainer['low']) if gainer.get('low') else 0,
-                                'change': float(gainer['change']) if gainer.get('change') else 0,
-                                'pct_chg': float(gainer['pct_chg']) if gainer.get('pct_chg') else 0,
-                                'vol': int(gainer['vol']) if gainer.get('vol') else 0,
-                                'amount': float(gainer['amount']) if gainer.get('amount') else 0,
-                                'trade_date': gainer.get('trade_date', datetime.now().strftime('%Y%m%d')),
-                                'industry': industry,
-                                'data_source': 'tushare_api_realtime'
-                            })
-
-                            # 已经获得足够数量就停止
-                            if len(hot_stocks) >= limit:
-                                break
-
-                        except Exception as item_error:
-                            print(f"处理涨幅股票数据失败: {item_error}")
-                            continue
-
-                    # 确保按涨跌幅排序
-                    hot_stocks.sort(key=lambda x: x['pct_chg'], reverse=True)
-                    hot_stocks = hot_stocks[:limit]
-
-                else:
-                    print("TuShare API返回空涨幅榜，回退到本地数据")
-                    use_realtime_api = False
-
-            except Exception as api_error:
-                print(f"TuShare API获取涨幅榜失败: {api_error}，回退到本地数据")
-                use_realtime_api = False
-
-        # 如果实时API失败，回退到本地数据
-        if not use_realtime_api or not hot_stocks:
-            print("从本地数据库获取涨幅榜...")
-
-            try:
-                hot_stocks = StockDataService.get_top_stocks(limit)
-
-                # 添加数据源标识
-                for stock in hot_stocks:
-                    stock['data_source'] = 'local_database'
-
-                print(f"从本地数据库获取到 {len(hot_stocks)} 只热门股票")
-
-            except Exception as local_error:
-                print(f"本地数据获取也失败: {local_error}")
-
-                # 最后的回退：使用固定的热门股票列表
-                fallback_stocks = ['000001.SZ', '000002.SZ', '000858.SZ', '600000.SH', '600036.SH',
-                                 '600519.SH', '002594.SZ', '300750.SZ', '002415.SZ', '000776.SZ']
-
-                hot_stocks = []
-                for ts_code in fallback_stocks[:limit]:
-                    try:
-                        stock = StockBasic.objects.get(ts_code=ts_code)
-                        latest_daily = StockDaily.objects.filter(ts_code=ts_code).order_by('-trade_date').first()
-
-                        if latest_daily:
-                            hot_stocks.append({
-                                'ts_code': ts_code,
-                                'name': stock.name,
-                                'close': float(latest_daily.close) if latest_daily.close else 0,
-                                'change': float(latest_daily.change) if latest_daily.change else 0,
-                                'pct_chg': float(latest_daily.pct_chg) if latest_daily.pct_chg else 0,
-                                'vol': latest_daily.vol if latest_daily.vol else 0,
-                                'amount': float(latest_daily.amount) if latest_daily.amount else 0,
-                                'trade_date': latest_daily.trade_date.strftime('%Y-%m-%d'),
-                                'industry': stock.industry if stock.industry else '未分类',
-                                'data_source': 'local_fallback'
-                            })
-                    except:
-                        continue
+        if rank == 'gainers':
+            hot_stocks = StockDataService.get_top_stocks(limit)
+        else:
+            hot_stocks = [dict(row, data_source='local_market_snapshot') for row in market_ranking.top(rank, limit)]
 
         # 如果还是没有数据，返回错误
         if not hot_stocks:
             return JsonResponse({
                 'code': 404,
-                'msg': '暂时无法获取涨幅榜数据，请稍后重试'
+                'msg': '暂时无法获取排行榜数据，请稍后重试'
             })
 
         return JsonResponse({
@@ -419,7 +334,9 @@ def stock_hot_list(request):
                 'list': hot_stocks,
                 'count': len(hot_stocks),
                 'limit': limit,
-                'data_source': hot_stocks[0].get('data_source', 'unknown') if hot_stocks else 'unknown',
+                'rank': rank,
+                'rank_name': RANKINGS[rank][2],
+                'data_source': hot_stocks[0].get('data_source', 'unknown'),
                 'last_update': datetime.now().isoformat()
             }
         })
@@ -427,7 +344,7 @@ def stock_hot_list(request):
     except Exception as e:
         return JsonResponse({
             'code': 500,
-            'msg': f'获取涨幅榜失败: {str(e)}'
+            'msg': f'获取排行榜失败: {str(e)}'
         })
 
 
@@ -500,23 +417,8 @@ def stock_search(request):
                 'msg': '请输入搜索关键词'
             })
         
-        # 搜索股票
-        stocks = StockBasic.objects.filter(
-            Q(name__icontains=keyword) | 
-            Q(ts_code__icontains=keyword) |
-            Q(symbol__icontains=keyword),
-            list_status='L'
-        )[:limit]
-        
-        result = []
-        for stock in stocks:
-            result.append({
-                'ts_code': stock.ts_code,
-                'symbol': stock.symbol,
-                'name': stock.name,
-                'industry': stock.industry,
-                'market': stock.market,
-            })
+        # 内存前缀索引搜索（代码/名称/拼音缩写），按流动性排序
+        result = stock_search_index.search(keyword, limit)
         
         return JsonResponse({
             'code': 200,
@@ -577,7 +479,10 @@ def stock_realtime_data(request, ts_code):
 def stock_intraday_chart(request, ts_code):
     """获取股票分时图数据 - 使用多数据源策略，只返回真实数据"""
     try:
-        result = IntradayDataService.get_stock_intraday_multi_source(ts_code)
+        # since=HH:MM 时只返回该分钟及之后的数据，date 与当前交易日不一致时返回全量（data.reset=True）
+        result = IntradayDataService.get_stock_intraday_multi_source(
+            ts_code, since=request.GET.get('since'), trade_date=request.GET.get('date')
+        )
         
         if result['success']:
             return JsonResponse({
@@ -761,120 +666,11 @@ def stock_kline_data(request, ts_code):
             except (ValueError, TypeError):
                 return default
 
-        # 检查是否为指数代码（上证指数、深证指数等）
-        is_index = ts_code in ['000001.SH', '399001.SZ', '399006.SZ', '000300.SH', '000905.SH']
-
-        if is_index:
-            # 指数数据直接从Tushare获取
-            if not pro:
-                return JsonResponse({
-                    'code': 500,
-                    'msg': 'Tushare API未配置，无法获取指数数据'
-                })
-
-            # 直接从API获取最新数据
-            try:
-                # 计算日期范围 - 确保获取足够的数据
-                end_date = datetime.now().strftime('%Y%m%d')
-                start_date = (datetime.now() - timedelta(days=limit * 3)).strftime('%Y%m%d')
-
-                print(f"获取指数数据: {ts_code}, 日期范围: {start_date} - {end_date}")
-
-                # 获取指数日线数据
-                df = pro.index_daily(
-                    ts_code=ts_code,
-                    start_date=start_date,
-                    end_date=end_date,
-                    fields='ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
-                )
-
-                if df.empty:
-                    return JsonResponse({
-                        'code': 404,
-                        'msg': f'无法获取指数 {ts_code} 的K线数据'
-                    })
-
-                # 转换为前端需要的格式 - 使用安全转换
-                kline_data = []
-                for _, row in df.iterrows():
-                    try:
-                        kline_data.append({
-                            'date': datetime.strptime(str(row['trade_date']), '%Y%m%d').strftime('%Y-%m-%d'),
-                            'open': safe_float(row['open']),
-                            'high': safe_float(row['high']),
-                            'low': safe_float(row['low']),
-                            'close': safe_float(row['close']),
-                            'volume': safe_int(row['vol']),
-                            'amount': safe_float(row['amount']),
-                            'change': safe_float(row['change']),
-                            'pct_chg': safe_float(row['pct_chg']),
-                            'pre_close': safe_float(row['pre_close'])
-                        })
-                    except (ValueError, TypeError) as e:
-                        continue
-
-                # 按日期正序排列，符合K线图要求
-                kline_data.sort(key=lambda x: x['date'])
-
-                # 限制返回数量
-                result_data = kline_data[-limit:] if limit and len(kline_data) > limit else kline_data
-
-                # 获取指数名称
-                index_names = {
-                    '000001.SH': '上证指数',
-                    '399001.SZ': '深证成指',
-                    '399006.SZ': '创业板指',
-                    '000300.SH': '沪深300',
-                    '000905.SH': '中证500'
-                }
-                stock_name = index_names.get(ts_code, ts_code)
-
-                # 创建ECharts安全格式
-                echarts_data = {
-                    'dates': [item['date'] for item in result_data],
-                    'values': [[
-                        item['open'],
-                        item['close'],
-                        item['low'],
-                        item['high']
-                    ] for item in result_data],
-                    'volumes': [item['volume'] for item in result_data]
-                }
-
-                chart_data = [[
-                    item['date'],
-                    item['open'],
-                    item['close'],
-                    item['low'],
-                    item['high'],
-                    item['volume']
-                ] for item in result_data]
-
-                return JsonResponse({
-                    'code': 200,
-                    'msg': '获取成功',
-                    'data': {
-                        'ts_code': ts_code,
-                        'name': stock_name,
-                        'period': period,
-                        'adjust': adjust,
-                        'count': len(result_data),
-                        'kline_data': result_data,
-                        'latest_info': result_data[-1] if result_data else None,
-                        'data_source': 'tushare_index_realtime',
-                        'last_update': datetime.now().isoformat(),
-                        # ECharts专用格式 - 确保数据安全
-                        'echarts_data': echarts_data,
-                        # 二维数组格式（ECharts标准格式）
-                        'chart_data': chart_data
-                    }
-                })
-
-            except Exception as e:
-                return JsonResponse({
-                    'code': 500,
-                    'msg': f'获取指数数据失败: {str(e)}'
-                })
+        # 指数（INDEX_DATA 配置的指数）从本地指数日线读取，与个股共用后续的数据校验和技术指标计算
+        if is_index(ts_code):
+            stock_name = get_index_universe()[ts_code]
+            kline_data = get_index_kline(ts_code, period, limit)
+            data_source = 'local_index_daily'
         else:
                 # 股票数据 优先使用实时API，回退到本地数据
             stock_name = ts_code
@@ -1404,57 +1200,112 @@ def stock_technical_analysis(request, ts_code):
         })
 
 
+@require_login
+@csrf_exempt
+@require_http_methods(["POST"])
+def stock_backtest(request):
+    """策略回测 - 基于本地日线数据回测均线交叉/MACD/RSI策略，所有用户可访问"""
+    try:
+        from stock.backtest import run_backtest, STRATEGIES
+
+        data = json.loads(request.body)
+        ts_codes = data.get('ts_codes') or ([data['ts_code']] if data.get('ts_code') else [])
+        strategy = data.get('strategy', 'ma_cross')
+
+        if not ts_codes:
+            return JsonResponse({
+                'code': 400,
+                'msg': '请提供股票代码'
+            })
+
+        if len(ts_codes) > 50:
+            return JsonResponse({
+                'code': 400,
+                'msg': '单次回测最多支持50只股票'
+            })
+
+        if strategy not in STRATEGIES:
+            return JsonResponse({
+                'code': 400,
+                'msg': f'不支持的策略，可选：{", ".join(STRATEGIES.keys())}'
+            })
+
+        initial_capital = float(data.get('initial_capital', 100000))
+        if not math.isfinite(initial_capital) or initial_capital <= 0:
+            return JsonResponse({
+                'code': 400,
+                'msg': '初始资金必须为大于0的数值'
+            })
+
+        result = run_backtest(
+            ts_codes,
+            strategy=strategy,
+            params=data.get('params'),
+            start_date=data.get('start_date'),
+            end_date=data.get('end_date'),
+            initial_capital=initial_capital,
+            # 股票较多时只返回统计和交易明细，不返回逐日净值曲线
+            include_curve=len(ts_codes) <= 10
+        )
+
+        if not result['success']:
+            return JsonResponse({
+                'code': 404,
+                'msg': result['message']
+            })
+
+        return JsonResponse({
+            'code': 200,
+            'msg': result['message'],
+            'data': result['data']
+        })
+
+    except (ValueError, TypeError, KeyError) as e:
+        return JsonResponse({
+            'code': 400,
+            'msg': f'参数格式错误: {str(e)}'
+        })
+    except Exception as e:
+        return JsonResponse({
+            'code': 500,
+            'msg': f'回测失败: {str(e)}'
+        })
+
+
 @require_login
 def market_news_list(request):
     """获取市场新闻列表 - 所有用户可访问"""
     try:
-        from trading.models import MarketNews
-        
         # 获取查询参数
         page = int(request.GET.get('page', 1))
         page_size = int(request.GET.get('pageSize', 20))
         category = request.GET.get('category', '').strip()
         keyword = request.GET.get('keyword', '').strip()
-        
-        # 构建查询条件
-        queryset = MarketNews.objects.all()
-        
-        if category:
-            queryset = queryset.filter(category=category)
+        ts_code = request.GET.get('ts_code', '').strip()
         
         if keyword:
-            queryset = queryset.filter(
-                Q(title__icontains=keyword) | 
-                Q(content__icontains=keyword)
+            # 全文索引检索，按相关度排序
+            hits = news_search_index.search(
+                keyword, category=category or None, ts_code=ts_code or None,
+                offset=(page - 1) * page_size, limit=page_size
             )
-        
-        # 分页
-        paginator = Paginator(queryset.order_by('-publish_time'), page_size)
-        news_page = paginator.get_page(page)
-        
-        # 序列化数据
-        news_list = []
-        for news in news_page:
-            news_list.append({
-                'id': news.id,
-                'title': news.title,
-                'content': news.content[:200] + '...' if len(news.content) > 200 else news.content,
-                'source': news.source,
-                'category': news.category,
-                'publish_time': news.publish_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'related_stocks': news.related_stocks if news.related_stocks else [],
-                'summary': news.content[:100] + '...' if len(news.content) > 100 else news.content,
-            })
+            news_list = get_news_items(hits['ids'])
+            total = hits['total']
+        else:
+            # 按时间倒序的列表页走新闻列表缓存
+            feed = get_news_page(page, page_size, category=category or None, ts_code=ts_code or None)
+            news_list = feed['list']
+            total = feed['total']
         
         return JsonResponse({
             'code': 200,
             'msg': '获取成功',
             'data': {
                 'list': news_list,
-                'total': paginator.count,
+                'total': total,
                 'page': page,
                 'pageSize': page_size,
-                'totalPages': paginator.num_pages,
+                'totalPages': (total + page_size - 1) // page_size,
             }
         })
         
@@ -1508,28 +1359,10 @@ def market_news_detail(request, news_id):
 def latest_market_news(request):
     """获取最新市场新闻 - 所有用户可访问"""
     try:
-        from trading.models import MarketNews
-        
         limit = int(request.GET.get('limit', 10))
         category = request.GET.get('category', '').strip()
         
-        queryset = MarketNews.objects.all()
-        if category:
-            queryset = queryset.filter(category=category)
-        
-        latest_news = queryset.order_by('-publish_time')[:limit]
-        
-        news_list = []
-        for news in latest_news:
-            news_list.append({
-                'id': news.id,
-                'title': news.title,
-                'source': news.source,
-                'category': news.category,
-                'publish_time': news.publish_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'summary': news.content[:100] + '...' if len(news.content) > 100 else news.content,
-                'related_stocks': news.related_stocks if news.related_stocks else [],
-            })
+        news_list = get_latest_news(limit, category=category or None)
         
         return JsonResponse({
             'code': 200,
@@ -1548,14 +1381,10 @@ def latest_market_news(request):
 def news_categories(request):
     """获取新闻分类列表 - 所有用户可访问"""
     try:
-        from trading.models import MarketNews
-        
-        categories = MarketNews.objects.values_list('category', flat=True).distinct().exclude(category__isnull=True).exclude(category='')
-        
         return JsonResponse({
             'code': 200,
             'msg': '获取成功',
-            'data': list(categories)
+            'data': get_news_categories()
         })
         
     except Exception as e:
@@ -1613,6 +1442,11 @@ def create_market_news(request):
             }
         })
         
+    except IntegrityError:
+        return JsonResponse({
+            'code': 400,
+            'msg': '已存在相同标题的新闻'
+        })
     except Exception as e:
         return JsonResponse({
             'code': 500,
@@ -1783,7 +1617,10 @@ def get_intraday_chart(request, ts_code):
     获取分时图数据 - 使用多数据源策略，只返回真实数据
     """
     try:
-        result = IntradayDataService.get_stock_intraday_multi_source(ts_code)
+        # since=HH:MM 时只返回该分钟及之后的数据，date 与当前交易日不一致时返回全量（data.reset=True）
+        result = IntradayDataService.get_stock_intraday_multi_source(
+            ts_code, since=request.GET.get('since'), trade_date=request.GET.get('date')
+        )
 
         if result['success']:
             return JsonResponse({
@@ -1849,110 +1686,17 @@ def get_stock_holders(request, ts_code):
 @require_login
 def get_hot_stocks(request):
     """
-    获取热门股票 - 真正的每日涨幅榜
+    获取热门股票 - 每日涨幅榜（本地全市场快照，本地数据落后时经网关补齐）
     """
     try:
-        limit = int(request.GET.get('limit', 10))
+        limit = min(int(request.GET.get('limit', 10)), 50)
+        hot_stocks = StockDataService.get_top_stocks(limit)
         
-        # 尝试从数据库获取最新交易日数据
-        latest_date = StockDaily.objects.values('trade_date').order_by('-trade_date').first()
-        
-        if not latest_date:
-            # 如果数据库中没有数据，尝试从Tushare获取今日数据
-            try:
-                if not pro:  # 如果没有配置Tushare
-                    return JsonResponse({
-                        'code': 500,
-                        'msg': 'Tushare API未配置，请联系管理员配置TUSHARE_TOKEN'
-                    })
-                
-                # 获取今日股票数据
-                today = datetime.now().strftime('%Y%m%d')
-                df = pro.daily(
-                    trade_date=today,
-                    fields='ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
-                )
-                
-                if df.empty:
-                    # 尝试前一交易日
-                    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-                    df = pro.daily(
-                        trade_date=yesterday,
-                        fields='ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
-                    )
-                
-                if df.empty:
-                    return JsonResponse({
-                        'code': 404,
-                        'msg': '暂无最新交易数据'
-                    })
-                
-                # 筛选涨幅榜 - 真正的每日涨幅最大股票
-                filtered_df = df[
-                    (df['pct_chg'].notna()) & 
-                    (df['pct_chg'] > 0) &  # 只要上涨的
-                    (df['vol'] > 0) &  # 有成交量
-                    (~df['ts_code'].str.contains('ST', na=False))  # 排除ST股票
-                ].sort_values('pct_chg', ascending=False).head(limit)
-                
-                if filtered_df.empty:
-                    # 如果没有上涨股票，返回涨跌幅最大的
-                    filtered_df = df[
-                        (df['pct_chg'].notna()) & 
-                        (df['vol'] > 0)
-                    ].sort_values('pct_chg', ascending=False).head(limit)
-                
-                # 获取股票名称
-                ts_codes = ','.join(filtered_df['ts_code'].tolist())
-                stock_basic = pro.stock_basic(
-                    ts_code=ts_codes,
-                    fields='ts_code,name,industry'
-                )
-                
-                # 构建返回数据
-                hot_stocks = []
-                for _, row in filtered_df.iterrows():
-                    basic_info = stock_basic[stock_basic['ts_code'] == row['ts_code']]
-                    if not basic_info.empty:
-                        basic = basic_info.iloc[0]
-                        hot_stocks.append({
-                            'ts_code': row['ts_code'],
-                            'name': basic['name'],
-                            'industry': basic['industry'] if basic['industry'] else '未分类',
-                            'close': float(row['close']),
-                            'change': float(row['change']),
-                            'pct_chg': float(row['pct_chg']),
-                            'vol': int(row['vol']),
-                            'amount': float(row['amount']),
-                            'trade_date': datetime.strptime(str(row['trade_date']), '%Y%m%d').strftime('%Y-%m-%d')
-                        })
-                
-                return JsonResponse({
-                    'code': 200,
-                    'msg': '获取成功',
-                    'data': hot_stocks
-                })
-                
-            except Exception as api_error:
-                return JsonResponse({
-                    'code': 500,
-                    'msg': f'获取实时热门股票失败: {str(api_error)}'
-                })
-        
-        # 使用数据库数据获取热门股票
-        try:
-            hot_stocks = StockDataService.get_top_stocks(limit)
-            
-            return JsonResponse({
-                'code': 200,
-                'msg': '获取成功',
-                'data': hot_stocks
-            })
-        except Exception as service_error:
-            return JsonResponse({
-                'code': 500,
-                'msg': f'获取数据库热门股票失败: {str(service_error)}'
-            })
+        return JsonResponse({
+            'code': 200,
+            'msg': '获取成功',
+            'data': hot_stocks
+        })
         
     except Exception as e:
         return JsonResponse({
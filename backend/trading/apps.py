@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TradingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "trading"
+
+    def ready(self):
+        # 注册新闻全文索引的增量维护信号
+        import trading.signals  # noqa: F401
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("trading", "0002_marketnews_source_url_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userposition",
+            name="today_bought_shares",
+            field=models.IntegerField(default=0, verbose_name="今日买入数量"),
+        ),
+        migrations.AddField(
+            model_name="userposition",
+            name="last_buy_date",
+            field=models.DateField(blank=True, null=True, verbose_name="最近买入日期"),
+        ),
+        migrations.AddIndex(
+            model_name="userposition",
+            index=models.Index(
+                fields=["last_buy_date"], name="user_positi_last_bu_71fe19_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.1.1 on 2026-10-19 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("trading", "0003_userposition_today_bought_shares_and_more"),
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userstockaccount",
+            name="realized_profit",
+            field=models.DecimalField(
+                decimal_places=2, default=0.0, max_digits=15, verbose_name="已实现盈亏"
+            ),
+        ),
+        migrations.AddField(
+            model_name="traderecord",
+            name="realized_profit",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                max_digits=15,
+                null=True,
+                verbose_name="已实现盈亏",
+            ),
+        ),
+        migrations.CreateModel(
+            name="AccountDailySnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("trade_date", models.DateField(verbose_name="交易日期")),
+                (
+                    "cash_balance",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=15, verbose_name="现金余额"
+                    ),
+                ),
+                (
+                    "market_value",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=15, verbose_name="持仓市值"
+                    ),
+                ),
+                (
+                    "total_assets",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=15, verbose_name="总资产"
+                    ),
+                ),
+                (
+                    "realized_profit",
+                    models.DecimalField(
+                        decimal_places=2, default=0.0, max_digits=15, verbose_name="已实现盈亏"
+                    ),
+                ),
+                (
+                    "unrealized_profit",
+                    models.DecimalField(
+                        decimal_places=2, default=0.0, max_digits=15, verbose_name="浮动盈亏"
+                    ),
+                ),
+                (
+                    "net_inflow",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0.0,
+                        max_digits=15,
+                        verbose_name="当日资金净流入",
+                    ),
+                ),
+                (
+                    "create_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="user.sysuser",
+                        verbose_name="用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "账户净值快照",
+                "verbose_name_plural": "账户净值快照",
+                "db_table": "account_daily_snapshot",
+                "ordering": ["trade_date"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "trade_date"],
+                        name="account_dai_user_id_a42dfa_idx",
+                    ),
+                    models.Index(
+                        fields=["trade_date"], name="account_dai_trade_d_c78a4d_idx"
+                    ),
+                ],
+                "unique_together": {("user", "trade_date")},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:05
+
+import hashlib
+import re
+
+from django.db import migrations, models
+
+TITLE_NOISE = re.compile(r'[\s\u3000，。、：:；;！!？?“”"\'‘’（）()【】\[\]《》<>\-—_·|]+')
+
+
+def fill_content_hash(apps, schema_editor):
+    MarketNews = apps.get_model("trading", "MarketNews")
+    batch = []
+    for news in MarketNews.objects.only("id", "title").iterator(chunk_size=2000):
+        normalized = TITLE_NOISE.sub("", news.title or "").lower()
+        news.content_hash = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        batch.append(news)
+        if len(batch) >= 2000:
+            MarketNews.objects.bulk_update(batch, ["content_hash"])
+            batch = []
+    if batch:
+        MarketNews.objects.bulk_update(batch, ["content_hash"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("trading", "0004_accountdailysnapshot_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="marketnews",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=40,
+                null=True,
+                verbose_name="去重哈希",
+            ),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
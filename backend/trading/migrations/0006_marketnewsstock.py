@@ -0,0 +1,69 @@
+# Generated by Django 5.1.1 on 2026-10-19 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_news_stock_links(apps, schema_editor):
+    MarketNews = apps.get_model("trading", "MarketNews")
+    MarketNewsStock = apps.get_model("trading", "MarketNewsStock")
+    batch = []
+    news_list = MarketNews.objects.exclude(related_stocks__isnull=True).only("id", "publish_time", "related_stocks")
+    for news in news_list.iterator(chunk_size=2000):
+        if not isinstance(news.related_stocks, list):
+            continue
+        for ts_code in set(news.related_stocks):
+            if isinstance(ts_code, str) and ts_code:
+                batch.append(MarketNewsStock(news_id=news.id, ts_code=ts_code[:12], publish_time=news.publish_time))
+        if len(batch) >= 2000:
+            MarketNewsStock.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        MarketNewsStock.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("trading", "0005_marketnews_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MarketNewsStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ts_code", models.CharField(max_length=12, verbose_name="股票代码")),
+                ("publish_time", models.DateTimeField(verbose_name="新闻发布时间")),
+                (
+                    "news",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_links",
+                        to="trading.marketnews",
+                        verbose_name="新闻",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "新闻相关股票",
+                "verbose_name_plural": "新闻相关股票",
+                "db_table": "market_news_stock",
+                "indexes": [
+                    models.Index(
+                        fields=["ts_code", "-publish_time"],
+                        name="market_news_ts_code_ede9fc_idx",
+                    )
+                ],
+                "unique_together": {("news", "ts_code")},
+            },
+        ),
+        migrations.RunPython(fill_news_stock_links, migrations.RunPython.noop),
+    ]
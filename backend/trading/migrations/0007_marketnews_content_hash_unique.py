@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-20 09:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def collapse_duplicate_news(apps, schema_editor):
+    """同一去重哈希只保留最早入库的新闻，其余新闻的股票关联并入保留的新闻后删除"""
+    MarketNews = apps.get_model("trading", "MarketNews")
+    MarketNewsStock = apps.get_model("trading", "MarketNewsStock")
+    duplicates = (
+        MarketNews.objects.exclude(content_hash__isnull=True)
+        .values("content_hash").annotate(count=Count("id"), keep_id=Min("id")).filter(count__gt=1)
+    )
+    for row in duplicates.iterator():
+        keep = MarketNews.objects.get(id=row["keep_id"])
+        drop_ids = list(
+            MarketNews.objects.filter(content_hash=row["content_hash"]).exclude(id=keep.id).values_list("id", flat=True)
+        )
+        linked = set(MarketNewsStock.objects.filter(news_id=keep.id).values_list("ts_code", flat=True))
+        moved = set(
+            MarketNewsStock.objects.filter(news_id__in=drop_ids).exclude(ts_code__in=linked).values_list("ts_code", flat=True)
+        )
+        MarketNewsStock.objects.bulk_create([
+            MarketNewsStock(news_id=keep.id, ts_code=ts_code, publish_time=keep.publish_time) for ts_code in moved
+        ])
+        if moved:
+            keep.related_stocks = list(dict.fromkeys(list(keep.related_stocks or []) + sorted(moved)))
+            keep.save(update_fields=["related_stocks"])
+        MarketNews.objects.filter(id__in=drop_ids).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("trading", "0006_marketnewsstock"),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_duplicate_news, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="marketnews",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                max_length=40,
+                null=True,
+                unique=True,
+                verbose_name="去重哈希",
+            ),
+        ),
+    ]
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import re
+
 from django.db import models
 from rest_framework import serializers
 from decimal import Decimal
@@ -13,6 +16,7 @@ class UserStockAccount(models.Model):
     frozen_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, verbose_name='冻结资金')
     total_assets = models.DecimalField(max_digits=15, decimal_places=2, default=100000.00, verbose_name='总资产')
     total_profit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, verbose_name='总盈亏')
+    realized_profit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, verbose_name='已实现盈亏')
     create_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     update_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
@@ -25,6 +29,33 @@ class UserStockAccount(models.Model):
         return f"{self.user.username} - 股票账户"
 
 
+class AccountDailySnapshot(models.Model):
+    """账户每日净值快照表（收盘后生成）"""
+    user = models.ForeignKey(SysUser, on_delete=models.CASCADE, verbose_name='用户')
+    trade_date = models.DateField(verbose_name='交易日期')
+    cash_balance = models.DecimalField(max_digits=15, decimal_places=2, verbose_name='现金余额')
+    market_value = models.DecimalField(max_digits=15, decimal_places=2, verbose_name='持仓市值')
+    total_assets = models.DecimalField(max_digits=15, decimal_places=2, verbose_name='总资产')
+    realized_profit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, verbose_name='已实现盈亏')
+    unrealized_profit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, verbose_name='浮动盈亏')
+    net_inflow = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, verbose_name='当日资金净流入')
+    create_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'account_daily_snapshot'
+        verbose_name = '账户净值快照'
+        verbose_name_plural = verbose_name
+        unique_together = ('user', 'trade_date')
+        indexes = [
+            models.Index(fields=['user', 'trade_date']),
+            models.Index(fields=['trade_date']),
+        ]
+        ordering = ['trade_date']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.trade_date}"
+
+
 class UserPosition(models.Model):
     """用户持仓表"""
     user = models.ForeignKey(SysUser, on_delete=models.CASCADE, verbose_name='用户')
@@ -32,6 +63,9 @@ class UserPosition(models.Model):
     stock_name = models.CharField(max_length=20, verbose_name='股票名称')
     position_shares = models.IntegerField(default=0, verbose_name='持仓数量')
     available_shares = models.IntegerField(default=0, verbose_name='可用数量')
+    # T+1：当日买入的股数在收盘结算前不可卖出
+    today_bought_shares = models.IntegerField(default=0, verbose_name='今日买入数量')
+    last_buy_date = models.DateField(null=True, blank=True, verbose_name='最近买入日期')
     cost_price = models.DecimalField(max_digits=10, decimal_places=3, verbose_name='成本价')
     current_price = models.DecimalField(max_digits=10, decimal_places=3, default=0, verbose_name='当前价')
     profit_loss = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name='盈亏金额')
@@ -47,6 +81,7 @@ class UserPosition(models.Model):
         indexes = [
             models.Index(fields=['user', 'ts_code']),
             models.Index(fields=['user']),
+            models.Index(fields=['last_buy_date']),
         ]
 
     def __str__(self):
@@ -77,6 +112,7 @@ class TradeRecord(models.Model):
     trade_time = models.DateTimeField(auto_now_add=True, verbose_name='交易时间')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='COMPLETED', verbose_name='状态')
     remark = models.CharField(max_length=200, null=True, blank=True, verbose_name='备注')
+    realized_profit = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True, verbose_name='已实现盈亏')
 
     class Meta:
         db_table = 'trade_record'
@@ -114,6 +150,15 @@ class UserWatchList(models.Model):
         return f"{self.user.username} - {self.ts_code}"
 
 
+_NEWS_TITLE_NOISE = re.compile(r'[\s\u3000，。、：:；;！!？?“”"\'‘’（）()【】\[\]《》<>\-—_·|]+')
+
+
+def news_content_hash(title):
+    """新闻去重哈希：标题去掉空白和标点、转小写后取SHA1"""
+    normalized = _NEWS_TITLE_NOISE.sub('', title or '').lower()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
 class MarketNews(models.Model):
     """市场新闻表"""
     title = models.CharField(max_length=200, verbose_name='新闻标题')
@@ -127,6 +172,7 @@ class MarketNews(models.Model):
     create_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     created_by = models.ForeignKey(SysUser, on_delete=models.SET_NULL, null=True, verbose_name='创建者')
     is_published = models.BooleanField(default=True, verbose_name='是否发布')
+    content_hash = models.CharField(max_length=40, null=True, blank=True, unique=True, verbose_name='去重哈希')
 
     class Meta:
         db_table = 'market_news'
@@ -142,6 +188,50 @@ class MarketNews(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.content_hash = news_content_hash(self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'title' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'content_hash'}
+        super().save(*args, **kwargs)
+
+
+class MarketNewsStock(models.Model):
+    """新闻-股票关联表（由新闻实体识别生成），按股票查询相关新闻走 (ts_code, publish_time) 索引"""
+    news = models.ForeignKey(MarketNews, on_delete=models.CASCADE, related_name='stock_links', verbose_name='新闻')
+    ts_code = models.CharField(max_length=12, verbose_name='股票代码')
+    publish_time = models.DateTimeField(verbose_name='新闻发布时间')
+
+    class Meta:
+        db_table = 'market_news_stock'
+        verbose_name = '新闻相关股票'
+        verbose_name_plural = verbose_name
+        unique_together = ['news', 'ts_code']
+        indexes = [
+            models.Index(fields=['ts_code', '-publish_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.ts_code} - {self.news_id}"
+
+    @classmethod
+    def replace_links(cls, news):
+        """按新闻的 related_stocks 重建关联（股票代码的规范化与迁移0006回填一致）"""
+        max_length = cls._meta.get_field('ts_code').max_length
+        ts_codes = {
+            code[:max_length] for code in (news.related_stocks if isinstance(news.related_stocks, list) else [])
+            if isinstance(code, str) and code
+        }
+        existing = dict(cls.objects.filter(news=news).values_list('ts_code', 'publish_time'))
+        stale = [code for code, publish_time in existing.items()
+                 if code not in ts_codes or publish_time != news.publish_time]
+        if stale:
+            cls.objects.filter(news=news, ts_code__in=stale).delete()
+        cls.objects.bulk_create([
+            cls(news=news, ts_code=code, publish_time=news.publish_time)
+            for code in ts_codes if code not in existing or code in stale
+        ])
+
 
 class AdminOperationLog(models.Model):
     """管理员操作日志表"""
@@ -193,6 +283,14 @@ class UserStockAccountSerializer(serializers.ModelSerializer):
                  'total_assets', 'total_profit', 'create_time', 'update_time']
 
 
+class AccountDailySnapshotSerializer(serializers.ModelSerializer):
+    trade_date = serializers.DateField(format="%Y-%m-%d", required=False)
+    
+    class Meta:
+        model = AccountDailySnapshot
+        fields = '__all__'
+
+
 class UserPositionSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     create_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", required=False)
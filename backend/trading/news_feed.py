@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+新闻列表缓存
+
+列表页、最新新闻和分类列表按查询条件整页缓存渲染好的结果，命中时直接返回，不访问数据库。
+列表查询只取列表需要的字段，摘要由数据库截取（Substr），不加载新闻正文。
+新闻发布、修改、删除后递增版本号，旧版本缓存自然失效（由 trading.signals 和批量采集调用）。
+"""
+
+import logging
+
+from django.core.cache import cache
+from django.db.models.functions import Length, Substr
+
+logger = logging.getLogger(__name__)
+
+FEED_CACHE_TIMEOUT = 60 * 10
+FEED_VERSION_KEY = 'news:feed:version'
+CONTENT_PREVIEW_LENGTH = 200
+SUMMARY_LENGTH = 100
+MAX_PAGE_SIZE = 100
+
+LIST_FIELDS = ('id', 'title', 'source', 'source_url', 'category', 'related_stocks',
+               'publish_time', 'read_count', 'is_published')
+
+
+def _get_feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, 1, None)
+        version = cache.get(FEED_VERSION_KEY) or 1
+    return version
+
+
+def bump_feed_version():
+    """新闻变更后调用，使全部新闻列表缓存失效"""
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        cache.add(FEED_VERSION_KEY, 1, None)
+        cache.incr(FEED_VERSION_KEY)
+    except Exception as e:
+        logger.warning('news_feed result=version_bump_failed error=%s', e)
+
+
+def _cached(key_parts, loader):
+    """按版本号读取缓存，未命中时调用loader并写回；缓存不可用时直接查库"""
+    key = None
+    try:
+        key = f"news:feed:v{_get_feed_version()}:" + ':'.join(str(part) for part in key_parts)
+        data = cache.get(key)
+        if data is not None:
+            return data
+    except Exception as e:
+        logger.warning('news_feed result=cache_unavailable error=%s', e)
+
+    data = loader()
+    if key:
+        try:
+            cache.set(key, data, FEED_CACHE_TIMEOUT)
+        except Exception:
+            pass
+    return data
+
+
+def _truncate(text, length, full_length):
+    return text[:length] + '...' if full_length > length else text
+
+
+def _list_queryset(category=None, ts_code=None, is_published=None):
+    from trading.models import MarketNews
+
+    queryset = MarketNews.objects.only(*LIST_FIELDS).annotate(
+        content_preview=Substr('content', 1, CONTENT_PREVIEW_LENGTH),
+        content_length=Length('content'),
+    )
+    if category:
+        queryset = queryset.filter(category=category)
+    if is_published is not None:
+        queryset = queryset.filter(is_published=is_published)
+    if ts_code:
+        queryset = queryset.filter(stock_links__ts_code=ts_code)
+    return queryset.order_by('-publish_time', '-id')
+
+
+def render_news_item(news):
+    """渲染列表项（news 需带 content_preview/content_length 注解）"""
+    return {
+        'id': news.id,
+        'title': news.title,
+        'content': _truncate(news.content_preview, CONTENT_PREVIEW_LENGTH, news.content_length),
+        'summary': _truncate(news.content_preview, SUMMARY_LENGTH, news.content_length),
+        'source': news.source,
+        'source_url': news.source_url,
+        'category': news.category,
+        'related_stocks': news.related_stocks if news.related_stocks else [],
+        'publish_time': news.publish_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'read_count': news.read_count,
+        'is_published': news.is_published,
+    }
+
+
+def get_news_page(page=1, page_size=20, category=None, ts_code=None, is_published=None):
+    """
+    按发布时间倒序的新闻列表页
+
+    Returns:
+        dict: {'list': 渲染好的新闻列表, 'total': 总数}
+    """
+    page = max(1, int(page))
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    def load():
+        queryset = _list_queryset(category, ts_code, is_published)
+        total = queryset.count()
+        # 超出最后一页时返回最后一页，与 Paginator.get_page 一致
+        last_page = max(1, (total + page_size - 1) // page_size)
+        start = (min(page, last_page) - 1) * page_size
+        return {
+            'list': [render_news_item(news) for news in queryset[start:start + page_size]],
+            'total': total,
+        }
+
+    return _cached(('list', category or '', ts_code or '', is_published, page, page_size), load)
+
+
+def get_news_items(news_ids):
+    """按给定ID顺序渲染列表项（全文检索结果用，不缓存），同样不加载新闻正文"""
+    news_map = {news.id: news for news in _list_queryset().filter(id__in=news_ids)}
+    return [render_news_item(news_map[news_id]) for news_id in news_ids if news_id in news_map]
+
+
+def get_latest_news(limit=10, category=None, is_published=None):
+    """最新新闻"""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    def load():
+        queryset = _list_queryset(category, is_published=is_published)[:limit]
+        return [render_news_item(news) for news in queryset]
+
+    return _cached(('latest', category or '', is_published, limit), load)
+
+
+def get_news_categories():
+    """新闻分类列表"""
+    def load():
+        from trading.models import MarketNews
+
+        categories = MarketNews.objects.exclude(category__isnull=True).exclude(category='').order_by(
+            'category'
+        ).values_list('category', flat=True).distinct()
+        return list(categories)
+
+    return _cached(('categories',), load)
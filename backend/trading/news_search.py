@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+市场新闻全文检索 - 本地倒排索引 + BM25排序
+
+- 分词：jieba 搜索引擎模式，标题词频按 TITLE_WEIGHT 加权
+- 增量维护：MarketNews 保存/删除时通过信号更新本进程索引，并把新闻ID写入Redis变更集合，
+  其他进程按 SYNC_INTERVAL 拉取变更集合增量重建对应文档
+- 持久化：索引定期落盘（pickle），启动时加载后只需与数据库对账（新增/删除的ID），无需全量重建
+"""
+
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from math import log
+
+import jieba
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+jieba.setLogLevel(logging.WARNING)
+
+INDEX_PATH = getattr(settings, 'NEWS_SEARCH_INDEX_PATH', os.path.join(settings.BASE_DIR, 'data', 'news_search_index.pkl'))
+INDEX_FORMAT_VERSION = 1
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+TITLE_WEIGHT = 3  # 标题中的词按3倍词频计入
+
+SYNC_INTERVAL = 10  # 拉取其他进程变更的间隔（秒）
+RECONCILE_INTERVAL = 60 * 10  # 与数据库对账的间隔（秒），Redis不可用时兜底
+SAVE_AFTER_CHANGES = 200  # 累计变更多少条后落盘
+CHANGES_RETENTION = 60 * 60 * 24  # 变更集合保留时长（秒）
+
+CHANGES_KEY = f"{settings.CACHES['default'].get('KEY_PREFIX', '')}:news:search_index:changes"
+
+_TOKEN_PATTERN = re.compile(r'[0-9a-z\u4e00-\u9fff]')
+STOP_WORDS = frozenset([
+    '的', '了', '和', '是', '在', '与', '及', '或', '等', '对', '将', '为', '也', '而', '但',
+    '就', '都', '这', '那', '有', '被', '从', '到', '于', '以', '之', '其', '中', '上', '下',
+])
+
+
+def tokenize(text):
+    """分词：小写化后切词，去掉标点、空白和停用词"""
+    if not text:
+        return []
+    return [
+        token for token in jieba.cut_for_search(text.lower())
+        if _TOKEN_PATTERN.search(token) and token not in STOP_WORDS
+    ]
+
+
+def _signature(title, content, category, related_stocks, is_published):
+    """文档签名，内容未变（如仅阅读次数变化）时跳过重建"""
+    raw = '\x1f'.join([
+        title or '', content or '', category or '',
+        ','.join(related_stocks or []), '1' if is_published else '0',
+    ])
+    return zlib.crc32(raw.encode('utf-8'))
+
+
+class NewsSearchIndex(object):
+    """新闻倒排索引"""
+
+    FIELDS = ('id', 'title', 'content', 'category', 'related_stocks', 'publish_time', 'is_published')
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._ready = False
+        self._reset()
+        self._synced_at = 0.0
+        self._reconciled_at = 0.0
+        self._dirty = 0
+
+    def _reset(self):
+        # 倒排表：词 -> {新闻ID: 词频}
+        self.postings = defaultdict(dict)
+        # 文档表：新闻ID -> (文档长度, 分类, 相关股票, 发布时间戳, 是否发布, 签名, 词列表)
+        self.docs = {}
+        # 相关股票 -> {新闻ID}
+        self.stock_docs = defaultdict(set)
+        self.total_length = 0
+
+    # ---------- 文档维护 ----------
+
+    def _add_doc(self, row):
+        doc_id = row['id']
+        signature = _signature(row['title'], row['content'], row['category'],
+                               row['related_stocks'], row['is_published'])
+        current = self.docs.get(doc_id)
+        if current is not None:
+            if current[5] == signature:
+                return False
+            self._remove_doc(doc_id)
+
+        term_freq = Counter(tokenize(row['content']))
+        for token in tokenize(row['title']):
+            term_freq[token] += TITLE_WEIGHT
+        for token, freq in term_freq.items():
+            self.postings[token][doc_id] = freq
+
+        length = sum(term_freq.values())
+        publish_time = row['publish_time']
+        self.docs[doc_id] = (
+            length,
+            row['category'],
+            tuple(row['related_stocks'] or ()),
+            publish_time.timestamp() if publish_time else 0.0,
+            bool(row['is_published']),
+            signature,
+            tuple(term_freq),
+        )
+        for ts_code in self.docs[doc_id][2]:
+            self.stock_docs[ts_code].add(doc_id)
+        self.total_length += length
+        return True
+
+    def _remove_doc(self, doc_id):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        for token in doc[6]:
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[token]
+        for ts_code in doc[2]:
+            stock_posting = self.stock_docs.get(ts_code)
+            if stock_posting is not None:
+                stock_posting.discard(doc_id)
+                if not stock_posting:
+                    del self.stock_docs[ts_code]
+        self.total_length -= doc[0]
+        return True
+
+    def _load_rows(self, ids=None):
+        from trading.models import MarketNews
+
+        queryset = MarketNews.objects.order_by()
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        return queryset.values(*self.FIELDS).iterator(chunk_size=2000)
+
+    def build(self):
+        """全量重建索引并落盘"""
+        start_time = time.perf_counter()
+        with self._lock:
+            self._reset()
+            for row in self._load_rows():
+                self._add_doc(row)
+            self._ready = True
+            self._reconciled_at = self._synced_at = time.time()
+        logger.info('news_search_index result=built docs=%s terms=%s duration=%.3f',
+                    len(self.docs), len(self.postings), time.perf_counter() - start_time)
+        self.save()
+
+    def reindex(self, ids):
+        """按ID重建文档：数据库中已不存在的从索引删除"""
+        ids = set(ids)
+        if not ids:
+            return 0
+        changed = 0
+        with self._lock:
+            found = set()
+            for row in self._load_rows(ids=ids):
+                found.add(row['id'])
+                changed += self._add_doc(row)
+            for doc_id in ids - found:
+                changed += self._remove_doc(doc_id)
+            self._dirty += changed
+        return changed
+
+    def reconcile(self):
+        """与数据库对账：补录索引缺失的新闻，删除数据库中已不存在的新闻"""
+        from trading.models import MarketNews
+
+        db_ids = set(MarketNews.objects.values_list('id', flat=True))
+        with self._lock:
+            index_ids = set(self.docs)
+            missing = db_ids - index_ids
+            removed = index_ids - db_ids
+            for doc_id in removed:
+                self._remove_doc(doc_id)
+            self._dirty += len(removed)
+            self._reconciled_at = time.time()
+        if missing:
+            self.reindex(missing)
+        if missing or removed:
+            logger.info('news_search_index result=reconciled added=%s removed=%s', len(missing), len(removed))
+
+    # ---------- 持久化 ----------
+
+    def save(self):
+        """原子落盘：先写临时文件再替换"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with self._lock:
+                data = {
+                    'version': INDEX_FORMAT_VERSION,
+                    'postings': dict(self.postings),
+                    'docs': self.docs,
+                    'stock_docs': dict(self.stock_docs),
+                    'total_length': self.total_length,
+                }
+                blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+                self._dirty = 0
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning('news_search_index result=save_failed path=%s error=%s', self.path, e)
+
+    def load(self):
+        """从磁盘加载索引，成功返回True"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('version') != INDEX_FORMAT_VERSION:
+                return False
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning('news_search_index result=load_failed path=%s error=%s', self.path, e)
+            return False
+
+        with self._lock:
+            self.postings = defaultdict(dict, data['postings'])
+            self.docs = data['docs']
+            self.stock_docs = defaultdict(set, data['stock_docs'])
+            self.total_length = data['total_length']
+            # 回放变更集合中保留的全部变更（内容未变的文档按签名跳过）
+            self._synced_at = 0.0
+        return True
+
+    # ---------- 跨进程同步 ----------
+
+    def ensure_ready(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    if self.load():
+                        self._sync_changes(time.time())
+                        self.reconcile()
+                        self._ready = True
+                    else:
+                        self.build()
+            return
+
+        now = time.time()
+        if now - self._synced_at >= SYNC_INTERVAL:
+            self._sync_changes(now)
+        if now - self._reconciled_at >= RECONCILE_INTERVAL:
+            self.reconcile()
+        if self._dirty >= SAVE_AFTER_CHANGES:
+            self.save()
+
+    def _sync_changes(self, now):
+        since = self._synced_at
+        self._synced_at = now
+        try:
+            from django_redis import get_redis_connection
+
+            redis_conn = get_redis_connection('default')
+            # 多取1秒，避免与写入进程的时钟边界遗漏
+            ids = redis_conn.zrangebyscore(CHANGES_KEY, max(since - 1, 0), '+inf')
+        except Exception as e:
+            logger.warning('news_search_index result=sync_failed error=%s', e)
+            return
+        if ids:
+            self.reindex(int(doc_id) for doc_id in ids)
+
+    @staticmethod
+    def publish_changes(ids):
+        """记录变更的新闻ID，供其他进程增量同步"""
+        ids = list(ids)
+        if not ids:
+            return
+        try:
+            from django_redis import get_redis_connection
+
+            now = time.time()
+            pipe = get_redis_connection('default').pipeline()
+            pipe.zadd(CHANGES_KEY, {str(doc_id): now for doc_id in ids})
+            pipe.zremrangebyscore(CHANGES_KEY, '-inf', now - CHANGES_RETENTION)
+            pipe.execute()
+        except Exception as e:
+            logger.warning('news_search_index result=publish_failed error=%s', e)
+
+    def on_saved(self, instance):
+        """MarketNews保存后调用"""
+        if not self._ready:
+            # 本进程尚未加载索引，只通知其他进程
+            self.publish_changes([instance.id])
+            return
+        row = {field: getattr(instance, field) for field in self.FIELDS}
+        with self._lock:
+            changed = self._add_doc(row)
+            self._dirty += changed
+        if changed:
+            self.publish_changes([instance.id])
+
+    def on_bulk_created(self, ids):
+        """bulk_create不触发信号，批量入库提交后调用"""
+        ids = list(ids)
+        if self._ready:
+            self.reindex(ids)
+        self.publish_changes(ids)
+
+    def on_deleted(self, doc_id):
+        """MarketNews删除后调用"""
+        if self._ready:
+            with self._lock:
+                self._dirty += self._remove_doc(doc_id)
+        self.publish_changes([doc_id])
+
+    # ---------- 查询 ----------
+
+    def search(self, query, category=None, ts_code=None, is_published=None, offset=0, limit=20):
+        """
+        BM25检索
+
+        Args:
+            query: 查询语句
+            category: 按分类过滤
+            ts_code: 按相关股票过滤
+            is_published: 按发布状态过滤，None为不过滤
+
+        Returns:
+            dict: {'ids': 当前页新闻ID（按相关度排序）, 'total': 命中总数, 'scores': {ID: 得分}}
+        """
+        self.ensure_ready()
+        terms = set(tokenize(query))
+        if not terms:
+            return {'ids': [], 'total': 0, 'scores': {}}
+
+        with self._lock:
+            docs = self.docs
+            doc_count = len(docs) or 1
+            avg_length = self.total_length / doc_count or 1.0
+            scores = defaultdict(float)
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, freq in posting.items():
+                    length = docs[doc_id][0]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[doc_id] += idf * freq * (BM25_K1 + 1) / (freq + norm)
+
+            hits = []
+            for doc_id, score in scores.items():
+                doc = docs[doc_id]
+                if category and doc[1] != category:
+                    continue
+                if ts_code and ts_code not in doc[2]:
+                    continue
+                if is_published is not None and doc[4] != is_published:
+                    continue
+                hits.append((-score, -doc[3], doc_id))
+
+        hits.sort()
+        page = hits[offset:offset + limit]
+        return {
+            'ids': [doc_id for _, _, doc_id in page],
+            'total': len(hits),
+            'scores': {doc_id: round(-score, 4) for score, _, doc_id in page},
+        }
+
+
+news_search_index = NewsSearchIndex()
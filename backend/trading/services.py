@@ -1,18 +1,25 @@
 # -*- coding: utf-8 -*-
 
-from datetime import datetime, date
+import json
+import time
+import numpy as np
+from datetime import datetime, date, timedelta, time as dt_time
 from decimal import Decimal
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, F
 from django.utils import timezone
+from django_redis import get_redis_connection
 from typing import Dict, List, Optional, Tuple
 
 from trading.models import (
     UserStockAccount, UserPosition, TradeRecord, UserWatchList, 
-    MarketNews, AdminOperationLog
+    MarketNews, AdminOperationLog, AccountDailySnapshot
 )
-from stock.models import StockBasic, StockDaily
+from stock.models import StockBasic, StockDaily, TradeCal
+from trading.news_search import news_search_index
 from user.models import SysUser
+from utils.pagination import keyset_paginate
 
 
 class TradingService:
@@ -97,6 +104,7 @@ class TradingService:
                 'stock_name': position.stock_name,
                 'position_shares': position.position_shares,
                 'available_shares': position.available_shares,
+                'today_bought_shares': position.today_bought_shares,
                 'cost_price': float(position.cost_price),
                 'current_price': current_price,
                 'market_value': float(market_value),
@@ -108,6 +116,20 @@ class TradingService:
 
         return result
     
+    @staticmethod
+    def add_today_bought(position: UserPosition, shares: int) -> None:
+        """记录当日买入股数（T+1，不增加可用数量，由调用方保存）"""
+        today = timezone.localdate()
+        
+        # 上一交易日的买入尚未结算时先行转入可用，避免跨日累加
+        if position.today_bought_shares and position.last_buy_date and position.last_buy_date < today:
+            position.available_shares += position.today_bought_shares
+            position.today_bought_shares = 0
+        
+        position.position_shares += shares
+        position.today_bought_shares += shares
+        position.last_buy_date = today
+    
     @staticmethod
     def update_user_assets(user: SysUser) -> bool:
         """更新用户总资产"""
@@ -153,8 +175,9 @@ class TradingService:
             if account.account_balance < total_cost:
                 return False, "资金不足"
             
-            # 更新账户余额
+            # 更新账户余额，买入手续费计入已实现盈亏
             account.account_balance -= total_cost
+            account.realized_profit -= commission
             account.save()
             
             # 更新或创建持仓
@@ -163,8 +186,8 @@ class TradingService:
                 ts_code=ts_code,
                 defaults={
                     'stock_name': stock.name,
-                    'position_shares': shares,
-                    'available_shares': shares,
+                    'position_shares': 0,
+                    'available_shares': 0,
                     'cost_price': price,
                     'current_price': price
                 }
@@ -174,12 +197,11 @@ class TradingService:
                 # 计算新的成本价
                 total_shares = position.position_shares + shares
                 total_cost_old = position.position_shares * position.cost_price
-                new_cost_price = (total_cost_old + trade_amount) / total_shares
-                
-                position.position_shares = total_shares
-                position.available_shares += shares
-                position.cost_price = new_cost_price
-                position.save()
+                position.cost_price = (total_cost_old + trade_amount) / total_shares
+            
+            # T+1：买入股数计入今日买入，收盘结算后才转为可用
+            TradingService.add_today_bought(position, shares)
+            position.save()
             
             # 记录交易
             TradeRecord.objects.create(
@@ -234,8 +256,12 @@ class TradingService:
             commission = Decimal('5.00')  # 手续费
             net_amount = trade_amount - commission
             
+            # 已实现盈亏 = (成交价 - 持仓成本) * 股数 - 手续费
+            realized_profit = ((price_decimal - position.cost_price) * shares - commission).quantize(Decimal('0.01'))
+            
             # 更新账户余额
             account.account_balance += net_amount
+            account.realized_profit += realized_profit
             account.save()
             
             # 更新持仓
@@ -257,6 +283,7 @@ class TradingService:
                 trade_shares=shares,
                 trade_amount=trade_amount,
                 commission=commission,
+                realized_profit=realized_profit,
                 status='COMPLETED',
                 trade_time=timezone.now()
             )
@@ -304,7 +331,12 @@ class AdminService:
         end = start + page_size
         user_list = users[start:end]
         
-        # 获取每个用户的股票账户信息
+        # 当前页用户的股票账户信息一次查询
+        accounts = {
+            account.user_id: account
+            for account in UserStockAccount.objects.filter(user_id__in=[user.id for user in user_list])
+        }
+        
         result = []
         for user in user_list:
             user_data = {
@@ -318,13 +350,10 @@ class AdminService:
                 'total_assets': 0
             }
             
-            # 获取股票账户信息
-            try:
-                account = UserStockAccount.objects.get(user=user)
+            account = accounts.get(user.id)
+            if account:
                 user_data['account_balance'] = account.account_balance
                 user_data['total_assets'] = account.total_assets
-            except UserStockAccount.DoesNotExist:
-                pass
                 
             result.append(user_data)
         
@@ -337,9 +366,14 @@ class AdminService:
     
     @staticmethod
     def get_trading_records(page: int = 1, page_size: int = 20, 
-                           user_id: int = None, ts_code: str = None) -> Dict:
-        """获取交易记录"""
-        trades = TradeRecord.objects.all().order_by('-trade_time')
+                           user_id: int = None, ts_code: str = None,
+                           cursor: str = None, with_total: bool = False) -> Dict:
+        """
+        获取交易记录
+        
+        传入cursor（首页传空字符串）时使用 (trade_time, id) 游标分页，否则按页码分页
+        """
+        trades = TradeRecord.objects.select_related('user')
         
         # 筛选条件
         if user_id:
@@ -347,10 +381,23 @@ class AdminService:
         if ts_code:
             trades = trades.filter(ts_code=ts_code)
         
-        total = trades.count()
-        start = (page - 1) * page_size
-        end = start + page_size
-        trade_list = trades[start:end]
+        next_cursor = None
+        has_more = False
+        total_is_estimate = False
+        if cursor is not None:
+            page_data = keyset_paginate(trades, cursor, page_size, 'trade_time', with_total)
+            trade_list = page_data['items']
+            total = page_data['total']
+            total_is_estimate = page_data['total_is_estimate']
+            next_cursor = page_data['next_cursor']
+            has_more = page_data['has_more']
+        else:
+            trades = trades.order_by('-trade_time', '-id')
+            total = trades.count()
+            start = (page - 1) * page_size
+            end = start + page_size
+            trade_list = trades[start:end]
+            has_more = end < total
         
         # 构建返回数据
         result = []
@@ -373,15 +420,44 @@ class AdminService:
         
         return {
             'total': total,
+            'total_is_estimate': total_is_estimate,
             'trades': result,
             'page': page,
-            'page_size': page_size
+            'page_size': page_size,
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }
     
     @staticmethod
     def get_news_list(page: int = 1, page_size: int = 20, 
-                     category: str = None, is_published: bool = None) -> Dict:
-        """获取新闻列表"""
+                     category: str = None, is_published: bool = None,
+                     keyword: str = None, ts_code: str = None) -> Dict:
+        """
+        获取新闻列表
+        
+        有关键词时走全文索引按BM25相关度排序，否则按发布时间倒序
+        """
+        start = (page - 1) * page_size
+        end = start + page_size
+        
+        if keyword:
+            hits = news_search_index.search(
+                keyword, category=category, ts_code=ts_code, is_published=is_published,
+                offset=start, limit=page_size
+            )
+            news_map = {news['id']: news for news in MarketNews.objects.filter(id__in=hits['ids']).values()}
+            news_list = []
+            for news_id in hits['ids']:
+                if news_id in news_map:
+                    news_map[news_id]['score'] = hits['scores'][news_id]
+                    news_list.append(news_map[news_id])
+            return {
+                'total': hits['total'],
+                'news': news_list,
+                'page': page,
+                'page_size': page_size
+            }
+        
         news = MarketNews.objects.all().order_by('-publish_time')
         
         # 筛选条件
@@ -389,10 +465,10 @@ class AdminService:
             news = news.filter(category=category)
         if is_published is not None:
             news = news.filter(is_published=is_published)
+        if ts_code:
+            news = news.filter(stock_links__ts_code=ts_code)
         
         total = news.count()
-        start = (page - 1) * page_size
-        end = start + page_size
         news_list = news[start:end]
         
         return {
@@ -489,9 +565,14 @@ class AdminService:
     
     @staticmethod
     def get_operation_logs(page: int = 1, page_size: int = 20, 
-                          admin_user_id: int = None, operation_type: str = None) -> Dict:
-        """获取操作日志"""
-        logs = AdminOperationLog.objects.all().order_by('-operation_time')
+                          admin_user_id: int = None, operation_type: str = None,
+                          cursor: str = None, with_total: bool = False) -> Dict:
+        """
+        获取操作日志
+        
+        传入cursor（首页传空字符串）时使用 (operation_time, id) 游标分页，否则按页码分页
+        """
+        logs = AdminOperationLog.objects.select_related('admin_user')
         
         # 筛选条件
         if admin_user_id:
@@ -499,10 +580,23 @@ class AdminService:
         if operation_type:
             logs = logs.filter(operation_type=operation_type)
         
-        total = logs.count()
-        start = (page - 1) * page_size
-        end = start + page_size
-        log_list = logs[start:end]
+        next_cursor = None
+        has_more = False
+        total_is_estimate = False
+        if cursor is not None:
+            page_data = keyset_paginate(logs, cursor, page_size, 'operation_time', with_total)
+            log_list = page_data['items']
+            total = page_data['total']
+            total_is_estimate = page_data['total_is_estimate']
+            next_cursor = page_data['next_cursor']
+            has_more = page_data['has_more']
+        else:
+            logs = logs.order_by('-operation_time', '-id')
+            total = logs.count()
+            start = (page - 1) * page_size
+            end = start + page_size
+            log_list = logs[start:end]
+            has_more = end < total
         
         # 构建返回数据
         result = []
@@ -523,9 +617,12 @@ class AdminService:
         
         return {
             'total': total,
+            'total_is_estimate': total_is_estimate,
             'logs': result,
             'page': page,
-            'page_size': page_size
+            'page_size': page_size,
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }
     
     @staticmethod
@@ -730,4 +827,420 @@ class WatchListService:
                     'low': 0,
                 })
 
-        return result
\ No newline at end of file
+        return result
+
+class SettlementService:
+    """收盘结算服务 - T+1可用股数滚动"""
+    
+    SETTLE_EXCHANGE = 'SSE'
+    MARKET_CLOSE_TIME = dt_time(15, 0)
+    
+    @staticmethod
+    def is_trade_day(trade_date: date) -> bool:
+        """根据交易日历判断是否为交易日，日历未同步时按工作日判断"""
+        is_open = TradeCal.objects.filter(
+            exchange=SettlementService.SETTLE_EXCHANGE,
+            cal_date=trade_date
+        ).values_list('is_open', flat=True).first()
+        
+        if is_open is None:
+            return trade_date.weekday() < 5
+        return bool(is_open)
+    
+    @staticmethod
+    def settle_t1(trade_date: Optional[date] = None, force: bool = False) -> Dict:
+        """
+        T+1结算：将截至结算日的今日买入股数转入可用数量
+        
+        单条UPDATE完成全部持仓的滚动，重复执行不会重复转入（已结算持仓的今日买入为0）
+        """
+        now = timezone.localtime()
+        trade_date = trade_date or now.date()
+        
+        if not force:
+            if not SettlementService.is_trade_day(trade_date):
+                return {
+                    'success': True,
+                    'message': f'{trade_date} 非交易日，跳过结算',
+                    'data': {'trade_date': str(trade_date), 'rows': 0, 'duration': 0}
+                }
+            
+            if trade_date > now.date() or (trade_date == now.date() and now.time() < SettlementService.MARKET_CLOSE_TIME):
+                return {
+                    'success': False,
+                    'message': f'{trade_date} 尚未收盘，不能结算',
+                    'data': {'trade_date': str(trade_date), 'rows': 0, 'duration': 0}
+                }
+        
+        start_time = time.perf_counter()
+        try:
+            with transaction.atomic():
+                rows = UserPosition.objects.filter(
+                    last_buy_date__lte=trade_date,
+                    today_bought_shares__gt=0
+                ).update(
+                    available_shares=F('available_shares') + F('today_bought_shares'),
+                    today_bought_shares=0,
+                    update_time=timezone.now()
+                )
+            duration = round(time.perf_counter() - start_time, 3)
+            
+            return {
+                'success': True,
+                'message': f'{trade_date} 结算完成，更新 {rows} 条持仓，耗时 {duration} 秒',
+                'data': {'trade_date': str(trade_date), 'rows': rows, 'duration': duration}
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'结算失败: {str(e)}',
+                'data': {'trade_date': str(trade_date), 'rows': 0,
+                         'duration': round(time.perf_counter() - start_time, 3)}
+            }
+
+
+class AccountAnalyticsService:
+    """账户绩效分析服务 - 每日净值快照与收益/回撤/夏普指标"""
+    
+    TRADING_DAYS_PER_YEAR = 252
+    
+    @staticmethod
+    def take_daily_snapshots(trade_date: Optional[date] = None, force: bool = False) -> Dict:
+        """
+        收盘后为全部账户生成当日净值快照
+        
+        持仓按当日收盘价估值（无收盘价时沿用持仓当前价），同一交易日重复执行会覆盖当日快照
+        """
+        trade_date = trade_date or timezone.localdate()
+        if not force and not SettlementService.is_trade_day(trade_date):
+            return {
+                'success': True,
+                'message': f'{trade_date} 非交易日，跳过净值快照',
+                'data': {'trade_date': str(trade_date), 'rows': 0, 'duration': 0}
+            }
+        
+        start_time = time.perf_counter()
+        try:
+            closes = dict(
+                StockDaily.objects.filter(trade_date=trade_date).values_list('ts_code', 'close')
+            )
+            
+            # 按用户汇总持仓市值和浮动盈亏，同时刷新持仓的当前价
+            market_values = {}
+            unrealized = {}
+            position_updates = []
+            positions = UserPosition.objects.filter(position_shares__gt=0).values_list(
+                'id', 'user_id', 'ts_code', 'position_shares', 'cost_price', 'current_price'
+            )
+            for pos_id, user_id, ts_code, shares, cost_price, current_price in positions:
+                price = closes.get(ts_code) or current_price
+                cost = shares * cost_price
+                profit_loss = shares * price - cost
+                market_values[user_id] = market_values.get(user_id, Decimal('0')) + shares * price
+                unrealized[user_id] = unrealized.get(user_id, Decimal('0')) + profit_loss
+                
+                if ts_code in closes:
+                    position_updates.append(UserPosition(
+                        id=pos_id,
+                        current_price=price,
+                        profit_loss=profit_loss.quantize(Decimal('0.01')),
+                        profit_loss_ratio=(profit_loss / cost * 100).quantize(Decimal('0.001')) if cost > 0 else 0
+                    ))
+            
+            # 当日资金净流入（管理员资产调整），用于计算时间加权收益
+            inflows = dict(
+                TradeRecord.objects.filter(
+                    trade_type='ADJUST', status='COMPLETED', trade_time__date=trade_date
+                ).values('user_id').annotate(total=Sum('trade_amount')).values_list('user_id', 'total')
+            )
+            
+            snapshots = []
+            account_updates = []
+            accounts = UserStockAccount.objects.values_list(
+                'id', 'user_id', 'account_balance', 'frozen_balance', 'realized_profit'
+            )
+            for account_id, user_id, balance, frozen, realized in accounts:
+                market_value = market_values.get(user_id, Decimal('0')).quantize(Decimal('0.01'))
+                unrealized_profit = unrealized.get(user_id, Decimal('0')).quantize(Decimal('0.01'))
+                total_assets = balance + frozen + market_value
+                
+                snapshots.append(AccountDailySnapshot(
+                    user_id=user_id,
+                    trade_date=trade_date,
+                    cash_balance=balance + frozen,
+                    market_value=market_value,
+                    total_assets=total_assets,
+                    realized_profit=realized,
+                    unrealized_profit=unrealized_profit,
+                    net_inflow=inflows.get(user_id) or Decimal('0')
+                ))
+                account_updates.append(UserStockAccount(
+                    id=account_id,
+                    total_assets=total_assets,
+                    total_profit=realized + unrealized_profit
+                ))
+            
+            with transaction.atomic():
+                UserPosition.objects.bulk_update(
+                    position_updates, ['current_price', 'profit_loss', 'profit_loss_ratio'], batch_size=1000
+                )
+                UserStockAccount.objects.bulk_update(
+                    account_updates, ['total_assets', 'total_profit'], batch_size=1000
+                )
+                AccountDailySnapshot.objects.bulk_create(
+                    snapshots,
+                    batch_size=1000,
+                    update_conflicts=True,
+                    unique_fields=['user', 'trade_date'],
+                    update_fields=['cash_balance', 'market_value', 'total_assets',
+                                   'realized_profit', 'unrealized_profit', 'net_inflow']
+                )
+            duration = round(time.perf_counter() - start_time, 3)
+            
+            return {
+                'success': True,
+                'message': f'{trade_date} 净值快照完成，共 {len(snapshots)} 个账户，耗时 {duration} 秒',
+                'data': {'trade_date': str(trade_date), 'rows': len(snapshots), 'duration': duration}
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'生成净值快照失败: {str(e)}',
+                'data': {'trade_date': str(trade_date), 'rows': 0,
+                         'duration': round(time.perf_counter() - start_time, 3)}
+            }
+    
+    @staticmethod
+    def get_performance(user: SysUser, days: Optional[int] = None, risk_free_rate: float = 0.0) -> Dict:
+        """
+        获取账户绩效时间序列
+        
+        基于净值快照数组向量化计算日收益率（剔除资金净流入）、累计收益、回撤和夏普比率
+        """
+        snapshots = AccountDailySnapshot.objects.filter(user=user)
+        if days:
+            snapshots = snapshots.filter(trade_date__gte=timezone.localdate() - timedelta(days=days))
+        rows = list(snapshots.order_by('trade_date').values_list(
+            'trade_date', 'total_assets', 'net_inflow', 'realized_profit', 'unrealized_profit'
+        ))
+        
+        trade_stats = TradeRecord.objects.filter(
+            user=user, trade_type='SELL', status='COMPLETED', realized_profit__isnull=False
+        ).aggregate(
+            sell_count=Count('id'),
+            win_count=Count('id', filter=Q(realized_profit__gt=0))
+        )
+        sell_count = trade_stats['sell_count'] or 0
+        win_rate = (trade_stats['win_count'] or 0) / sell_count * 100 if sell_count else 0
+        
+        account = TradingService.get_user_account(user)
+        summary = {
+            'realized_profit': float(account.realized_profit) if account else 0,
+            'total_profit': float(account.total_profit) if account else 0,
+            'sell_count': sell_count,
+            'win_rate': round(win_rate, 2),
+            'total_return': 0,
+            'annual_return': 0,
+            'max_drawdown': 0,
+            'volatility': 0,
+            'sharpe_ratio': 0,
+        }
+        
+        if not rows:
+            return {'summary': summary, 'dates': [], 'equity': [], 'daily_returns': [],
+                    'cumulative_returns': [], 'drawdowns': [], 'realized_profit': [], 'unrealized_profit': []}
+        
+        equity = np.array([float(row[1]) for row in rows])
+        inflow = np.array([float(row[2]) for row in rows])
+        
+        # 日收益率：(当日总资产 - 当日净流入) / 上日总资产 - 1，首日为0
+        returns = np.zeros(len(equity))
+        if len(equity) > 1:
+            prev_equity = equity[:-1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns[1:] = np.where(prev_equity > 0, (equity[1:] - inflow[1:]) / prev_equity - 1, 0.0)
+        
+        nav = np.cumprod(1 + returns)
+        drawdowns = nav / np.maximum.accumulate(nav) - 1
+        
+        period = len(returns) - 1
+        if period > 0:
+            year_factor = AccountAnalyticsService.TRADING_DAYS_PER_YEAR
+            excess = returns[1:] - risk_free_rate / year_factor
+            std = excess.std(ddof=1) if period > 1 else 0.0
+            summary.update({
+                'total_return': round(float(nav[-1] - 1) * 100, 4),
+                'annual_return': round(float(nav[-1] ** (year_factor / period) - 1) * 100, 4),
+                'max_drawdown': round(float(drawdowns.min()) * 100, 4),
+                'volatility': round(float(returns[1:].std(ddof=1) * np.sqrt(year_factor)) * 100, 4) if period > 1 else 0,
+                'sharpe_ratio': round(float(excess.mean() / std * np.sqrt(year_factor)), 4) if std > 0 else 0,
+            })
+        
+        return {
+            'summary': summary,
+            'dates': [row[0].strftime('%Y-%m-%d') for row in rows],
+            'equity': np.round(equity, 2).tolist(),
+            'daily_returns': np.round(returns * 100, 4).tolist(),
+            'cumulative_returns': np.round((nav - 1) * 100, 4).tolist(),
+            'drawdowns': np.round(drawdowns * 100, 4).tolist(),
+            'realized_profit': [float(row[3]) for row in rows],
+            'unrealized_profit': [float(row[4]) for row in rows],
+        }
+
+
+class LeaderboardService:
+    """收益排行榜服务 - 批量估值后将排名写入Redis有序集合"""
+    
+    KEY_PREFIX = f"{settings.CACHES['default'].get('KEY_PREFIX', '')}:trading:leaderboard"
+    RANK_KEY = f'{KEY_PREFIX}:rank'
+    DETAIL_KEY = f'{KEY_PREFIX}:detail'
+    META_KEY = f'{KEY_PREFIX}:meta'
+    
+    @staticmethod
+    def refresh(use_realtime: Optional[bool] = None) -> Dict:
+        """
+        重新计算全部账户的收益率排名
+        
+        交易时间内按腾讯批量实时价估值，收盘后按持仓当前价（收盘快照已刷新为收盘价）估值；
+        收益率 = (总资产 - 投入本金) / 投入本金，投入本金 = 初始资金 + 管理员资产调整
+        """
+        from stock.services import RealTimeDataService
+        
+        if use_realtime is None:
+            use_realtime = RealTimeDataService.is_trading_time()
+        
+        start_time = time.perf_counter()
+        try:
+            positions = list(UserPosition.objects.filter(position_shares__gt=0).values_list(
+                'user_id', 'ts_code', 'position_shares', 'current_price'
+            ))
+            
+            price_map = {}
+            if use_realtime and positions:
+                price_map = RealTimeDataService.get_batch_price_map([pos[1] for pos in positions])
+            
+            # 按用户批量汇总持仓市值
+            market_values = {}
+            if positions:
+                user_ids = np.array([pos[0] for pos in positions])
+                shares = np.array([pos[2] for pos in positions], dtype=float)
+                prices = np.array([price_map.get(pos[1], float(pos[3])) for pos in positions])
+                unique_users, inverse = np.unique(user_ids, return_inverse=True)
+                totals = np.bincount(inverse, weights=shares * prices)
+                market_values = dict(zip(unique_users.tolist(), totals.tolist()))
+            
+            adjustments = dict(
+                TradeRecord.objects.filter(trade_type='ADJUST', status='COMPLETED')
+                .values('user_id').annotate(total=Sum('trade_amount')).values_list('user_id', 'total')
+            )
+            
+            initial_balance = float(settings.DEFAULT_INITIAL_BALANCE)
+            scores = {}
+            details = {}
+            accounts = UserStockAccount.objects.values_list(
+                'user_id', 'user__username', 'account_balance', 'frozen_balance'
+            )
+            for user_id, username, balance, frozen in accounts:
+                principal = initial_balance + float(adjustments.get(user_id) or 0)
+                total_assets = float(balance + frozen) + market_values.get(user_id, 0.0)
+                return_rate = (total_assets - principal) / principal * 100 if principal > 0 else 0.0
+                
+                scores[user_id] = round(return_rate, 4)
+                details[user_id] = json.dumps({
+                    'username': username,
+                    'total_assets': round(total_assets, 2),
+                    'profit': round(total_assets - principal, 2),
+                }, ensure_ascii=False)
+            
+            update_time = timezone.localtime().strftime('%Y-%m-%d %H:%M:%S')
+            source = 'realtime' if use_realtime else 'close'
+            
+            # 写入临时键后原子重命名，读取方不会看到半成品排名
+            redis_conn = get_redis_connection('default')
+            rank_tmp = f'{LeaderboardService.RANK_KEY}:tmp'
+            detail_tmp = f'{LeaderboardService.DETAIL_KEY}:tmp'
+            pipe = redis_conn.pipeline(transaction=True)
+            pipe.delete(rank_tmp, detail_tmp)
+            if scores:
+                pipe.zadd(rank_tmp, scores)
+                pipe.hset(detail_tmp, mapping=details)
+                pipe.rename(rank_tmp, LeaderboardService.RANK_KEY)
+                pipe.rename(detail_tmp, LeaderboardService.DETAIL_KEY)
+            else:
+                pipe.delete(LeaderboardService.RANK_KEY, LeaderboardService.DETAIL_KEY)
+            pipe.hset(LeaderboardService.META_KEY, mapping={
+                'update_time': update_time,
+                'count': len(scores),
+                'source': source,
+            })
+            pipe.execute()
+            
+            duration = round(time.perf_counter() - start_time, 3)
+            return {
+                'success': True,
+                'message': f'排行榜更新完成，共 {len(scores)} 个账户，耗时 {duration} 秒',
+                'data': {'count': len(scores), 'duration': duration, 'source': source, 'update_time': update_time}
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'排行榜更新失败: {str(e)}',
+                'data': {'count': 0, 'duration': round(time.perf_counter() - start_time, 3)}
+            }
+    
+    @staticmethod
+    def _decode(value):
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+    
+    @staticmethod
+    def get_top(limit: int = 20) -> List[Dict]:
+        """获取收益率前N名"""
+        redis_conn = get_redis_connection('default')
+        ranked = redis_conn.zrevrange(LeaderboardService.RANK_KEY, 0, limit - 1, withscores=True)
+        if not ranked:
+            return []
+        
+        user_ids = [LeaderboardService._decode(member) for member, _ in ranked]
+        details = redis_conn.hmget(LeaderboardService.DETAIL_KEY, user_ids)
+        
+        result = []
+        for index, ((_, score), detail) in enumerate(zip(ranked, details)):
+            item = json.loads(LeaderboardService._decode(detail)) if detail else {}
+            item.update({
+                'rank': index + 1,
+                'user_id': int(user_ids[index]),
+                'return_rate': score,
+            })
+            result.append(item)
+        return result
+    
+    @staticmethod
+    def get_user_rank(user_id: int) -> Optional[Dict]:
+        """获取指定用户的排名，未上榜返回None"""
+        redis_conn = get_redis_connection('default')
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.zrevrank(LeaderboardService.RANK_KEY, user_id)
+        pipe.zscore(LeaderboardService.RANK_KEY, user_id)
+        pipe.zcard(LeaderboardService.RANK_KEY)
+        pipe.hget(LeaderboardService.DETAIL_KEY, user_id)
+        rank, score, total, detail = pipe.execute()
+        
+        if rank is None:
+            return None
+        
+        item = json.loads(LeaderboardService._decode(detail)) if detail else {}
+        item.update({
+            'rank': rank + 1,
+            'user_id': user_id,
+            'return_rate': score,
+            'total': total,
+            'beat_ratio': round((total - rank - 1) / total * 100, 2) if total else 0,
+        })
+        return item
+    
+    @staticmethod
+    def get_meta() -> Dict:
+        """获取排行榜更新时间等信息"""
+        redis_conn = get_redis_connection('default')
+        meta = redis_conn.hgetall(LeaderboardService.META_KEY)
+        return {LeaderboardService._decode(k): LeaderboardService._decode(v) for k, v in meta.items()}
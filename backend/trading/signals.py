@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+交易模块信号处理
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from stock.news_tagger import stock_news_tagger
+from trading.models import MarketNews, MarketNewsStock
+from trading.news_feed import bump_feed_version
+from trading.news_search import news_search_index
+
+
+@receiver(post_save, sender=MarketNews)
+def link_news_stocks(sender, instance, created=False, update_fields=None, **kwargs):
+    """新闻保存后维护新闻-股票关联，新建且未指定相关股票时自动识别"""
+    if update_fields and not set(update_fields) & {'title', 'content', 'related_stocks', 'publish_time'}:
+        return
+    # 仅新建时自动打标签，编辑时清空的相关股票视为人工修正，不再回填
+    if created and not instance.related_stocks:
+        related_stocks = stock_news_tagger.tag(f'{instance.title}\n{instance.content}')
+        if related_stocks:
+            # update 不触发信号
+            MarketNews.objects.filter(pk=instance.pk).update(related_stocks=related_stocks)
+            instance.related_stocks = related_stocks
+    MarketNewsStock.replace_links(instance)
+
+
+@receiver(post_save, sender=MarketNews)
+def index_saved_news(sender, instance, update_fields=None, **kwargs):
+    """新闻保存后增量更新全文索引（仅更新阅读次数时跳过）"""
+    if update_fields and set(update_fields) <= {'read_count'}:
+        return
+    # 事务提交后再更新索引和列表缓存，回滚的写入不会生效
+    transaction.on_commit(lambda: news_search_index.on_saved(instance))
+    transaction.on_commit(bump_feed_version)
+
+
+@receiver(post_delete, sender=MarketNews)
+def unindex_deleted_news(sender, instance, **kwargs):
+    """新闻删除后从全文索引移除"""
+    news_id = instance.id
+    transaction.on_commit(lambda: news_search_index.on_deleted(news_id))
+    transaction.on_commit(bump_feed_version)
@@ -1,3 +1,106 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+
+from stock.models import TradeCal
+from trading.models import MarketNews, MarketNewsStock, TradeRecord, UserPosition
+from trading.services import AdminService, SettlementService
+from user.models import SysUser
+from utils.pagination import InvalidCursor, decode_cursor, keyset_paginate
+
+
+class KeysetPaginationTests(TestCase):
+    """游标分页"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = SysUser.objects.create(username='pager', password='x', status=0)
+        TradeRecord.objects.bulk_create([
+            TradeRecord(user=cls.user, ts_code='000001.SZ', stock_name='平安银行', trade_type='BUY',
+                        trade_price=Decimal('10'), trade_shares=100, trade_amount=Decimal('1000'))
+            for _ in range(5)
+        ])
+
+    def test_pages_cover_all_rows_without_overlap(self):
+        queryset = TradeRecord.objects.filter(user=self.user)
+        seen = []
+        cursor = ''
+        while True:
+            page = keyset_paginate(queryset, cursor, page_size=2)
+            seen.extend(item.id for item in page['items'])
+            if not page['has_more']:
+                break
+            cursor = page['next_cursor']
+        self.assertEqual(seen, list(queryset.order_by('-trade_time', '-id').values_list('id', flat=True)))
+
+    def test_empty_cursor_is_first_page(self):
+        self.assertIsNone(decode_cursor(''))
+        self.assertIsNone(decode_cursor(None))
+
+    def test_malformed_cursor_raises(self):
+        for cursor in ('garbage!!', 'bm90LWpzb24', 'WyJ4IiwxXQ'):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+        with self.assertRaises(InvalidCursor):
+            AdminService.get_trading_records(cursor='garbage!!')
+
+
+class NewsAutoTagTests(TestCase):
+    """新闻自动打标签"""
+
+    def setUp(self):
+        patcher = mock.patch('trading.signals.stock_news_tagger.tag', return_value=['600036.SH'])
+        self.tag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_created_news_is_tagged(self):
+        news = MarketNews.objects.create(title='招商银行发布年报', content='正文', publish_time=timezone.now())
+        news.refresh_from_db()
+        self.assertEqual(news.related_stocks, ['600036.SH'])
+        self.assertEqual(list(MarketNewsStock.objects.values_list('ts_code', flat=True)), ['600036.SH'])
+
+    def test_cleared_tags_on_edit_are_kept(self):
+        news = MarketNews.objects.create(title='招商银行发布年报', content='正文', publish_time=timezone.now())
+        self.tag.reset_mock()
+        news.related_stocks = []
+        news.save()
+        news.refresh_from_db()
+        self.tag.assert_not_called()
+        self.assertEqual(news.related_stocks, [])
+        self.assertFalse(MarketNewsStock.objects.exists())
+
+
+class SettlementTests(TestCase):
+    """T+1结算"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = SysUser.objects.create(username='settler', password='x', status=0)
+        cls.settled = UserPosition.objects.create(
+            user=user, ts_code='600000.SH', stock_name='浦发银行', position_shares=300, available_shares=100,
+            today_bought_shares=200, last_buy_date=date(2026, 10, 16), cost_price=Decimal('10'))
+        cls.pending = UserPosition.objects.create(
+            user=user, ts_code='600036.SH', stock_name='招商银行', position_shares=100, available_shares=0,
+            today_bought_shares=100, last_buy_date=date(2026, 10, 19), cost_price=Decimal('40'))
+
+    def test_rolls_bought_shares_once(self):
+        first = SettlementService.settle_t1(date(2026, 10, 16), force=True)
+        again = SettlementService.settle_t1(date(2026, 10, 16), force=True)
+        self.assertTrue(first['success'])
+        self.assertEqual((first['data']['rows'], again['data']['rows']), (1, 0))
+
+        self.settled.refresh_from_db()
+        self.pending.refresh_from_db()
+        self.assertEqual((self.settled.available_shares, self.settled.today_bought_shares), (300, 0))
+        self.assertEqual((self.pending.available_shares, self.pending.today_bought_shares), (0, 100))
 
-# Create your tests here.
+    def test_skips_closed_day(self):
+        TradeCal.objects.create(exchange='SSE', cal_date=date(2026, 10, 1), is_open=False)
+        result = SettlementService.settle_t1(date(2026, 10, 1))
+        self.assertTrue(result['success'])
+        self.assertEqual(result['data']['rows'], 0)
+        self.settled.refresh_from_db()
+        self.assertEqual(self.settled.today_bought_shares, 200)
@@ -16,6 +16,8 @@ urlpatterns = [
     path('positions/', views.get_positions, name='get_positions'),         # GET 获取持仓信息
     path('records/', views.get_trade_records, name='get_trade_records'),   # GET 获取交易记录
     path('statistics/', views.trading_statistics, name='trading_statistics'), # GET 获取交易统计
+    path('performance/', views.get_performance, name='get_performance'), # GET 获取账户绩效分析
+    path('leaderboard/', views.get_leaderboard, name='get_leaderboard'), # GET 获取收益排行榜
     
     # 自选股相关
     path('watchlist/', views.get_watchlist, name='get_watchlist'),         # GET 获取自选股
@@ -31,6 +33,7 @@ urlpatterns = [
     path('admin/records/', views.admin_user_records, name='admin_user_records'),     # GET 管理员查看用户交易记录
     path('admin/assets/adjust/', views.admin_adjust_assets, name='admin_adjust_assets'), # POST 管理员调整用户资产
     path('admin/freeze-user/', views.admin_freeze_user, name='admin_freeze_user'),   # POST 管理员冻结用户
+    path('admin/leaderboard/refresh/', views.admin_refresh_leaderboard, name='admin_refresh_leaderboard'), # POST 管理员刷新排行榜
     
     # 管理员功能 - 新闻管理
     path('admin/news/', views.admin_news_list, name='admin_news_list'),             # GET 管理员获取新闻列表
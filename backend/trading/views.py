@@ -12,10 +12,14 @@ from django.utils import timezone
 from trading.models import (UserStockAccount, UserPosition, TradeRecord, UserWatchList, MarketNews, AdminOperationLog,
                           UserStockAccountSerializer, UserPositionSerializer, TradeRecordSerializer, 
                           UserWatchListSerializer, MarketNewsSerializer)
-from trading.services import TradingService, AdminService, WatchListService
+from trading.services import (TradingService, AdminService, WatchListService, AccountAnalyticsService,
+                              LeaderboardService)
+from trading.news_feed import get_news_items, get_news_page
+from trading.news_search import news_search_index
 from stock.services import UserPermissionService
 from stock.models import StockBasic, StockDaily
 from utils.permissions import require_login, admin_required, data_permission_filter
+from utils.pagination import InvalidCursor, keyset_paginate
 from user.models import SysUser
 from datetime import datetime
 import time
@@ -89,6 +93,8 @@ def buy_stock(request):
         
         # 计算交易金额
         trade_amount = price * shares
+        commission = Decimal('5.00')  # 固定手续费
+        total_cost = Decimal(str(trade_amount)) + commission
         
         # 获取或创建用户股票账户
         account, created = UserStockAccount.objects.get_or_create(
@@ -111,13 +117,14 @@ def buy_stock(request):
             })
         
         # 检查资金是否充足和账户状态
-        if (account.account_balance >= Decimal(str(trade_amount)) and 
+        if (account.account_balance >= total_cost and 
             not getattr(user, 'freeze', False) and 
             getattr(user, 'account_opened', True)):
             
             # 资金充足，执行买入
-            # 扣除资金
-            account.account_balance -= Decimal(str(trade_amount))
+            # 扣除资金，买入手续费计入已实现盈亏
+            account.account_balance -= total_cost
+            account.realized_profit -= commission
             account.save()
             
             # 更新持仓
@@ -140,8 +147,8 @@ def buy_stock(request):
                 total_shares = position.position_shares + shares
                 position.cost_price = total_cost / total_shares
             
-            position.position_shares += shares
-            position.available_shares += shares
+            # T+1：当日买入不可卖出，收盘结算后转为可用数量
+            TradingService.add_today_bought(position, shares)
             position.current_price = Decimal(str(price))
             position.save()
             
@@ -154,7 +161,7 @@ def buy_stock(request):
                 trade_price=Decimal(str(price)),
                 trade_shares=shares,
                 trade_amount=Decimal(str(trade_amount)),
-                commission=Decimal('5.00'),  # 固定手续费
+                commission=commission,
                 status='COMPLETED',  # 直接成交，无委托状态
                 trade_time=timezone.now()  # 使用Django的timezone来确保时区正确
             )
@@ -167,7 +174,7 @@ def buy_stock(request):
             })
         else:
             # 资金不足或账户问题
-            money_flag = 1 if account.account_balance >= Decimal(str(trade_amount)) else 0
+            money_flag = 1 if account.account_balance >= total_cost else 0
             
             return JsonResponse({
                 "flag": 0,
@@ -286,13 +293,11 @@ def get_account_info(request):
         total_market_value = sum(float(pos['market_value']) for pos in positions)
         total_profit_loss = sum(float(pos['profit_loss']) for pos in positions)
 
-        # 更新账户的总盈亏字段
-        account.total_profit = Decimal(str(total_profit_loss))
-
         # 计算总资产：现金余额 + 持仓市值
+        # total_profit（已实现+浮动盈亏）由每日快照任务 take_daily_snapshots 维护，这里不覆盖
         total_value = float(account.account_balance) + total_market_value
         account.total_assets = Decimal(str(total_value))
-        account.save()
+        account.save(update_fields=['total_assets', 'update_time'])
 
         account_info = {
             'account_balance': float(account.account_balance),
@@ -323,6 +328,71 @@ def get_account_info(request):
         })
 
 
+@require_login
+def get_performance(request):
+    """获取账户绩效（净值曲线、收益、回撤、夏普） - 所有用户可访问"""
+    try:
+        user = SysUser.objects.get(id=request.user_id)
+        days = request.GET.get('days')
+        risk_free_rate = float(request.GET.get('riskFreeRate', 0))
+
+        performance = AccountAnalyticsService.get_performance(
+            user,
+            days=int(days) if days else None,
+            risk_free_rate=risk_free_rate
+        )
+
+        return JsonResponse({
+            'code': 200,
+            'msg': '获取成功',
+            'data': performance
+        })
+
+    except SysUser.DoesNotExist:
+        return JsonResponse({
+            'code': 404,
+            'msg': '用户不存在'
+        })
+    except (ValueError, TypeError) as e:
+        return JsonResponse({
+            'code': 400,
+            'msg': f'参数格式错误: {str(e)}'
+        })
+    except Exception as e:
+        return JsonResponse({
+            'code': 500,
+            'msg': f'获取账户绩效失败: {str(e)}'
+        })
+
+
+@require_login
+def get_leaderboard(request):
+    """获取收益排行榜及我的排名 - 所有用户可访问"""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+
+        return JsonResponse({
+            'code': 200,
+            'msg': '获取成功',
+            'data': {
+                'list': LeaderboardService.get_top(limit),
+                'my_rank': LeaderboardService.get_user_rank(request.user_id),
+                'meta': LeaderboardService.get_meta(),
+            }
+        })
+
+    except (ValueError, TypeError) as e:
+        return JsonResponse({
+            'code': 400,
+            'msg': f'参数格式错误: {str(e)}'
+        })
+    except Exception as e:
+        return JsonResponse({
+            'code': 500,
+            'msg': f'获取排行榜失败: {str(e)}'
+        })
+
+
 @require_login
 @data_permission_filter
 def get_positions(request):
@@ -447,9 +517,25 @@ def get_trade_records(request):
         if ts_code:
             queryset = queryset.filter(ts_code=ts_code)
 
-        # 分页
-        paginator = Paginator(queryset.order_by('-trade_time'), page_size)
-        trades = paginator.get_page(page)
+        queryset = queryset.select_related('user')
+
+        # 分页：传入cursor（首页为空字符串）时使用游标分页，否则按页码分页
+        cursor = request.GET.get('cursor')
+        next_cursor = None
+        total_is_estimate = False
+        if cursor is not None:
+            with_total = request.GET.get('withTotal', '').lower() in ('1', 'true')
+            page_data = keyset_paginate(queryset, cursor, page_size, 'trade_time', with_total)
+            trades = page_data['items']
+            total = page_data['total']
+            total_is_estimate = page_data['total_is_estimate']
+            next_cursor = page_data['next_cursor']
+            has_more = page_data['has_more']
+        else:
+            paginator = Paginator(queryset.order_by('-trade_time', '-id'), page_size)
+            trades = paginator.get_page(page)
+            total = paginator.count
+            has_more = trades.has_next()
 
         # 序列化数据
         trade_list = []
@@ -458,7 +544,7 @@ def get_trade_records(request):
             local_time = timezone.localtime(trade.trade_time)
             trade_data = {
                 'id': trade.id,
-                'user_id': trade.user.id,
+                'user_id': trade.user_id,
                 'username': trade.user.username,
                 'ts_code': trade.ts_code,
                 'stock_name': trade.stock_name,
@@ -483,13 +569,21 @@ def get_trade_records(request):
             'msg': '获取成功',
             'data': {
                 'list': trade_list,
-                'total': paginator.count,
+                'total': total,
                 'page': page,
                 'pageSize': page_size,
-                'totalPages': paginator.num_pages,
+                'totalPages': (total + page_size - 1) // page_size if total is not None else None,
+                'totalIsEstimate': total_is_estimate,
+                'nextCursor': next_cursor,
+                'hasMore': has_more,
             }
         })
 
+    except InvalidCursor:
+        return JsonResponse({
+            'code': 400,
+            'msg': '分页游标无效，请从第一页重新加载'
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'code': 500,
@@ -876,7 +970,9 @@ def admin_user_records(request):
             page=page, 
             page_size=page_size, 
             user_id=int(user_id) if user_id else None,
-            ts_code=ts_code
+            ts_code=ts_code,
+            cursor=request.GET.get('cursor'),
+            with_total=request.GET.get('withTotal', '').lower() in ('1', 'true')
         )
         
         return JsonResponse({
@@ -887,10 +983,18 @@ def admin_user_records(request):
                 'total': result['total'],
                 'page': result['page'],
                 'pageSize': result['page_size'],
-                'totalPages': (result['total'] + page_size - 1) // page_size,
+                'totalPages': (result['total'] + page_size - 1) // page_size if result['total'] is not None else None,
+                'totalIsEstimate': result['total_is_estimate'],
+                'nextCursor': result['next_cursor'],
+                'hasMore': result['has_more'],
             }
         })
         
+    except InvalidCursor:
+        return JsonResponse({
+            'code': 400,
+            'msg': '分页游标无效，请从第一页重新加载'
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'code': 500,
@@ -898,6 +1002,36 @@ def admin_user_records(request):
         })
 
 
+@admin_required
+@csrf_exempt
+@require_http_methods(["POST"])
+def admin_refresh_leaderboard(request):
+    """管理员手动刷新收益排行榜 - 仅管理员可访问"""
+    try:
+        admin_user = SysUser.objects.get(id=request.user_id)
+        result = LeaderboardService.refresh()
+
+        AdminService.log_operation(
+            admin_user=admin_user,
+            operation_type='TRADE_MANAGE',
+            operation_desc='刷新收益排行榜',
+            is_success=result['success'],
+            error_message=None if result['success'] else result['message']
+        )
+
+        return JsonResponse({
+            'code': 200 if result['success'] else 500,
+            'msg': result['message'],
+            'data': result['data']
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'code': 500,
+            'msg': f'刷新排行榜失败: {str(e)}'
+        })
+
+
 @admin_required
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -989,6 +1123,8 @@ def admin_news_list(request):
         page_size = int(request.GET.get('pageSize', 20))
         category = request.GET.get('category')
         is_published = request.GET.get('is_published')
+        keyword = request.GET.get('keyword', '').strip()
+        ts_code = request.GET.get('ts_code', '').strip()
         
         # 转换is_published参数
         if is_published is not None:
@@ -999,7 +1135,9 @@ def admin_news_list(request):
             page=page, 
             page_size=page_size, 
             category=category,
-            is_published=is_published
+            is_published=is_published,
+            keyword=keyword,
+            ts_code=ts_code
         )
         
         return JsonResponse({
@@ -1169,7 +1307,9 @@ def admin_operation_logs(request):
             page=page,
             page_size=page_size,
             admin_user_id=int(admin_user_id) if admin_user_id else None,
-            operation_type=operation_type
+            operation_type=operation_type,
+            cursor=request.GET.get('cursor'),
+            with_total=request.GET.get('withTotal', '').lower() in ('1', 'true')
         )
         
         return JsonResponse({
@@ -1180,10 +1320,18 @@ def admin_operation_logs(request):
                 'total': result['total'],
                 'page': result['page'],
                 'pageSize': result['page_size'],
-                'totalPages': (result['total'] + page_size - 1) // page_size,
+                'totalPages': (result['total'] + page_size - 1) // page_size if result['total'] is not None else None,
+                'totalIsEstimate': result['total_is_estimate'],
+                'nextCursor': result['next_cursor'],
+                'hasMore': result['has_more'],
             }
         })
         
+    except InvalidCursor:
+        return JsonResponse({
+            'code': 400,
+            'msg': '分页游标无效，请从第一页重新加载'
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'code': 500,
@@ -1235,14 +1383,19 @@ def get_news_list(request):
         page = int(request.GET.get('page', 1))
         page_size = int(request.GET.get('pageSize', 20))
         category = request.GET.get('category')
-        
-        # 只显示已发布的新闻
-        result = AdminService.get_news_list(
-            page=page,
-            page_size=page_size,
-            category=category,
-            is_published=True
-        )
+        keyword = request.GET.get('keyword', '').strip()
+        ts_code = request.GET.get('ts_code', '').strip()
+        
+        # 只显示已发布的新闻；关键词走全文索引，按时间倒序的列表页走新闻列表缓存，两者返回相同的列表项
+        if keyword:
+            hits = news_search_index.search(
+                keyword, category=category, ts_code=ts_code or None, is_published=True,
+                offset=(page - 1) * page_size, limit=page_size
+            )
+            result = {'news': get_news_items(hits['ids']), 'total': hits['total'], 'page': page, 'page_size': page_size}
+        else:
+            feed = get_news_page(page, page_size, category=category, ts_code=ts_code or None, is_published=True)
+            result = {'news': feed['list'], 'total': feed['total'], 'page': page, 'page_size': page_size}
         
         return JsonResponse({
             'code': 200,
@@ -1272,7 +1425,7 @@ def get_news_detail(request, news_id):
             
             # 增加阅读次数
             news.read_count += 1
-            news.save()
+            news.save(update_fields=['read_count'])
             
             news_data = {
                 'id': news.id,
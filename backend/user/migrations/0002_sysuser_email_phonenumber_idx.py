@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sysuser",
+            index=models.Index(fields=["email"], name="sys_user_email_c9517f_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="sysuser",
+            index=models.Index(
+                fields=["phonenumber"], name="sys_user_phonenu_979266_idx"
+            ),
+        ),
+    ]
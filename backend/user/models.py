@@ -20,6 +20,11 @@ class SysUser(models.Model):
 
     class Meta:
         db_table = "sys_user"
+        indexes = [
+            # 用户搜索按前缀匹配
+            models.Index(fields=['email'], name='sys_user_email_c9517f_idx'),
+            models.Index(fields=['phonenumber'], name='sys_user_phonenu_979266_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -5,6 +5,7 @@ from user import views
 
 urlpatterns = [
     path('login', views.LoginView.as_view(), name="login"),  # 登录
+    path('logout', views.LogoutView.as_view(), name="logout"),  # 退出登录
     path('debug_login', views.DebugLoginView.as_view(), name="debug_login"),  # 调试登录
     path('register', views.RegisterView.as_view(), name="register"),  # 注册
     path('save', views.SaveView.as_view(), name="save"),  # 用户添加或修改
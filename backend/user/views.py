@@ -8,7 +8,7 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.contrib.auth.hashers import make_password, check_password
-from django.db.models import Count, Sum
+from django.db.models import Count, Sum, Q, Prefetch
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework_jwt.settings import api_settings
@@ -17,7 +17,12 @@ from django.core.files.base import ContentFile
 
 from user.models import SysUser, SysUserSerializer
 from role.models import SysRole, SysUserRole
-from utils.permissions import require_login, admin_required, superadmin_required
+from utils.permissions import (
+    require_login, admin_required, superadmin_required,
+    get_user_role_codes, get_user_role_info, invalidate_user_roles,
+)
+from utils.jwt_helper import build_token_payload, revoke_token, revoke_user_tokens
+from user.middleware import JwtAuthenticationMiddleware
 from trading.models import UserStockAccount, TradeRecord
 from app import settings
 
@@ -27,6 +32,48 @@ ROLE_ADMIN = 'admin'
 ROLE_USER = 'user'
 
 
+def get_users_financial_info(user_ids):
+    """
+    批量获取用户金融信息：一次查询账户余额，一次分组聚合买卖笔数
+    
+    Returns:
+        dict: {user_id: {'account_balance', 'buy_count', 'sell_count'}}
+    """
+    user_ids = list(user_ids)
+    result = {
+        user_id: {'account_balance': 0.0, 'buy_count': 0, 'sell_count': 0}
+        for user_id in user_ids
+    }
+    if not user_ids:
+        return result
+    
+    balances = UserStockAccount.objects.filter(user_id__in=user_ids).values_list('user_id', 'account_balance')
+    for user_id, balance in balances:
+        result[user_id]['account_balance'] = float(balance)
+    
+    trade_counts = TradeRecord.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+        buy_count=Count('id', filter=Q(trade_type='BUY')),
+        sell_count=Count('id', filter=Q(trade_type='SELL')),
+    )
+    for row in trade_counts:
+        result[row['user_id']]['buy_count'] = row['buy_count']
+        result[row['user_id']]['sell_count'] = row['sell_count']
+    return result
+
+
+def build_user_search_filter(query):
+    """
+    用户搜索条件：按前缀匹配（LIKE 'xxx%'）以便走 username/email/phonenumber 上的索引
+    
+    纯数字查手机号和用户名（兼容纯数字用户名），含@只查邮箱，其余查用户名和邮箱
+    """
+    if query.isdigit():
+        return Q(phonenumber__startswith=query) | Q(username__startswith=query)
+    if '@' in query:
+        return Q(email__istartswith=query)
+    return Q(username__istartswith=query) | Q(email__istartswith=query)
+
+
 class AuthenticationView(APIView):
     """统一的认证相关视图"""
     
@@ -57,15 +104,15 @@ class AuthenticationView(APIView):
             if user.status != 0:  # 0正常，1停用
                 return JsonResponse({'code': 403, 'msg': '账户已被禁用'})
             
-            # 生成token
-            jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
+            # 获取用户角色
+            role_codes, role_names = get_user_role_info(user.id)
+            roles = ",".join(role_names)
+            
+            # 生成token（附带角色和状态声明，后续请求鉴权无需查库）
             jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
-            payload = jwt_payload_handler(user)
+            payload = build_token_payload(user, role_codes, role_names)
             token = jwt_encode_handler(payload)
             
-            # 获取用户角色
-            roles = self._get_user_roles(user.id)
-            
             # 序列化用户数据并添加金融信息
             user_data = SysUserSerializer(user).data
             user_data.update(self._get_user_financial_info(user))
@@ -135,28 +182,13 @@ class AuthenticationView(APIView):
     
     def _get_user_roles(self, user_id):
         """获取用户角色"""
-        roles = SysRole.objects.raw(
-            "SELECT id, name, code FROM sys_role WHERE id IN "
-            "(SELECT role_id FROM sys_user_role WHERE user_id=%s)", 
-            [user_id]
-        )
-        return ",".join([role.name for role in roles])
+        role_names = get_user_role_info(user_id, getattr(self, 'request', None))[1]
+        return ",".join(role_names)
     
     def _get_user_financial_info(self, user):
         """获取用户金融信息"""
         try:
-            # 获取账户信息
-            account = UserStockAccount.objects.filter(user=user).first()
-            
-            # 获取交易统计
-            buy_count = TradeRecord.objects.filter(user=user, trade_type='BUY').count()
-            sell_count = TradeRecord.objects.filter(user=user, trade_type='SELL').count()
-            
-            return {
-                'account_balance': float(account.account_balance) if account else 0.0,
-                'buy_count': buy_count,
-                'sell_count': sell_count,
-            }
+            return get_users_financial_info([user.id])[user.id]
         except Exception:
             return {
                 'account_balance': 0.0,
@@ -220,6 +252,8 @@ class UserManagementView(APIView):
             # 删除用户和相关数据
             SysUserRole.objects.filter(user_id__in=user_ids).delete()
             SysUser.objects.filter(id__in=user_ids).delete()
+            for user_id in user_ids:
+                revoke_user_tokens(user_id)
             
             return JsonResponse({'code': 200, 'msg': '删除成功'})
             
@@ -344,6 +378,8 @@ class UserManagementView(APIView):
                     user.status = data.get('status', user.status)
                 user.update_time = timezone.now()
                 user.save()
+                if str(user.status) != '0':
+                    revoke_user_tokens(user.id)
             
             return JsonResponse({'code': 200, 'msg': '保存成功'})
             
@@ -394,6 +430,9 @@ class UserManagementView(APIView):
             user.update_time = timezone.now()
             user.save()
             
+            # 重置密码后原有token全部失效
+            revoke_user_tokens(user_id)
+            
             return JsonResponse({'code': 200, 'msg': '密码重置成功'})
             
         except Exception as e:
@@ -414,6 +453,10 @@ class UserManagementView(APIView):
             user.update_time = timezone.now()
             user.save()
             
+            # 停用账户时注销其已签发的token
+            if int(status) != 0:
+                revoke_user_tokens(user_id)
+            
             return JsonResponse({'code': 200, 'msg': '状态更新成功'})
             
         except Exception as e:
@@ -436,6 +479,9 @@ class UserManagementView(APIView):
             for role_id in role_ids:
                 SysUserRole.objects.create(user_id=user_id, role_id=role_id)
             
+            # 清除该用户的角色缓存
+            invalidate_user_roles(user_id)
+            
             return JsonResponse({'code': 200, 'msg': '角色授权成功'})
             
         except Exception as e:
@@ -443,25 +489,13 @@ class UserManagementView(APIView):
     
     def _get_user_roles(self, user_id):
         """获取用户角色"""
-        roles = SysRole.objects.raw(
-            "SELECT id, name, code FROM sys_role WHERE id IN "
-            "(SELECT role_id FROM sys_user_role WHERE user_id=%s)", 
-            [user_id]
-        )
-        return ",".join([role.name for role in roles])
+        role_names = get_user_role_info(user_id, getattr(self, 'request', None))[1]
+        return ",".join(role_names)
     
     def _get_user_financial_info(self, user):
         """获取用户金融信息"""
         try:
-            account = UserStockAccount.objects.filter(user=user).first()
-            buy_count = TradeRecord.objects.filter(user=user, trade_type='BUY').count()
-            sell_count = TradeRecord.objects.filter(user=user, trade_type='SELL').count()
-            
-            return {
-                'account_balance': float(account.account_balance) if account else 0.0,
-                'buy_count': buy_count,
-                'sell_count': sell_count,
-            }
+            return get_users_financial_info([user.id])[user.id]
         except Exception:
             return {
                 'account_balance': 0.0,
@@ -473,23 +507,13 @@ class UserManagementView(APIView):
         """检查是否为超级管理员"""
         if not user_id:
             return False
-        roles = SysRole.objects.raw(
-            "SELECT id, code FROM sys_role WHERE id IN "
-            "(SELECT role_id FROM sys_user_role WHERE user_id=%s)", 
-            [user_id]
-        )
-        return any(role.code == ROLE_SUPERADMIN for role in roles)
+        return ROLE_SUPERADMIN in get_user_role_codes(user_id, self.request)
     
     def _is_admin_or_above(self, user_id):
         """检查是否为管理员或以上级别"""
         if not user_id:
             return False
-        roles = SysRole.objects.raw(
-            "SELECT id, code FROM sys_role WHERE id IN "
-            "(SELECT role_id FROM sys_user_role WHERE user_id=%s)", 
-            [user_id]
-        )
-        role_codes = [role.code for role in roles]
+        role_codes = get_user_role_codes(user_id, self.request)
         return ROLE_SUPERADMIN in role_codes or ROLE_ADMIN in role_codes
 
 
@@ -557,6 +581,19 @@ class LoginView(AuthenticationView):
         return super().post(request)
 
 
+class LogoutView(APIView):
+    """退出登录：将当前token加入黑名单"""
+    def post(self, request):
+        try:
+            token = JwtAuthenticationMiddleware.get_token(request)
+            if token:
+                revoke_token(token)
+            return JsonResponse({'code': 200, 'msg': '退出成功'})
+            
+        except Exception as e:
+            return JsonResponse({'code': 500, 'msg': f'退出失败: {str(e)}'})
+
+
 class RegisterView(AuthenticationView):
     """注册视图 - 兼容性"""
     def post(self, request):
@@ -642,40 +679,32 @@ class SearchView(UserManagementView):
             page_num = data.get('pageNum', 1)
             page_size = data.get('pageSize', 10)
 
-            # 查询用户
-            users_query = SysUser.objects.all()
+            # 查询用户，角色通过一次关联查询预取
+            users_query = SysUser.objects.order_by('id').prefetch_related(
+                Prefetch('user_roles', queryset=SysUserRole.objects.select_related('role'))
+            )
 
-            # 如果有搜索关键词，进行模糊搜索
+            # 如果有搜索关键词，按前缀搜索
             if query:
-                from django.db.models import Q
-                users_query = users_query.filter(
-                    Q(username__icontains=query) |
-                    Q(email__icontains=query) |
-                    Q(phonenumber__icontains=query)
-                )
+                users_query = users_query.filter(build_user_search_filter(query))
 
             total = users_query.count()
 
             # 分页
             start = (page_num - 1) * page_size
             end = start + page_size
-            users = users_query[start:end]
+            users = list(users_query[start:end])
+
+            # 当前页用户的金融信息批量查询
+            financial_map = get_users_financial_info(user.id for user in users)
 
             # 构建用户列表数据
             user_list = []
             for user in users:
-                # 获取用户角色 - 添加异常处理
-                role_list = []
-                try:
-                    roles = SysRole.objects.raw(
-                        "SELECT id, name, code FROM sys_role WHERE id IN "
-                        "(SELECT role_id FROM sys_user_role WHERE user_id=%s)",
-                        [user.id]
-                    )
-                    role_list = [{'id': role.id, 'name': role.name, 'code': role.code} for role in roles]
-                except Exception as e:
-                    print(f"获取用户 {user.id} 角色失败: {e}")
-                    role_list = []
+                role_list = [
+                    {'id': user_role.role.id, 'name': user_role.role.name, 'code': user_role.role.code}
+                    for user_role in user.user_roles.all()
+                ]
 
                 user_data = {
                     'id': user.id,
@@ -689,6 +718,7 @@ class SearchView(UserManagementView):
                     'remark': getattr(user, 'remark', '') or '',
                     'roleList': role_list
                 }
+                user_data.update(financial_map[user.id])
                 user_list.append(user_data)
 
             return JsonResponse({
@@ -733,15 +763,8 @@ class AccessibleUrlsView(APIView):
             if not user_id:
                 return JsonResponse({'code': 401, 'msg': '未授权'})
             
-            # 获取用户角色
-            roles = SysRole.objects.raw(
-                "SELECT id, name, code FROM sys_role WHERE id IN "
-                "(SELECT role_id FROM sys_user_role WHERE user_id=%s)", 
-                [user_id]
-            )
-            
-            role_codes = [role.code for role in roles]
-            role_names = [role.name for role in roles]
+            # 获取用户角色（带缓存）
+            role_codes, role_names = get_user_role_info(user_id, request)
             
             # 确定用户角色类型
             is_superadmin = ROLE_SUPERADMIN in role_codes or '超级管理员' in role_names
@@ -793,9 +816,8 @@ class DebugLoginView(APIView):
                 return JsonResponse({'code': 404, 'msg': '没有可用的用户进行调试'})
             
             # 生成token
-            jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
             jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
-            payload = jwt_payload_handler(user)
+            payload = build_token_payload(user)
             token = jwt_encode_handler(payload)
             
             return JsonResponse({
@@ -829,9 +851,8 @@ class JwtTestView(APIView):
             if not user:
                 return JsonResponse({'code': 404, 'msg': '没有可用的用户'})
             
-            jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
             jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
-            payload = jwt_payload_handler(user)
+            payload = build_token_payload(user)
             token = jwt_encode_handler(payload)
             
             return JsonResponse({'code': 200, 'token': token})
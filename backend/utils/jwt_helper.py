@@ -1,18 +1,323 @@
 # -*- coding: utf-8 -*-
 """
 JWT辅助工具
+
+- 已验证token缓存：按token摘要缓存解码后的payload（有界LRU），命中时只检查过期时间，
+  省去每个请求的HS256验签和JSON解码
+- 登录时可在token中写入角色和状态声明，权限中间件据此直接授权，无需查库
+- 注销/禁用通过Redis黑名单实现，各进程定期拉取黑名单快照，不在每个请求上访问Redis
+- 失败即收紧：黑名单读取或写入失败时，本进程不再信任token中的角色/状态声明（改为查缓存/数据库），
+  写入失败的注销记录先在本进程生效，并在下次刷新时补写到Redis
 """
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
 from django.conf import settings
 from rest_framework_jwt.settings import api_settings
 
+logger = logging.getLogger(__name__)
+
+# 已验证token缓存容量
+TOKEN_CACHE_SIZE = getattr(settings, 'JWT_TOKEN_CACHE_SIZE', 4096)
+# 黑名单快照刷新间隔（秒），即注销在其他进程生效的最大延迟
+DENYLIST_REFRESH_SECONDS = getattr(settings, 'JWT_DENYLIST_REFRESH_SECONDS', 5)
+# 是否在token中写入角色/状态声明
+EMBED_CLAIMS = getattr(settings, 'JWT_EMBED_CLAIMS', True)
+
+DENYLIST_KEY_PREFIX = f"{settings.CACHES['default'].get('KEY_PREFIX', '')}:jwt"
+# 被注销的token摘要，score为token过期时间
+DENYLIST_TOKENS_KEY = f'{DENYLIST_KEY_PREFIX}:denied_tokens'
+# 用户级注销：签发时间早于该时间的token全部失效（禁用账户、重置密码）
+DENYLIST_USERS_KEY = f'{DENYLIST_KEY_PREFIX}:denied_users'
+# 角色声明失效：签发时间早于该时间的token不再信任其中的角色声明，'*' 为全局
+CLAIMS_CUTOFF_KEY = f'{DENYLIST_KEY_PREFIX}:claims_cutoff'
+
+
+def token_digest(token):
+    """token摘要，用作缓存和黑名单的键"""
+    if isinstance(token, str):
+        token = token.encode('utf-8')
+    return hashlib.sha256(token).hexdigest()
+
+
+class VerifiedTokenCache(object):
+    """已验证token的有界LRU缓存：摘要 -> payload"""
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            payload = self._data.get(digest)
+            if payload is not None:
+                self._data.move_to_end(digest)
+            return payload
+
+    def set(self, digest, payload):
+        with self._lock:
+            self._data[digest] = payload
+            self._data.move_to_end(digest)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._data.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RevocationList(object):
+    """
+    Redis黑名单的进程内快照，按间隔刷新
+
+    Redis不可用时沿用上一份快照，并且在下次刷新成功前不信任token中的声明（synced为False）
+    """
+
+    def __init__(self, refresh_seconds=DENYLIST_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.denied_tokens = frozenset()
+        self.user_cutoffs = {}
+        self.claims_cutoffs = {}
+        self.synced = False
+        # 写入Redis失败、待补写的注销记录
+        self._pending_tokens = {}
+        self._pending_cutoffs = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.time()
+        if now - self._loaded_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if now - self._loaded_at < self.refresh_seconds:
+                return
+            self._loaded_at = now
+            try:
+                from django_redis import get_redis_connection
+
+                redis_conn = get_redis_connection('default')
+                max_age = api_settings.JWT_EXPIRATION_DELTA.total_seconds()
+                pipe = redis_conn.pipeline()
+                # 已过期的token无需继续拉黑
+                pipe.zremrangebyscore(DENYLIST_TOKENS_KEY, '-inf', now)
+                pipe.zrange(DENYLIST_TOKENS_KEY, 0, -1)
+                pipe.hgetall(DENYLIST_USERS_KEY)
+                pipe.hgetall(CLAIMS_CUTOFF_KEY)
+                _, tokens, users, claims = pipe.execute()
+                denied_tokens = {t.decode() if isinstance(t, bytes) else t for t in tokens}
+                cutoffs = {
+                    DENYLIST_USERS_KEY: self._parse_cutoffs(users, now - max_age),
+                    CLAIMS_CUTOFF_KEY: self._parse_cutoffs(claims, now - max_age),
+                }
+                self._flush_pending(redis_conn, denied_tokens, cutoffs)
+            except Exception as e:
+                self.synced = False
+                logger.warning('jwt_denylist result=refresh_failed error=%s', e)
+                return
+
+            self.denied_tokens = frozenset(denied_tokens)
+            self.user_cutoffs = cutoffs[DENYLIST_USERS_KEY]
+            self.claims_cutoffs = cutoffs[CLAIMS_CUTOFF_KEY]
+            self.synced = True
+
+    def _flush_pending(self, redis_conn, denied_tokens, cutoffs):
+        """补写待写入的注销记录（截止时间只前移，不覆盖Redis中更晚的值），并合并到快照"""
+        if not self._pending_tokens and not self._pending_cutoffs:
+            return
+        pipe = redis_conn.pipeline()
+        for digest, exp in self._pending_tokens.items():
+            pipe.zadd(DENYLIST_TOKENS_KEY, {digest: exp})
+        for (key, field), value in self._pending_cutoffs.items():
+            if value > cutoffs[key].get(field, 0):
+                pipe.hset(key, field, value)
+        pipe.execute()
+
+        denied_tokens.update(self._pending_tokens)
+        for (key, field), value in self._pending_cutoffs.items():
+            cutoffs[key][field] = max(value, cutoffs[key].get(field, 0))
+        logger.info('jwt_denylist result=pending_flushed tokens=%s cutoffs=%s',
+                    len(self._pending_tokens), len(self._pending_cutoffs))
+        self._pending_tokens = {}
+        self._pending_cutoffs = {}
+
+    @staticmethod
+    def _parse_cutoffs(raw, expire_before):
+        cutoffs = {}
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            value = float(value)
+            # 早于最长有效期的截止时间已无token可影响，忽略
+            if value > expire_before:
+                cutoffs[field] = value
+        return cutoffs
+
+    def force_refresh(self):
+        self._loaded_at = 0.0
+
+    def add_pending_token(self, digest, exp):
+        """Redis写入失败的token注销：立即在本进程生效，下次刷新时补写"""
+        with self._lock:
+            self._pending_tokens[digest] = exp
+            self.denied_tokens = self.denied_tokens | {digest}
+            self.synced = False
+
+    def add_pending_cutoff(self, key, field, value):
+        """Redis写入失败的截止时间：立即在本进程生效，下次刷新时补写"""
+        with self._lock:
+            self._pending_cutoffs[(key, field)] = max(value, self._pending_cutoffs.get((key, field), 0))
+            cutoffs = self.user_cutoffs if key == DENYLIST_USERS_KEY else self.claims_cutoffs
+            cutoffs = dict(cutoffs)
+            cutoffs[field] = max(value, cutoffs.get(field, 0))
+            if key == DENYLIST_USERS_KEY:
+                self.user_cutoffs = cutoffs
+            else:
+                self.claims_cutoffs = cutoffs
+            self.synced = False
+
+    def is_revoked(self, digest, payload):
+        self._refresh()
+        if digest in self.denied_tokens:
+            return True
+        cutoff = self.user_cutoffs.get(str(payload.get('user_id')))
+        return cutoff is not None and payload.get('iat', 0) < cutoff
+
+    def claims_valid(self, payload):
+        self._refresh()
+        # 黑名单未同步时其他进程的注销可能未知，不信任声明
+        if not self.synced:
+            return False
+        issued_at = payload.get('iat', 0)
+        for field in ('*', str(payload.get('user_id'))):
+            cutoff = self.claims_cutoffs.get(field)
+            if cutoff is not None and issued_at < cutoff:
+                return False
+        return True
+
+
+_token_cache = VerifiedTokenCache()
+_revocations = RevocationList()
+
+
+def verify_token(token):
+    """
+    验证token并返回payload（返回的字典被缓存共享，调用方不要修改）
+
+    Raises:
+        jwt.ExpiredSignatureError: token已过期
+        jwt.InvalidTokenError: token无效或已注销
+    """
+    digest = token_digest(token)
+    payload = _token_cache.get(digest)
+    if payload is None:
+        payload = api_settings.JWT_DECODE_HANDLER(token)
+        _token_cache.set(digest, payload)
+    else:
+        exp = payload.get('exp')
+        if exp is not None and time.time() > exp + api_settings.JWT_LEEWAY:
+            _token_cache.discard(digest)
+            raise jwt.ExpiredSignatureError('Signature has expired')
+
+    if _revocations.is_revoked(digest, payload):
+        raise jwt.InvalidTokenError('Token has been revoked')
+    return payload
+
+
+def claims_trusted(payload):
+    """token中的角色/状态声明是否可信（声明未失效且黑名单已同步）"""
+    return _revocations.claims_valid(payload)
+
+
+def get_claimed_roles(payload):
+    """
+    读取token中的角色声明
+
+    Returns:
+        tuple: (角色代码列表, 角色名称列表)；token中没有角色声明或声明已失效时返回None
+    """
+    codes = payload.get('roles')
+    if codes is None or not _revocations.claims_valid(payload):
+        return None
+    return list(codes), list(payload.get('role_names') or [])
+
+
+def build_token_payload(user, role_codes=None, role_names=None):
+    """生成token载荷，按配置附带签发时间、账户状态和角色声明"""
+    payload = api_settings.JWT_PAYLOAD_HANDLER(user)
+    # 签发时间保留毫秒，保证注销后立即重新登录签发的token晚于截止时间
+    payload['iat'] = round(time.time(), 3)
+    if EMBED_CLAIMS:
+        payload['status'] = user.status
+        if role_codes is not None:
+            payload['roles'] = list(role_codes)
+            payload['role_names'] = list(role_names or [])
+    return payload
+
+
+def revoke_token(token):
+    """注销单个token"""
+    digest = token_digest(token)
+    try:
+        payload = api_settings.JWT_DECODE_HANDLER(token)
+    except jwt.ExpiredSignatureError:
+        return True
+    except jwt.InvalidTokenError:
+        return False
+
+    exp = payload.get('exp', time.time())
+    _token_cache.discard(digest)
+    try:
+        from django_redis import get_redis_connection
+
+        get_redis_connection('default').zadd(DENYLIST_TOKENS_KEY, {digest: exp})
+    except Exception as e:
+        logger.warning('jwt_denylist result=revoke_failed error=%s', e)
+        _revocations.add_pending_token(digest, exp)
+        return False
+    _revocations.force_refresh()
+    return True
+
+
+def _set_cutoff(key, field):
+    value = time.time()
+    try:
+        from django_redis import get_redis_connection
+
+        get_redis_connection('default').hset(key, field, value)
+    except Exception as e:
+        logger.warning('jwt_denylist result=cutoff_failed key=%s field=%s error=%s', key, field, e)
+        _revocations.add_pending_cutoff(key, field, value)
+        return False
+    _revocations.force_refresh()
+    return True
+
+
+def revoke_user_tokens(user_id):
+    """注销某用户此前签发的全部token（禁用账户、重置密码等）"""
+    return _set_cutoff(DENYLIST_USERS_KEY, str(user_id))
+
+
+def invalidate_role_claims(user_id=None):
+    """使token中的角色声明失效，user_id为空时对所有用户生效"""
+    return _set_cutoff(CLAIMS_CUTOFF_KEY, '*' if user_id is None else str(user_id))
+
 
 def decode_jwt_token(token):
     """解码JWT token"""
     try:
-        jwt_decode_handler = api_settings.JWT_DECODE_HANDLER
-        payload = jwt_decode_handler(token)
-        return payload
+        return verify_token(token)
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
@@ -27,4 +332,4 @@ def encode_jwt_token(payload):
         jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
         return jwt_encode_handler(payload)
     except Exception:
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+游标（keyset）分页工具
+
+按 (时间字段, id) 倒序翻页，下一页条件为 (t, id) < (上一页最后一条的 t, id)，
+配合 (user, trade_time)/(ts_code, trade_time) 等索引，深分页不再随 OFFSET 线性变慢。
+游标对前端不透明，为 base64 编码的 JSON；无法解析的游标抛出 InvalidCursor（视图返回400），
+不会退回第一页，避免客户端沿 next_cursor 循环翻页。
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+
+# 估算总数时最多精确统计的行数，超过则返回该上限并标记为估算值
+ESTIMATE_COUNT_CAP = 10000
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析（格式错误或被篡改）"""
+
+
+def encode_cursor(time_value, pk):
+    """将 (时间, id) 编码为不透明游标"""
+    raw = json.dumps([time_value.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解析游标，空游标（首页）返回 None
+
+    Raises:
+        InvalidCursor: 非空游标无法解析
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        time_str, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return datetime.fromisoformat(time_str), int(pk)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'无效的分页游标: {cursor}') from e
+
+
+def estimate_count(queryset, cap=ESTIMATE_COUNT_CAP):
+    """
+    估算结果总数
+
+    无筛选条件时使用数据库统计信息（MySQL/PostgreSQL），
+    否则统计至多 cap 行，返回 (总数, 是否为估算值)
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+
+    if not queryset.query.where:
+        table = model._meta.db_table
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'mysql':
+                    cursor.execute(
+                        "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table]
+                    )
+                    row = cursor.fetchone()
+                    if row and row[0] is not None:
+                        return int(row[0]), True
+                elif connection.vendor == 'postgresql':
+                    cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+                    row = cursor.fetchone()
+                    if row and row[0] is not None and row[0] >= 0:
+                        return int(row[0]), True
+        except Exception:
+            pass
+
+    # COUNT(*) 作用于 LIMIT 子查询，代价上限为 cap 行
+    total = queryset.order_by()[:cap + 1].count()
+    if total > cap:
+        return cap, True
+    return total, False
+
+
+def keyset_paginate(queryset, cursor=None, page_size=20, time_field='trade_time', with_total=False):
+    """
+    按 (time_field, id) 倒序进行游标分页
+
+    Returns:
+        dict: items, next_cursor, has_more, total(仅 with_total 时), total_is_estimate
+
+    Raises:
+        InvalidCursor: 游标无法解析
+    """
+    ordered = queryset.order_by(f'-{time_field}', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        last_time, last_id = position
+        ordered = ordered.filter(
+            Q(**{f'{time_field}__lt': last_time}) |
+            Q(**{time_field: last_time, 'id__lt': last_id})
+        )
+
+    # 多取一条用于判断是否还有下一页
+    items = list(ordered[:page_size + 1])
+    has_more = len(items) > page_size
+    items = items[:page_size]
+
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, time_field), last.id)
+
+    result = {
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'total': None,
+        'total_is_estimate': False,
+    }
+    if with_total:
+        result['total'], result['total_is_estimate'] = estimate_count(queryset)
+    return result
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+URL路径匹配工具
+
+启动时把路径规则编译成字符前缀树，请求时只需沿路径逐字符走一遍树，
+代价与路径长度相关而与规则数量无关，替代逐条 startswith/in 的列表扫描。
+
+规则写法：
+    '/user/login'   精确匹配
+    '/media*'       前缀匹配（以 * 结尾）
+"""
+
+
+class PathTrie(object):
+    """路径前缀树，每条规则可携带一个值（如权限标识）"""
+
+    __slots__ = ('_root',)
+
+    _EXACT = 0
+    _PREFIX = 1
+
+    def __init__(self, rules=None):
+        self._root = {}
+        if rules:
+            if isinstance(rules, dict):
+                for pattern, value in rules.items():
+                    self.add(pattern, value)
+            else:
+                for pattern in rules:
+                    self.add(pattern)
+
+    def add(self, pattern, value=True):
+        """添加规则，以 * 结尾为前缀规则"""
+        is_prefix = pattern.endswith('*')
+        if is_prefix:
+            pattern = pattern[:-1]
+
+        node = self._root
+        for char in pattern:
+            node = node.setdefault(char, {})
+        # 终止标记使用非字符键，避免与路径字符冲突
+        node.setdefault(None, [None, None])[self._PREFIX if is_prefix else self._EXACT] = value
+
+    def match(self, path, default=None):
+        """
+        返回匹配规则的值：精确规则优先，否则取最长的前缀规则
+        """
+        node = self._root
+        found = default
+        for char in path:
+            marks = node.get(None)
+            if marks is not None and marks[self._PREFIX] is not None:
+                found = marks[self._PREFIX]
+            node = node.get(char)
+            if node is None:
+                return found
+
+        marks = node.get(None)
+        if marks is not None:
+            if marks[self._EXACT] is not None:
+                return marks[self._EXACT]
+            if marks[self._PREFIX] is not None:
+                return marks[self._PREFIX]
+        return found
+
+    def __contains__(self, path):
+        return self.match(path) is not None
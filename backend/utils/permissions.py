@@ -1,9 +1,112 @@
 # -*- coding: utf-8 -*-
 
+import logging
 from functools import wraps
+from django.core.cache import cache
 from django.http import JsonResponse
 from user.models import SysUser
-from role.models import SysUserRole
+from role.models import SysUserRole, ROLE_SUPERADMIN, ROLE_ADMIN
+from utils.jwt_helper import invalidate_role_claims
+
+logger = logging.getLogger(__name__)
+
+# 用户角色缓存：请求内缓存 + Redis缓存
+# 角色授权变更时删除该用户的缓存；角色本身修改/删除时递增全局版本号，旧版本缓存自然失效
+ROLE_CACHE_TIMEOUT = 60 * 10
+ROLE_CACHE_VERSION_KEY = 'perm:role_version'
+
+
+def _get_role_version():
+    version = cache.get(ROLE_CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(ROLE_CACHE_VERSION_KEY, 1, None)
+        version = cache.get(ROLE_CACHE_VERSION_KEY) or 1
+    return version
+
+
+def _role_cache_key(user_id, version):
+    return f'perm:user_roles:{user_id}:v{version}'
+
+
+def get_user_role_info(user_id, request=None):
+    """
+    获取用户角色代码和名称
+
+    Returns:
+        tuple: (角色代码列表, 角色名称列表)
+    """
+    if not user_id:
+        return [], []
+
+    # 1. 请求内缓存
+    request_cache = getattr(request, '_role_info_cache', None) if request is not None else None
+    if request_cache is not None and user_id in request_cache:
+        return request_cache[user_id]
+
+    # 2. Redis缓存，不可用时直接查库
+    key = None
+    role_info = None
+    try:
+        key = _role_cache_key(user_id, _get_role_version())
+        role_info = cache.get(key)
+    except Exception as e:
+        logger.warning('role_cache result=unavailable user_id=%s error=%s', user_id, e)
+
+    # 3. 数据库
+    if role_info is None:
+        rows = list(SysUserRole.objects.filter(user_id=user_id).values_list('role__code', 'role__name'))
+        role_info = ([code for code, _ in rows], [name for _, name in rows])
+        if key:
+            try:
+                cache.set(key, role_info, ROLE_CACHE_TIMEOUT)
+            except Exception:
+                pass
+
+    role_info = (list(role_info[0]), list(role_info[1]))
+    if request is not None:
+        if request_cache is None:
+            request_cache = {}
+            request._role_info_cache = request_cache
+        request_cache[user_id] = role_info
+    return role_info
+
+
+def get_user_role_codes(user_id, request=None):
+    """获取用户角色代码列表（带缓存）"""
+    return get_user_role_info(user_id, request)[0]
+
+
+def is_superadmin(user_id, request=None):
+    """是否为超级管理员"""
+    codes, names = get_user_role_info(user_id, request)
+    return ROLE_SUPERADMIN in codes or '超级管理员' in names
+
+
+def is_admin_or_above(user_id, request=None):
+    """是否为管理员或超级管理员"""
+    codes, names = get_user_role_info(user_id, request)
+    return (ROLE_SUPERADMIN in codes or ROLE_ADMIN in codes or
+            '超级管理员' in names or '管理员' in names)
+
+
+def invalidate_user_roles(user_id):
+    """用户角色授权变更后清除该用户的角色缓存"""
+    try:
+        cache.delete(_role_cache_key(user_id, _get_role_version()))
+    except Exception as e:
+        logger.warning('role_cache result=invalidate_failed user_id=%s error=%s', user_id, e)
+    # 已签发token中的角色声明同时失效
+    invalidate_role_claims(user_id)
+
+
+def bump_role_version():
+    """角色新增/修改/删除后使所有用户的角色缓存失效"""
+    try:
+        _get_role_version()
+        cache.incr(ROLE_CACHE_VERSION_KEY)
+    except Exception as e:
+        logger.warning('role_cache result=bump_failed error=%s', e)
+    invalidate_role_claims()
 
 
 def get_user_roles(user_id):
@@ -32,9 +135,8 @@ def require_role(allowed_roles):
                     'msg': '未登录或登录已过期'
                 })
             
-            # 获取用户角色
-            user_roles = get_user_roles(request.user_id)
-            user_role_codes = [role.code for role in user_roles]
+            # 获取用户角色（带缓存）
+            user_role_codes = get_user_role_codes(request.user_id, request)
             
             # 检查权限
             if not any(role_code in allowed_roles for role_code in user_role_codes):
@@ -82,8 +184,7 @@ class PermissionMixin:
         if isinstance(required_roles, str):
             required_roles = [required_roles]
         
-        user_roles = get_user_roles(request.user_id)
-        user_role_codes = [role.code for role in user_roles]
+        user_role_codes = get_user_role_codes(request.user_id, request)
         
         return any(role_code in required_roles for role_code in user_role_codes)
     
@@ -121,9 +222,8 @@ def data_permission_filter(func):
     """
     @wraps(func)
     def wrapper(request, *args, **kwargs):
-        # 获取用户角色
-        user_roles = get_user_roles(request.user_id) if hasattr(request, 'user_id') else []
-        user_role_codes = [role.code for role in user_roles]
+        # 获取用户角色（带缓存）
+        user_role_codes = get_user_role_codes(getattr(request, 'user_id', None), request)
         
         # 设置数据权限标识
         if 'superadmin' in user_role_codes: